@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pydantic_settings import BaseSettings
 from pydantic import Field, AnyUrl, SecretStr
 
@@ -17,17 +17,54 @@ class Settings(BaseSettings):
     # ------------------------ URL API ------------------------
     UNACH_API_SERVIDOR: str = Field(..., env="UNACH_API_SERVIDOR")
     UNACH_API_ESTUDIANTE: str = Field(..., env="UNACH_API_ESTUDIANTE")
+    # Conexiones keep-alive por host y caché de consultas por cédula (0 = sin caché);
+    # las cédulas no encontradas se recuerdan UNACH_CACHE_NEGATIVE_TTL segundos
+    UNACH_API_POOL_SIZE: int = Field(10, env="UNACH_API_POOL_SIZE")
+    UNACH_CACHE_SIZE: int = Field(4096, env="UNACH_CACHE_SIZE")
+    UNACH_CACHE_TTL: float = Field(600.0, env="UNACH_CACHE_TTL")
+    UNACH_CACHE_NEGATIVE_TTL: float = Field(60.0, env="UNACH_CACHE_NEGATIVE_TTL")
+    # Cédulas por POST a InformacionBasicaPorCI y ventana (ms) para agrupar
+    # consultas sueltas de estudiantes en una sola llamada (0 = sin agrupar),
+    # con hasta UNACH_COALESCE_WORKERS llamadas agrupadas en curso a la vez
+    UNACH_BATCH_SIZE: int = Field(50, env="UNACH_BATCH_SIZE")
+    UNACH_COALESCE_MS: float = Field(5.0, env="UNACH_COALESCE_MS")
+    UNACH_COALESCE_WORKERS: int = Field(4, env="UNACH_COALESCE_WORKERS")
 
     # ------------------------ Base de datos ------------------------
     DATABASE_URL: AnyUrl = Field(..., env="DATABASE_URL")
     DATABASE_URL_ESTUDIANTES: AnyUrl = Field(..., env="DATABASE_URL_ESTUDIANTES")
     DATABASE_URL_SERVIDORES: AnyUrl = Field(..., env="DATABASE_URL_SERVIDORES")
+    # Pools por motor: MAIN (FAQ/OTP), EST (RADIUS estudiantes), SRV (RADIUS servidores)
+    DB_MAIN_POOL_SIZE: int = Field(5, env="DB_MAIN_POOL_SIZE")
+    DB_MAIN_MAX_OVERFLOW: int = Field(10, env="DB_MAIN_MAX_OVERFLOW")
+    DB_MAIN_POOL_RECYCLE: int = Field(1800, env="DB_MAIN_POOL_RECYCLE")
+    DB_EST_POOL_SIZE: int = Field(3, env="DB_EST_POOL_SIZE")
+    DB_EST_MAX_OVERFLOW: int = Field(5, env="DB_EST_MAX_OVERFLOW")
+    DB_EST_POOL_RECYCLE: int = Field(1800, env="DB_EST_POOL_RECYCLE")
+    DB_SRV_POOL_SIZE: int = Field(3, env="DB_SRV_POOL_SIZE")
+    DB_SRV_MAX_OVERFLOW: int = Field(5, env="DB_SRV_MAX_OVERFLOW")
+    DB_SRV_POOL_RECYCLE: int = Field(1800, env="DB_SRV_POOL_RECYCLE")
+    DB_POOL_TIMEOUT: float = Field(10.0, env="DB_POOL_TIMEOUT")
+    # Hilos dedicados a consultas síncronas lanzadas desde endpoints async
+    DB_EXECUTOR_WORKERS: int = Field(16, env="DB_EXECUTOR_WORKERS")
+    # Escritura diferida de unanswered y logs: lote máximo, espera máxima y tope del búfer
+    WRITE_BEHIND_BATCH: int = Field(100, env="WRITE_BEHIND_BATCH")
+    WRITE_BEHIND_FLUSH_SECONDS: float = Field(2.0, env="WRITE_BEHIND_FLUSH_SECONDS")
+    WRITE_BEHIND_MAX_PENDING: int = Field(10000, env="WRITE_BEHIND_MAX_PENDING")
 
     # ------------------------ SMTP ------------------------
     SMTP_HOST: str = Field(..., env="SMTP_HOST")
     SMTP_PORT: int = Field(587, env="SMTP_PORT")
     SMTP_USER: str = Field(..., env="SMTP_USER")
     SMTP_PASSWORD: SecretStr = Field(..., env="SMTP_PASSWORD")
+    SMTP_START_TLS: bool = Field(True, env="SMTP_START_TLS")
+    # Bandeja de salida: conexiones persistentes, reintentos con espera exponencial
+    # (SMTP_RETRY_BACKOFF * 2^n segundos) y NOOP antes de reusar una conexión parada
+    SMTP_CONNECTIONS: int = Field(1, env="SMTP_CONNECTIONS")
+    SMTP_MAX_RETRIES: int = Field(4, env="SMTP_MAX_RETRIES")
+    SMTP_RETRY_BACKOFF: float = Field(2.0, env="SMTP_RETRY_BACKOFF")
+    SMTP_TIMEOUT: float = Field(10.0, env="SMTP_TIMEOUT")
+    SMTP_IDLE_SECONDS: float = Field(60.0, env="SMTP_IDLE_SECONDS")
 
     # ------------------------ LDAP ZOOM ------------------------
     LDAP_ZOOM_HOST: str = Field(..., env="LDAP_ZOOM_HOST")
@@ -35,12 +72,120 @@ class Settings(BaseSettings):
     LDAP_ZOOM_USER: str = Field(..., env="LDAP_ZOOM_USER")
     LDAP_ZOOM_PASSWORD: SecretStr = Field(..., env="LDAP_ZOOM_PASSWORD")
     LDAP_ZOOM_BASE_DN: str = Field(..., env="LDAP_ZOOM_BASE_DN")
+    # Pool de conexiones: tamaño, estrategia de ldap3 (SYNC, RESTARTABLE o MOCK_SYNC
+    # para pruebas sin servidor), timeout y segundos parada antes de reabrir
+    LDAP_ZOOM_POOL_SIZE: int = Field(4, env="LDAP_ZOOM_POOL_SIZE")
+    LDAP_ZOOM_STRATEGY: str = Field("SYNC", env="LDAP_ZOOM_STRATEGY")
+    LDAP_ZOOM_TIMEOUT: float = Field(5.0, env="LDAP_ZOOM_TIMEOUT")
+    LDAP_ZOOM_MAX_IDLE: float = Field(300.0, env="LDAP_ZOOM_MAX_IDLE")
+
+    # ------------------------ Modelo de embeddings ------------------------
+    EMBEDDING_MODEL: str = Field("distiluse-base-multilingual-cased-v1", env="EMBEDDING_MODEL")
+    # Archivo JSON con intenciones (frases, umbrales, respuestas); vacío = app/config/intents.json
+    INTENTS_FILE: Optional[str] = Field(None, env="INTENTS_FILE")
+    # Atajo sin modelo para saludos/contraseña: fracción mínima del mensaje cubierta por frases
+    FASTPATH_ENABLED: bool = Field(True, env="FASTPATH_ENABLED")
+    FASTPATH_MIN_COVERAGE: float = Field(0.75, env="FASTPATH_MIN_COVERAGE")
+    # Micro-lotes de inferencia: tamaño máximo y espera máxima (ms) para agrupar consultas
+    ENCODE_MAX_BATCH: int = Field(32, env="ENCODE_MAX_BATCH")
+    ENCODE_MAX_WAIT_MS: float = Field(5.0, env="ENCODE_MAX_WAIT_MS")
+    # Inferencia en CPU: cuantización dinámica int8 de las capas lineales (opcional),
+    # longitud máxima de secuencia (0 = la del modelo) e hilos de torch por worker (0 = por defecto)
+    EMBEDDING_QUANTIZE: bool = Field(False, env="EMBEDDING_QUANTIZE")
+    EMBEDDING_MAX_SEQ_LENGTH: int = Field(0, env="EMBEDDING_MAX_SEQ_LENGTH")
+    TORCH_NUM_THREADS: int = Field(0, env="TORCH_NUM_THREADS")
+
+    # ------------------------ Índice vectorial ------------------------
+    # "exact" (búsqueda exhaustiva) o "ivf" (particiones k-means, aproximado)
+    VECTOR_INDEX_BACKEND: str = Field("exact", env="VECTOR_INDEX_BACKEND")
+    IVF_NLIST: int = Field(0, env="IVF_NLIST")              # 0 = raíz cuadrada del nº de vectores
+    IVF_NPROBE: int = Field(8, env="IVF_NPROBE")
+    IVF_MIN_VECTORS: int = Field(5000, env="IVF_MIN_VECTORS")
+    VECTOR_DTYPE: str = Field("float32", env="VECTOR_DTYPE")    # float32 | float16 | int8
+    VECTOR_PCA_DIM: int = Field(0, env="VECTOR_PCA_DIM")        # 0 = sin reducción
+    # Etapa léxica BM25 antes del modelo: "off", "rerank" (solo los LEXICAL_TOPN
+    # candidatos se puntúan semánticamente) o "fusion" (RRF léxico + semántico)
+    LEXICAL_MODE: str = Field("off", env="LEXICAL_MODE")
+    LEXICAL_TOPN: int = Field(50, env="LEXICAL_TOPN")
+    RRF_K: int = Field(60, env="RRF_K")
+    # Atajo léxico (con LEXICAL_MODE activo): una FAQ cuyo mejor BM25 comparte al
+    # menos LEXICAL_SHORTCUT_MIN_OVERLAP de los términos (Jaccard) con la pregunta
+    # y supera al segundo por LEXICAL_SHORTCUT_MARGIN responde sin el modelo (0 = desactivado)
+    LEXICAL_SHORTCUT_MIN_OVERLAP: float = Field(0.8, env="LEXICAL_SHORTCUT_MIN_OVERLAP")
+    LEXICAL_SHORTCUT_MARGIN: float = Field(1.5, env="LEXICAL_SHORTCUT_MARGIN")
 
     # ------------------------ Umbrales y flags ------------------------
     THRESHOLD_FAQ: float = Field(0.65, env="THRESHOLD_FAQ")
     THRESHOLD_SCRAPING: float = Field(0.50, env="THRESHOLD_SCRAPING")
     ENABLE_SCRAPING: bool = Field(True, env="ENABLE_SCRAPING")
 
+    # ------------------------ Rastreo (scraping) ------------------------
+    CRAWL_MAX_WORKERS: int = Field(8, env="CRAWL_MAX_WORKERS")
+    CRAWL_PER_HOST: int = Field(2, env="CRAWL_PER_HOST")
+    CRAWL_DELAY_SECONDS: float = Field(0.5, env="CRAWL_DELAY_SECONDS")
+    CRAWL_MAX_PAGES: int = Field(5, env="CRAWL_MAX_PAGES")
+    # Similitud de Jaccard (MinHash) a partir de la cual dos bloques se consideran duplicados
+    DEDUP_NEAR_THRESHOLD: float = Field(0.8, env="DEDUP_NEAR_THRESHOLD")
+
+    # ------------------------ Caché de respuestas ------------------------
+    ANSWER_CACHE_SIZE: int = Field(2048, env="ANSWER_CACHE_SIZE")
+    ANSWER_CACHE_TTL: float = Field(3600.0, env="ANSWER_CACHE_TTL")       # segundos
+    SEMANTIC_CACHE_SIZE: int = Field(1024, env="SEMANTIC_CACHE_SIZE")
+    SEMANTIC_CACHE_THRESHOLD: float = Field(0.95, env="SEMANTIC_CACHE_THRESHOLD")
+
+    # ------------------------ Sincronización de FAQs ------------------------
+    FAQ_REFRESH_SECONDS: float = Field(300.0, env="FAQ_REFRESH_SECONDS")   # 0 = desactivado
+
+    # ------------------------ Tokens OTP ------------------------
+    OTP_CACHE_SIZE: int = Field(10000, env="OTP_CACHE_SIZE")
+    # Limpieza de caducados: cada OTP_REAP_SECONDS (0 = desactivada), los que
+    # caducaron hace más de OTP_REAP_GRACE_SECONDS, en lotes de OTP_REAP_BATCH.
+    # "archive" los mueve a otp_tokens_archive (migrations/001), "delete" los borra
+    OTP_REAP_SECONDS: float = Field(600.0, env="OTP_REAP_SECONDS")
+    OTP_REAP_MODE: str = Field("archive", env="OTP_REAP_MODE")
+    OTP_REAP_GRACE_SECONDS: float = Field(3600.0, env="OTP_REAP_GRACE_SECONDS")
+    OTP_REAP_BATCH: int = Field(500, env="OTP_REAP_BATCH")
+
+    # ------------------------ Índice de cuentas (check_account) ------------------------
+    # Usernames de radcheck y cn de LDAP en memoria: sincronización cada
+    # ACCOUNT_INDEX_REFRESH_SECONDS (0 = desactivado), reconstrucción completa de
+    # RADIUS y LDAP cada ACCOUNT_INDEX_FULL_SECONDS y antigüedad máxima para confiar en él
+    ACCOUNT_INDEX_REFRESH_SECONDS: float = Field(300.0, env="ACCOUNT_INDEX_REFRESH_SECONDS")
+    ACCOUNT_INDEX_FULL_SECONDS: float = Field(3600.0, env="ACCOUNT_INDEX_FULL_SECONDS")
+    ACCOUNT_INDEX_MAX_AGE: float = Field(900.0, env="ACCOUNT_INDEX_MAX_AGE")
+
+    # ------------------------ Control de admisión ------------------------
+    # Cubetas por IP (peticiones/segundo y ráfaga) para el tráfico general y
+    # para el carril prioritario (OTP y cambios de contraseña), cubetas globales
+    # por ruta (JSON {"/api/chatbot/query": 50}) y tope de /query en curso
+    ADMISSION_ENABLED: bool = Field(True, env="ADMISSION_ENABLED")
+    ADMISSION_IP_RATE: float = Field(2.0, env="ADMISSION_IP_RATE")
+    ADMISSION_IP_BURST: float = Field(10.0, env="ADMISSION_IP_BURST")
+    ADMISSION_PRIORITY_IP_RATE: float = Field(0.5, env="ADMISSION_PRIORITY_IP_RATE")
+    ADMISSION_PRIORITY_IP_BURST: float = Field(5.0, env="ADMISSION_PRIORITY_IP_BURST")
+    ADMISSION_ENDPOINT_RATES: Dict[str, float] = Field(
+        default_factory=lambda: {"/api/chatbot/query": 50.0}, env="ADMISSION_ENDPOINT_RATES"
+    )
+    ADMISSION_MAX_INFLIGHT: int = Field(32, env="ADMISSION_MAX_INFLIGHT")
+    # Proxies (NGINX) de los que se acepta X-Forwarded-For para identificar
+    # al cliente; cualquier otro par se limita por su propia IP
+    ADMISSION_TRUSTED_PROXIES: List[str] = Field(
+        default_factory=lambda: ["127.0.0.1", "::1"], env="ADMISSION_TRUSTED_PROXIES"
+    )
+
+    # ------------------------ Canal WebSocket del widget ------------------------
+    # Conexiones simultáneas por worker, mensajes atendidos a la vez por
+    # conexión (el resto espera en el socket), cierre por inactividad y
+    # tamaño máximo de mensaje
+    WS_MAX_CONNECTIONS: int = Field(500, env="WS_MAX_CONNECTIONS")
+    WS_MAX_PENDING: int = Field(4, env="WS_MAX_PENDING")
+    WS_IDLE_SECONDS: float = Field(120.0, env="WS_IDLE_SECONDS")
+    WS_MAX_MESSAGE_BYTES: int = Field(16384, env="WS_MAX_MESSAGE_BYTES")
+
+    # ------------------------ Administración ------------------------
+    # Token para los endpoints /admin (cabecera X-Admin-Token); sin valor quedan deshabilitados
+    ADMIN_TOKEN: Optional[SecretStr] = Field(None, env="ADMIN_TOKEN")
+
     # ------------------------ CORS ------------------------
     CORS_ORIGINS: List[str] = Field(default_factory=list, env="CORS_ORIGINS")
 
@@ -4,13 +4,35 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config.settings import get_settings
-from app.routes.chatbot_routes import router as chatbot_router, load_faq_cache, get_db
+from app.routes.chatbot_routes import router as chatbot_router
+from app.routes.chatbot_ws import router as chatbot_ws_router
+from app.routes.metrics_routes import router as metrics_router
+from app.services.scraped_index import load_scraped_index
+from app.services.inference_queue import encoder_queue
+from app.services.faq_cache import faq_cache, periodic_refresh
+from app.services.otp_store import periodic_reap
+from app.services.account_index import periodic_account_refresh
+from app.services.event_log import close_event_log
+from app.services.ldap_service import close_zoom_pool
+from app.services.mail_outbox import mail_outbox
+from app.routes.unach_client import close_unach_api
+from app.utils.db import db_executor
+from app.utils.admission import AdmissionMiddleware, admission
+from app.utils.metrics import MetricsMiddleware
 
+import asyncio
 import logging
 
 settings = get_settings()
 app = FastAPI(title="Asistente Virtual UNACH")
 
+# Control de admisión (se registra antes que CORS para que los 429/503
+# también lleven las cabeceras CORS)
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware, controller=admission, trusted_proxies=settings.ADMISSION_TRUSTED_PROXIES
+    )
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -20,19 +42,70 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latencia por ruta (el más externo: incluye los rechazos de admisión)
+app.add_middleware(MetricsMiddleware)
+
 # Logger
 logger = logging.getLogger("uvicorn.error")
 
+# Tareas de fondo del proceso (se cancelan al apagar)
+_background_tasks: list[asyncio.Task] = []
+
 # Precargar FAQs al iniciar el servidor
 @app.on_event("startup")
 async def on_startup():
     try:
-        db = next(get_db())
-        load_faq_cache(db)
+        faq_cache.refresh_new_session(full=True)
         logger.info("✅ FAQ cache cargado en startup.")
     except Exception as e:
         logger.error(f"❌ Error cargando caché de FAQ en startup: {e}")
 
+    # Índice precalculado del corpus scrapeado (una sola carga por worker; si
+    # falta, el scraping queda desactivado hasta construirlo fuera de línea)
+    if settings.ENABLE_SCRAPING:
+        try:
+            load_scraped_index()
+        except Exception as e:
+            logger.error(f"❌ Error cargando índice de scraping en startup: {e}")
+
+    # Sincronización incremental periódica de las FAQs
+    if settings.FAQ_REFRESH_SECONDS > 0:
+        _background_tasks.append(
+            asyncio.create_task(periodic_refresh(settings.FAQ_REFRESH_SECONDS))
+        )
+
+    # Limpieza periódica de tokens OTP caducados
+    if settings.OTP_REAP_SECONDS > 0:
+        _background_tasks.append(
+            asyncio.create_task(periodic_reap(settings.OTP_REAP_SECONDS))
+        )
+
+    # Índice de cuentas RADIUS/LDAP para check_account (carga inicial en segundo plano)
+    if settings.ACCOUNT_INDEX_REFRESH_SECONDS > 0:
+        _background_tasks.append(
+            asyncio.create_task(periodic_account_refresh(
+                settings.ACCOUNT_INDEX_REFRESH_SECONDS, settings.ACCOUNT_INDEX_FULL_SECONDS
+            ))
+        )
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    for task in _background_tasks:
+        task.cancel()
+    # Una sincronización ya en curso en un hilo termina antes de cerrar
+    # el executor de BD y los pools que usa
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+    await encoder_queue.close()
+    await mail_outbox.close()
+    await close_unach_api()
+    # Escribe las filas diferidas antes de cerrar los hilos de BD
+    await asyncio.to_thread(close_event_log)
+    db_executor.shutdown()
+    close_zoom_pool()
+
 # Montar router del chatbot
 app.include_router(chatbot_router)
+app.include_router(chatbot_ws_router)
+app.include_router(metrics_router)
 
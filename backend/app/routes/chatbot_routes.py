@@ -1,25 +1,31 @@
-from fastapi import APIRouter, HTTPException, Request, Depends, BackgroundTasks, status
+from fastapi import APIRouter, HTTPException, Request, Depends, Header, status
 from pydantic import BaseModel
 from typing import Literal, Optional, Dict
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 from email.message import EmailMessage
-import aiosmtplib, logging, random
+import asyncio, logging, random, secrets, time
 
 from datetime import datetime, timedelta
-from sentence_transformers import SentenceTransformer, util
-import torch
 
-from app.utils.db import SessionLocal, SessionLocalEstudiantes, SessionLocalServidores
-from app.models.faq_model import FAQ
-from app.models.unanswered_model import Unanswered
-from app.routes.unach_client import UnachApi
+from app.utils.db import SessionLocal, db_stats, run_db
+from app.utils.admission import admission
+from app.utils.metrics import QUERY_FUENTE, QUERY_SECONDS, QUERY_STAGE_SECONDS
+from app.routes.unach_client import get_unach_api
 from app.services.scraping_service import search_in_scraped_data
+from app.services.scraped_index import get_scraped_index
+from app.services.model_registry import model_stats
+from app.services.intent_router import fast_path, intent_router
+from app.services.inference_queue import encode_async
+from app.services.answer_cache import answer_cache
+from app.services.faq_cache import faq_cache
 from app.services.radius_service import change_radius_password
-from app.services.ldap_service import change_ldap_zoom_password
+from app.services.ldap_service import change_ldap_zoom_password, zoom_pool_stats
+from app.services.event_log import event_log_stats, registrar_unanswered
+from app.services.mail_outbox import mail_outbox
+from app.services.otp_store import otp_store
+from app.services.account_index import account_index
 from app.config.settings import Settings, get_settings
 
-import ldap3
 settings = get_settings()
 
 
@@ -27,19 +33,6 @@ settings = get_settings()
 logger = logging.getLogger("uvicorn.error")
 router = APIRouter(prefix="/api/chatbot", tags=["Chatbot"])
 
-# Carga de modelo y cache de FAQs en memoria
-model = SentenceTransformer('distiluse-base-multilingual-cased-v1')
-_cached_faqs: list[FAQ] = []
-_cached_embeddings: list[torch.Tensor] = []
-
-# Palabras clave para flujos especiales
-PASSWD_KW    = ["cambiar mi contraseña", "olvidé mi contraseña", "resetear password", "restablecer contraseña"]
-SALUDO_KW    = ["hola", "buenos días", "buenas tardes", "saludos", "hello"]
-PASSWD_EMB   = [model.encode(k, convert_to_tensor=True) for k in PASSWD_KW]
-SALUDO_EMB   = [model.encode(k, convert_to_tensor=True) for k in SALUDO_KW]
-THRESHOLD_PW = 0.60
-THRESHOLD_HELLO = 0.65
-
 # ------------------------ DEPENDENCIA DB ------------------------
 def get_db():
     db = SessionLocal()
@@ -76,35 +69,14 @@ class ResetRadiusRequest(BaseModel):
     new_password: str
     grupo: str
 
-# ------------------------ UTILIDADES NLP ------------------------
-def es_saludo(texto: str) -> bool:
-    emb = model.encode(texto, convert_to_tensor=True)
-    sims = [util.pytorch_cos_sim(emb, ref)[0][0].item() for ref in SALUDO_EMB]
-    return max(sims) >= THRESHOLD_HELLO
-
-def es_pregunta_de_contrasena(texto: str) -> bool:
-    emb = model.encode(texto, convert_to_tensor=True)
-    sims = [util.pytorch_cos_sim(emb, ref)[0][0].item() for ref in PASSWD_EMB]
-    return max(sims) >= THRESHOLD_PW
-
 # ------------------------ CACHE FAQs ------------------------
 def load_faq_cache(db: Session):
-    global _cached_faqs, _cached_embeddings
-    faqs = db.query(FAQ).all()
-    _cached_faqs = faqs
-    _cached_embeddings = [
-        model.encode(f.pregunta.lower(), convert_to_tensor=True)
-        for f in faqs
-    ]
-
-@router.on_event("startup")
-async def startup_event():
-    db = next(get_db())
-    load_faq_cache(db)
+    """Recarga completa de la caché de FAQs (se usa al arrancar)."""
+    return faq_cache.refresh(db, full=True)
 
 # ------------------------ ENVÍO DE CORREO OTP ------------------------
 
-async def enviar_correo_otp(dest: str, otp: str, settings: Settings) -> None:
+def enviar_correo_otp(dest: str, otp: str, settings: Settings) -> None:
     # Construir el mensaje
     msg = EmailMessage()
     msg["From"] = settings.SMTP_USER
@@ -173,25 +145,8 @@ Universidad Nacional de Chimborazo
     msg.set_content(texto_plano)
     msg.add_alternative(html, subtype="html")
 
-    # Credenciales
-    usuario = settings.SMTP_USER
-    contraseña = settings.SMTP_PASSWORD.get_secret_value()
-
-    try:
-        # Envío
-        client = aiosmtplib.SMTP(
-            hostname=settings.SMTP_HOST,
-            port=settings.SMTP_PORT,
-            start_tls=True,
-            timeout=10.0,
-        )
-        await client.connect()
-        await client.login(usuario, contraseña)
-        await client.send_message(msg)
-        await client.quit()
-        logger.info(f"✅ OTP enviado correctamente a {dest}")
-    except Exception as e:
-        logger.error(f"❗ Error enviando OTP a {dest}: {e}", exc_info=True)
+    # Encolar en la bandeja de salida (conexión SMTP persistente y reintentos)
+    mail_outbox.send(msg)
 
 
 # ------------------------ ENDPOINTS ------------------------
@@ -200,61 +155,77 @@ Universidad Nacional de Chimborazo
 async def chatbot_query(
     payload: QuestionRequest,
     request: Request,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
     settings: Settings = Depends(get_settings)
 ) -> Dict:
     pregunta = payload.pregunta.strip().lower()
     if not pregunta:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pregunta vacía.")
 
-    # 1) Saludo inicial
-    if es_saludo(pregunta):
-        return {
-            "respuesta": (
-                "👋 <strong>¡Hola! Soy Unachito</strong>.<br>"
-                "😊 ¿Eres Estudiante, Servidor o Externo?"
-            ),
-            "fuente": "Saludo",
-            "acciones": ["Estudiante","Servidor","Externo"]
-        }
-
-    # 2) Intento FAQ en caché
-    if _cached_embeddings:
-        emb_user   = model.encode(pregunta, convert_to_tensor=True)
-        emb_tensor = torch.stack(_cached_embeddings)
-        sims       = util.pytorch_cos_sim(emb_user, emb_tensor)[0]
-        best_idx   = sims.argmax().item()
-        if sims[best_idx].item() >= settings.THRESHOLD_FAQ:
-            return {
-                "respuesta": _cached_faqs[best_idx].respuesta,
-                "fuente": "FAQ BD",
-                "acciones": []
-            }
-
-    # 3) Cambio de contraseña
-    if es_pregunta_de_contrasena(pregunta):
-        return {
-            "respuesta": "🔑 Para cambiar tu contraseña, selecciona un servicio:",
-            "fuente": "Manejo especial",
-            "acciones": ["WiFi","Zoom"]
-        }
-
-    # 4) Registrar unanswered
-    db.add(Unanswered(
-        pregunta   = payload.pregunta.strip(),
-        usuario_ip = request.client.host,
-        origen     = "API Chatbot",
-        url_origen = request.headers.get('referer','')
-    ))
-    db.commit()
+    t0 = time.perf_counter()
+    resp = await _responder(pregunta, payload, request, settings)
+    fuente = resp.get("fuente", "desconocida")
+    QUERY_SECONDS.observe(time.perf_counter() - t0, fuente)
+    QUERY_FUENTE.inc(fuente)
+    return resp
+
+async def _responder(pregunta: str, payload: QuestionRequest, request: Request, settings: Settings) -> Dict:
+    """Pipeline de /query; cada etapa queda medida en QUERY_STAGE_SECONDS."""
+    # 0) Saludos y contraseña expresados sin ambigüedad: sin pasar por el modelo
+    if settings.FASTPATH_ENABLED:
+        with QUERY_STAGE_SECONDS.time("fast_path"):
+            rapida = fast_path.match(pregunta)
+        if rapida:
+            return rapida
+
+    # Caché de respuestas: texto normalizado idéntico
+    with QUERY_STAGE_SECONDS.time("cache_exacta"):
+        cached = answer_cache.get(pregunta)
+    if cached:
+        return cached
+
+    # Generación de la caché antes de resolver: si las FAQs se recargan
+    # mientras tanto, la respuesta calculada no se guarda
+    generacion = answer_cache.generacion
+
+    # FAQ evidente por sus términos (BM25): sin pasar por el modelo
+    with QUERY_STAGE_SECONDS.time("lexica"):
+        lexica = intent_router.route_lexical(pregunta)
+    if lexica:
+        answer_cache.put(pregunta, None, lexica, generacion)
+        return lexica
+
+    # 1-3) Saludo, FAQ en caché y cambio de contraseña: un solo embedding
+    # de la pregunta comparado contra todas las referencias en un paso
+    with QUERY_STAGE_SECONDS.time("encode"):
+        emb_user = await encode_async(pregunta)
+    with QUERY_STAGE_SECONDS.time("cache_semantica"):
+        cached = answer_cache.get_semantic(emb_user)
+    if cached:
+        return cached
+
+    with QUERY_STAGE_SECONDS.time("intenciones"):
+        intent = intent_router.route(emb_user, faq_threshold=settings.THRESHOLD_FAQ, pregunta=pregunta)
+    if intent:
+        answer_cache.put(pregunta, emb_user, intent, generacion)
+        return intent
+
+    # 4) Registrar unanswered (escritura diferida, no espera a la BD)
+    with QUERY_STAGE_SECONDS.time("unanswered"):
+        registrar_unanswered(
+            payload.pregunta.strip(),
+            request.client.host,
+            request.headers.get('referer','')
+        )
 
     # 5) Scraping fallback
     if settings.ENABLE_SCRAPING:
-        resp = search_in_scraped_data(
-            pregunta,
-            umbral_similitud=settings.THRESHOLD_SCRAPING
-        )
+        with QUERY_STAGE_SECONDS.time("scraping"):
+            resp = await asyncio.to_thread(
+                search_in_scraped_data,
+                pregunta,
+                threshold=settings.THRESHOLD_SCRAPING,
+                query_embedding=emb_user
+            )
         if resp:
             return {"respuesta": resp, "fuente": "Scraping", "acciones": []}
 
@@ -268,12 +239,72 @@ async def chatbot_query(
         "acciones": ["Mostrar FAQs"]
     }
 
+@router.get("/models")
+async def modelos_cargados() -> Dict:
+    """Modelos de embeddings residentes, con tiempo de carga y memoria."""
+    return model_stats()
+
+@router.get("/index_stats")
+async def estadisticas_indices() -> Dict:
+    """Latencia y tamaño de los índices vectoriales y léxicos (intenciones/FAQ y scraping)."""
+    scraped = get_scraped_index()
+    return {
+        "intenciones": intent_router.stats(),
+        "scraping": scraped.index.stats() if scraped is not None else {},
+        "scraping_bm25": scraped.lexical.stats() if scraped is not None else {},
+    }
+
+@router.get("/db_stats")
+async def estadisticas_db() -> Dict:
+    """Ocupación y espera de los pools (BD y LDAP), cola de BD, escritura diferida y almacén de OTP."""
+    return {
+        **db_stats(),
+        "write_behind": event_log_stats(),
+        "ldap_zoom": zoom_pool_stats(),
+        "otp": otp_store.stats(),
+        "cuentas": account_index.stats(),
+    }
+
+@router.get("/mail_stats")
+async def estadisticas_correo() -> Dict:
+    """Profundidad de la bandeja de salida SMTP, reintentos y latencia de entrega."""
+    return mail_outbox.stats()
+
+@router.get("/cache_stats")
+async def estadisticas_cache() -> Dict:
+    """Aciertos y fallos de la caché de respuestas, consultas resueltas sin modelo y directorio UNACH."""
+    return {**answer_cache.stats(), "fast_path": fast_path.stats(), "unach_api": get_unach_api().stats()}
+
+@router.get("/admission_stats")
+async def estadisticas_admision() -> Dict:
+    """Peticiones admitidas y rechazadas por carril, /query en curso y estado de las cubetas."""
+    return admission.stats()
+
+@router.post("/admin/faq_refresh")
+async def admin_faq_refresh(
+    full: bool = False,
+    x_admin_token: Optional[str] = Header(None),
+    settings: Settings = Depends(get_settings)
+) -> Dict:
+    """
+    Sincroniza la caché de FAQs con la BD sin reiniciar el worker.
+    Por defecto solo recodifica las filas nuevas o modificadas.
+    """
+    esperado = settings.ADMIN_TOKEN.get_secret_value() if settings.ADMIN_TOKEN is not None else ""
+    if not esperado:
+        # Sin ADMIN_TOKEN configurado el endpoint no existe
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    # Comparación en tiempo constante: no revela cuántos caracteres coinciden
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token.encode(), esperado.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No autorizado.")
+    resumen = await asyncio.to_thread(faq_cache.refresh_new_session, full)
+    return {"status": "success", **resumen}
+
 @router.post("/get_user_info")
 async def get_user_info(
     payload: GetUserInfoRequest
 ) -> Dict:
-    api = UnachApi(verify_ssl=False)
-    nombre = api.get_nombre_por_cedula(payload.cedula, payload.user_type)
+    nombre = await get_unach_api().get_nombre_por_cedula_async(payload.cedula, payload.user_type)
     if not nombre:
         return {"error": "Usuario no encontrado"}
     return {"nombre": nombre}
@@ -296,48 +327,14 @@ async def check_account(payload: CheckAccountRequest) -> Dict[str, bool]:
     cedula = payload.cedula
     servicio = payload.servicio.lower()
     exists = False
+    # Igual que en enviar_otp: solo cédulas numéricas llegan a RADIUS/LDAP
+    if not cedula.isdigit():
+        return {"exists": False}
 
     try:
-        if servicio == "wifi":
-            # 1) Conexión a la base RADIUS según tipo de usuario
-            session: Session = (
-                SessionLocalEstudiantes() if payload.user_type == "estudiante"
-                else SessionLocalServidores()
-            )
-            try:
-                row = session.execute(
-                    text("SELECT 1 FROM radcheck WHERE username = :u LIMIT 1"),
-                    {"u": cedula}
-                ).first()
-                exists = row is not None
-            finally:
-                session.close()
-
-        elif servicio == "zoom":
-            # 2) Búsqueda en LDAP Zoom
-            ldap_pass = settings.LDAP_ZOOM_PASSWORD.get_secret_value()
-            server = ldap3.Server(
-                settings.LDAP_ZOOM_HOST,
-                port=settings.LDAP_ZOOM_PORT,
-                get_info=ldap3.ALL
-            )
-            conn = ldap3.Connection(
-                server,
-                user=settings.LDAP_ZOOM_USER,
-                password=ldap_pass,
-                auto_bind=True
-            )
-            conn.search(
-                search_base=settings.LDAP_ZOOM_BASE_DN,
-                search_filter=f"(cn={cedula})",
-                attributes=["cn"]
-            )
-            exists = bool(conn.entries)
-            conn.unbind()
-
-        else:
-            # servicio no soportado
-            exists = False
+        # Índice en memoria de RADIUS (wifi) y LDAP (zoom); consulta en vivo
+        # solo si la cuenta no aparece o el índice está desactualizado
+        exists = await account_index.exists(servicio, payload.user_type, cedula)
 
     except Exception as e:
         # Cualquier error, lo registramos y devolvemos exists=False
@@ -348,103 +345,103 @@ async def check_account(payload: CheckAccountRequest) -> Dict[str, bool]:
 
 
 
+async def _confirmar_cuenta(servicio: str, user_type: str, cedula: str) -> Optional[bool]:
+    """Existencia en vivo tras un cambio de contraseña fallido (None si tampoco se pudo consultar)."""
+    try:
+        return await account_index.confirm(servicio, user_type, cedula)
+    except Exception as e:
+        logger.error("Error confirmando cuenta %s para %s: %s", servicio, cedula, e)
+        return None
+
+
 @router.post("/enviar_otp")
 async def enviar_otp(
     payload: EnviarOtpRequest,
     request: Request,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
     settings: Settings = Depends(get_settings)
 ) -> Dict:
     if not payload.cedula.isdigit():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cédula inválida.")
-    api    = UnachApi(verify_ssl=False)
-    correo = api.get_correo_por_cedula(payload.cedula, payload.user_type)
+    correo = await get_unach_api().get_correo_por_cedula_async(payload.cedula, payload.user_type)
     if not correo:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Correo institucional no encontrado.")
 
     otp = f"{random.randint(0,999999):06d}"
     exp = datetime.utcnow() + timedelta(minutes=10)
-    db.execute(text(
-        "INSERT INTO otp_tokens(cedula,correo,codigo_otp,expiracion,ip_origen,comentario) "
-        "VALUES(:c,:e,:o,:x,:ip,'OTP enviado')"
-    ), {"c":payload.cedula, "e":correo, "o":otp, "x":exp, "ip":request.client.host})
-    db.commit()
+    await otp_store.create_async(payload.cedula, correo, otp, exp, request.client.host)
 
-    background_tasks.add_task(enviar_correo_otp, correo, otp, settings)
+    enviar_correo_otp(correo, otp, settings)
     return {"status":"success", "message":f"✅ OTP enviado a {correo}."}
 
 @router.post("/verificar_otp")
 async def verificar_otp(
-    payload: VerificarOtpRequest,
-    db: Session = Depends(get_db)
+    payload: VerificarOtpRequest
 ) -> Dict:
-    rec = db.execute(text(
-        "SELECT * FROM otp_tokens WHERE cedula=:c AND codigo_otp=:o "
-        "ORDER BY id DESC LIMIT 1"
-    ), {"c":payload.cedula, "o":payload.otp}).mappings().first()
+    rec = await otp_store.find(payload.cedula, payload.otp)
     if not rec:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="OTP no encontrado.")
     if rec['expiracion'] < datetime.utcnow() or rec['usado']:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="OTP inválido o expirado.")
 
-    db.execute(text("UPDATE otp_tokens SET usado=TRUE WHERE id=:id"), {"id":rec['id']})
-    db.commit()
+    # Consumo atómico: si otra petición lo usó entre medias, se rechaza
+    if not await otp_store.consume(rec):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="OTP inválido o expirado.")
     return {"status":"success", "message":"✅ OTP verificado."}
 
 @router.post("/reset_radius_password")
 async def reset_radius_password(
     payload: ResetRadiusRequest,
     request: Request,
-    settings: Settings = Depends(get_settings),
-    db_otp: Session = Depends(get_db)
+    settings: Settings = Depends(get_settings)
 ) -> Dict:
-    rec = db_otp.execute(text(
-        "SELECT * FROM otp_tokens WHERE cedula=:c AND codigo_otp=:o "
-        "ORDER BY id DESC LIMIT 1"
-    ), {"c":payload.username, "o":payload.confirm_data}).mappings().first()
+    rec = await otp_store.find(payload.username, payload.confirm_data)
     if not rec or rec['expiracion'] < datetime.utcnow():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="OTP inválido o expirado.")
 
-    change_radius_password(
-        payload.username,
-        payload.new_password,
-        payload.grupo,
-        request.client.host
-    )
-    db_otp.execute(text("UPDATE otp_tokens SET usado=TRUE WHERE id=:id"), {"id":rec['id']})
-    db_otp.commit()
+    try:
+        await run_db(
+            change_radius_password,
+            payload.username,
+            payload.new_password,
+            payload.grupo,
+            request.client.host
+        )
+    except HTTPException as e:
+        # El índice de cuentas pudo dar por existente una cuenta ya borrada:
+        # se comprueba en vivo para que no vuelva a ofrecerse
+        if e.status_code == status.HTTP_404_NOT_FOUND:
+            user_type = "estudiante" if payload.grupo.lower() == "estudiantes" else "servidor"
+            await _confirmar_cuenta("wifi", user_type, payload.username)
+        raise
+    await otp_store.mark_used(rec)
     return {"status":"success", "message":"🎉 Contraseña WiFi actualizada correctamente."}
 
 @router.post("/reset_zoom_password")
 async def reset_zoom_password(
     payload: ResetRadiusRequest,
     request: Request,
-    settings: Settings = Depends(get_settings),
-    db_otp: Session = Depends(get_db)
+    settings: Settings = Depends(get_settings)
 ) -> Dict:
     # 1) Validar OTP
-    rec = db_otp.execute(text(
-        "SELECT * FROM otp_tokens WHERE cedula=:c AND codigo_otp=:o "
-        "ORDER BY id DESC LIMIT 1"
-    ), {"c": payload.username, "o": payload.confirm_data}).mappings().first()
+    rec = await otp_store.find(payload.username, payload.confirm_data)
     if not rec or rec["expiracion"] < datetime.utcnow():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="OTP inválido o expirado.")
 
-    # 2) Cambiar contraseña en LDAP
-    change_ldap_zoom_password(
-        username=payload.username,
-        new_password=payload.new_password,
-        settings=settings,        # le pasamos todo Settings
-        db=db_otp,
-        client_ip=request.client.host
-    )
+    # 2) Cambiar contraseña en LDAP (y registrar el cambio en la BD)
+    try:
+        await asyncio.to_thread(
+            change_ldap_zoom_password,
+            username=payload.username,
+            new_password=payload.new_password,
+            settings=settings,        # le pasamos todo Settings
+            client_ip=request.client.host
+        )
+    except Exception:
+        if await _confirmar_cuenta("zoom", "*", payload.username) is False:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado en Zoom.")
+        raise
 
     # 3) Marcar OTP como usado
-    db_otp.execute(
-        text("UPDATE otp_tokens SET usado=TRUE WHERE id=:id"),
-        {"id": rec["id"]}
-    )
-    db_otp.commit()
+    await otp_store.mark_used(rec)
 
     return {"status": "success", "message": "🎉 Contraseña Zoom actualizada correctamente."}
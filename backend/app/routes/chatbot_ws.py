@@ -0,0 +1,170 @@
+# app/routes/chatbot_ws.py
+
+import asyncio
+import json
+import logging
+import math
+from typing import Dict
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+
+from app.config.settings import get_settings
+from app.routes.chatbot_routes import (
+    CheckAccountRequest, EnviarOtpRequest, GetUserInfoRequest, QuestionRequest,
+    ResetRadiusRequest, VerificarOtpRequest,
+    chatbot_query, check_account, enviar_otp, get_user_info,
+    reset_radius_password, reset_zoom_password, verificar_otp,
+)
+from app.utils.admission import admission, ip_cliente, mensaje_rechazo
+
+logger = logging.getLogger("uvicorn.error")
+settings = get_settings()
+router = APIRouter(prefix="/api/chatbot", tags=["Chatbot"])
+
+# Mensajes aceptados por el canal: tipo → (esquema, handler REST). Los
+# handlers son los mismos de chatbot_routes; de la petición solo usan
+# `client` y `headers`, que el WebSocket también expone.
+_HANDLERS = {
+    "query": (QuestionRequest, lambda p, ws: chatbot_query(p, ws, settings)),
+    "get_user_info": (GetUserInfoRequest, lambda p, ws: get_user_info(p)),
+    "check_account": (CheckAccountRequest, lambda p, ws: check_account(p)),
+    "enviar_otp": (EnviarOtpRequest, lambda p, ws: enviar_otp(p, ws, settings)),
+    "verificar_otp": (VerificarOtpRequest, lambda p, ws: verificar_otp(p)),
+    "reset_radius_password": (ResetRadiusRequest, lambda p, ws: reset_radius_password(p, ws, settings)),
+    "reset_zoom_password": (ResetRadiusRequest, lambda p, ws: reset_zoom_password(p, ws, settings)),
+}
+
+
+class _Estado:
+    def __init__(self):
+        self.conexiones = 0
+        self.max_conexiones = 0
+        self.mensajes = 0
+        self.rechazadas = 0
+        self.cierres_inactividad = 0
+
+    def stats(self) -> Dict:
+        return dict(vars(self))
+
+
+ws_state = _Estado()
+
+# Referencias fuertes a las respuestas en curso (asyncio solo guarda débiles)
+_pendientes: set = set()
+
+
+def _origen_permitido(ws: WebSocket) -> bool:
+    # CORS no se aplica a WebSocket: se valida el Origin contra la misma lista
+    origenes = settings.CORS_ORIGINS
+    if not origenes or "*" in origenes:
+        return True
+    return ws.headers.get("origin") in origenes
+
+
+async def _atender(ws: WebSocket, tipo: str, datos: Dict) -> Dict:
+    """Ejecuta un mensaje con la misma semántica que su endpoint REST: devuelve status y cuerpo."""
+    entrada = _HANDLERS.get(tipo)
+    if entrada is None:
+        return {"status": 404, "body": {"detail": f"Tipo de mensaje desconocido: {tipo}"}}
+
+    carril = None
+    if settings.ADMISSION_ENABLED:
+        ip = ip_cliente(ws.scope, settings.ADMISSION_TRUSTED_PROXIES)
+        codigo, espera, carril = admission.admit(ip, f"/api/chatbot/{tipo}")
+        if codigo is not None:
+            ws_state.rechazadas += 1
+            return {
+                "status": codigo,
+                "retry_after": max(1, math.ceil(espera)),
+                "body": {"detail": mensaje_rechazo(codigo)},
+            }
+
+    esquema, handler = entrada
+    try:
+        return {"status": 200, "body": await handler(esquema(**(datos or {})), ws)}
+    except ValidationError as e:
+        return {"status": 422, "body": {"detail": json.loads(e.json())}}
+    except HTTPException as e:
+        return {"status": e.status_code, "body": {"detail": e.detail}}
+    except Exception as e:
+        logger.error("[WS] Error atendiendo %s: %s", tipo, e)
+        return {"status": 500, "body": {"detail": "Error interno del servidor."}}
+    finally:
+        if carril == "modelo":
+            admission.release()
+
+
+@router.get("/ws_stats")
+async def estadisticas_ws() -> Dict:
+    """Conexiones WebSocket abiertas, mensajes atendidos y cierres por inactividad."""
+    return {**ws_state.stats(), "en_curso": len(_pendientes)}
+
+
+@router.websocket("/ws")
+async def chatbot_ws(ws: WebSocket):
+    """
+    Canal persistente del widget. Cada mensaje es
+    {"id": n, "tipo": "query" | "get_user_info" | ..., "datos": {...}} y se
+    responde con {"id": n, "status": ..., "body": ...}, igual que el endpoint
+    REST del mismo nombre. Cada conexión atiende como mucho WS_MAX_PENDING
+    mensajes a la vez: mientras estén ocupados no se lee más del socket (el
+    cliente queda frenado por TCP). Se cierra tras WS_IDLE_SECONDS sin mensajes.
+    """
+    if not _origen_permitido(ws):
+        await ws.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if ws_state.conexiones >= settings.WS_MAX_CONNECTIONS:
+        await ws.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    await ws.accept()
+    ws_state.conexiones += 1
+    ws_state.max_conexiones = max(ws_state.max_conexiones, ws_state.conexiones)
+    cupos = asyncio.Semaphore(settings.WS_MAX_PENDING)
+    envio = asyncio.Lock()
+
+    async def responder(msg_id, tipo: str, datos: Dict) -> None:
+        try:
+            respuesta = await _atender(ws, tipo, datos)
+            async with envio:
+                await ws.send_json({"id": msg_id, **respuesta})
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            cupos.release()
+
+    try:
+        while True:
+            await cupos.acquire()
+            try:
+                recibido = await asyncio.wait_for(ws.receive(), timeout=settings.WS_IDLE_SECONDS)
+            except asyncio.TimeoutError:
+                ws_state.cierres_inactividad += 1
+                await ws.close(code=status.WS_1000_NORMAL_CLOSURE)
+                break
+            if recibido["type"] == "websocket.disconnect":
+                break
+            texto = recibido.get("text") or ""
+            if len(texto) > settings.WS_MAX_MESSAGE_BYTES:
+                await ws.close(code=status.WS_1009_MESSAGE_TOO_BIG)
+                break
+            try:
+                mensaje = json.loads(texto)
+                msg_id, tipo, datos = mensaje.get("id"), mensaje["tipo"], mensaje.get("datos")
+            except (ValueError, KeyError, AttributeError):
+                cupos.release()
+                async with envio:
+                    await ws.send_json({"status": 400, "body": {"detail": "Mensaje mal formado."}})
+                continue
+
+            ws_state.mensajes += 1
+            tarea = asyncio.create_task(responder(msg_id, tipo, datos))
+            _pendientes.add(tarea)
+            tarea.add_done_callback(_pendientes.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Las respuestas en curso terminan igual (un cambio de contraseña a
+        # medias no se cancela); su envío falla en silencio
+        ws_state.conexiones -= 1
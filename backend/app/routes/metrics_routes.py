@@ -0,0 +1,66 @@
+# app/routes/metrics_routes.py
+
+from fastapi import APIRouter, Response
+
+from app.routes.chatbot_ws import ws_state
+from app.routes.unach_client import get_unach_api
+from app.services.answer_cache import answer_cache
+from app.services.inference_queue import encoder_queue
+from app.services.intent_router import fast_path
+from app.services.otp_store import otp_store
+from app.utils.admission import admission
+from app.utils.metrics import CONTENT_TYPE, REGISTRY, CallbackMetric
+
+router = APIRouter(tags=["Métricas"])
+
+
+# ------------------------ Métricas leídas de las estadísticas existentes ------------------------
+def _caches():
+    """(nombre, aciertos, fallos) de cada caché; el fast path cuenta como caché del modelo."""
+    exacta = answer_cache.exact.stats()
+    semantica = answer_cache.stats()["semantic"]
+    rapida = fast_path.stats()
+    filas = [
+        ("respuestas_exacta", exacta["hits"], exacta["misses"]),
+        ("respuestas_semantica", semantica["hits"], semantica["misses"]),
+        ("fast_path", rapida["modelo_omitido"], rapida["consultas"] - rapida["modelo_omitido"]),
+    ]
+    api = get_unach_api().stats().get("cache")
+    if api:
+        filas.append(("unach_api", api["hits"], api["misses"]))
+    otp = otp_store.stats()["memoria"]
+    filas.append(("otp", otp["hits"], otp["misses"]))
+    return filas
+
+
+CallbackMetric(
+    "unachito_cache_hits_total", "Aciertos por caché", "counter", ("cache",),
+    lambda: [((nombre,), h) for nombre, h, _ in _caches()],
+)
+CallbackMetric(
+    "unachito_cache_misses_total", "Fallos por caché", "counter", ("cache",),
+    lambda: [((nombre,), m) for nombre, _, m in _caches()],
+)
+CallbackMetric(
+    "unachito_encode_queue", "Textos esperando en la cola de inferencia", "gauge", (),
+    lambda: [((), encoder_queue.stats()["queued"])],
+)
+CallbackMetric(
+    "unachito_admission_inflight", "Peticiones de modelo en curso", "gauge", (),
+    lambda: [((), admission.stats()["en_curso_modelo"])],
+)
+CallbackMetric(
+    "unachito_admission_rejected_total", "Peticiones rechazadas por el control de admisión", "counter",
+    ("motivo",),
+    lambda: [((motivo,), n) for motivo, n in admission.stats()["rechazadas"].items()],
+)
+CallbackMetric(
+    "unachito_websocket_connections", "Conexiones WebSocket abiertas", "gauge", (),
+    lambda: [((), ws_state.conexiones)],
+)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Métricas del worker en formato de texto de Prometheus."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -1,14 +1,27 @@
+import asyncio
 import logging
-from typing import Optional, Literal, Dict, Any
+import threading
+import time
+from typing import Optional, Literal, Dict, Any, Iterable, List, Tuple
 import requests
 from requests.adapters import HTTPAdapter, Retry
 from app.config.settings import get_settings
+from app.utils.batcher import MicroBatcher
+from app.utils.metrics import DEPENDENCY_SECONDS
+from app.utils.ttl_cache import TTLCache
 
 logger = logging.getLogger("uvicorn.error")
 settings = get_settings()
 
 UserType = Literal["servidor", "estudiante"]
 
+# Resultado de una llamada fallida (red, 5xx...): a diferencia de "no encontrado", no se cachea
+_FALLO = object()
+# Marca en caché de una cédula que la API no conoce
+_NO_ENCONTRADO = object()
+# Campos en los que InformacionBasicaPorCI devuelve la cédula de cada registro
+_CAMPOS_CEDULA = ("cedula", "numeroIdentificacion", "identificacion", "ci")
+
 class UnachApi:
     """
     Cliente HTTP para las APIs de UNACH (servidores y estudiantes).
@@ -18,7 +31,14 @@ class UnachApi:
         self,
         verify_ssl: bool = False,
         timeout: float = 10.0,
-        max_retries: int = 3
+        max_retries: int = 3,
+        pool_size: int = 10,
+        cache_size: int = 0,
+        cache_ttl: float = 600.0,
+        negative_ttl: float = 60.0,
+        batch_size: int = 50,
+        coalesce_ms: float = 0.0,
+        coalesce_workers: int = 4
     ):
         self.timeout = timeout
         # URLs base (sin slash final)
@@ -38,7 +58,12 @@ class UnachApi:
             status_forcelist=[500, 502, 503, 504],
             allowed_methods=["GET", "POST"],
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Conexiones keep-alive reutilizadas entre peticiones (por host)
+        adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=pool_size,
+            pool_maxsize=pool_size
+        )
 
         # Creamos una sesión por tipo de usuario
         self.sessions: Dict[UserType, requests.Session] = {}
@@ -50,14 +75,39 @@ class UnachApi:
             s.mount("http://", adapter)
             self.sessions[ut] = s
 
+        # Caché de get_por_cedula por (cedula, user_type); 0 = sin caché.
+        # Las cédulas no encontradas se guardan con negative_ttl.
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl) if cache_size > 0 else None
+        self.negative_ttl = negative_ttl
+        self._stats_lock = threading.Lock()
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+        self.upstream_cedulas = 0
+        self.total_upstream_ms = 0.0
+
+        # Consultas de estudiantes: hasta batch_size cédulas por POST. Con
+        # coalesce_ms > 0 las consultas sueltas que llegan dentro de esa
+        # ventana se agrupan en una sola llamada; varias llamadas agrupadas
+        # pueden estar en curso a la vez para no esperar a la anterior.
+        self.batch_size = max(1, batch_size)
+        self._coalescer = MicroBatcher(
+            self._lote_estudiantes,
+            max_batch=self.batch_size,
+            max_wait_ms=coalesce_ms,
+            name="unach-estudiantes",
+            workers=coalesce_workers
+        ) if coalesce_ms > 0 else None
+
     def _get(self, session: requests.Session, url: str) -> Optional[Any]:
         try:
             r = session.get(url, timeout=self.timeout)
             r.raise_for_status()
             return r.json()
         except requests.RequestException as e:
+            if _es_404(e):
+                return None
             logger.error("Error GET %s: %s", url, e)
-        return None
+        return _FALLO
 
     def _post(self, session: requests.Session, url: str, json_body: Any) -> Optional[Any]:
         try:
@@ -65,8 +115,10 @@ class UnachApi:
             r.raise_for_status()
             return r.json()
         except requests.RequestException as e:
+            if _es_404(e):
+                return None
             logger.error("Error POST %s %s: %s", url, json_body, e)
-        return None
+        return _FALLO
 
     def get_por_cedula(
         self,
@@ -77,31 +129,133 @@ class UnachApi:
         Devuelve datos crudos de servidor o estudiante según user_type.
         - Servidor: GET /api/Servidores/Buscar/{cedula}
         - Estudiante: POST /api/Estudiante/InformacionBasicaPorCI  body=["cedula"]
+        Con caché activa, una cédula ya consultada (encontrada o no) no vuelve
+        a la API hasta que caduque su entrada; los errores no se cachean.
         """
         if user_type not in self.sessions:
             logger.error("Tipo de usuario inválido: %s", user_type)
             return None
 
-        session = self.sessions[user_type]
-
-        if user_type == "servidor":
-            url = f"{self.servidor_base_url}/api/Servidores/Buscar/{cedula}"
-            data = self._get(session, url)
-        else:
-            url = f"{self.estudiante_base_url}/api/Estudiante/InformacionBasicaPorCI"
-            # aquí va un POST con un array de cédula
-            data = self._post(session, url, [cedula])
+        encontrado, usuario = self._desde_cache(cedula, user_type)
+        if encontrado:
+            return usuario
+        if user_type == "estudiante":
+            return self._buscar_estudiantes([cedula]).get(cedula)
 
-        if not data:
+        url = f"{self.servidor_base_url}/api/Servidores/Buscar/{cedula}"
+        t0 = time.perf_counter()
+        data = self._get(self.sessions["servidor"], url)
+        self._registrar_llamada(t0, 1, data)
+        if data is _FALLO:
             return None
 
-        # Puede venir lista o dict en ambos casos
+        usuario = None
+        # Puede venir lista o dict
         if isinstance(data, list):
-            return data[0] if data else None
-        if isinstance(data, dict):
-            return data
+            usuario = data[0] if data else None
+        elif isinstance(data, dict):
+            usuario = data
+        self._a_cache(cedula, user_type, usuario)
+        return usuario
 
-        return None
+    def get_por_cedulas(
+        self,
+        cedulas: Iterable[str],
+        user_type: UserType
+    ) -> Dict[str, Optional[dict]]:
+        """
+        Consulta por lotes: {cedula: datos o None}. Para estudiantes las
+        cédulas que no están en caché se envían en arrays de hasta
+        batch_size al endpoint InformacionBasicaPorCI; la API de servidores
+        no tiene endpoint por lotes y se consulta una a una.
+        """
+        if user_type not in self.sessions:
+            logger.error("Tipo de usuario inválido: %s", user_type)
+            return {}
+
+        resultado: Dict[str, Optional[dict]] = {}
+        pendientes = []
+        for cedula in dict.fromkeys(cedulas):
+            encontrado, usuario = self._desde_cache(cedula, user_type)
+            if encontrado:
+                resultado[cedula] = usuario
+            else:
+                pendientes.append(cedula)
+
+        if user_type == "estudiante":
+            resultado.update(self._buscar_estudiantes(pendientes))
+        else:
+            for cedula in pendientes:
+                resultado[cedula] = self.get_por_cedula(cedula, user_type)
+        return resultado
+
+    def _buscar_estudiantes(self, cedulas: List[str]) -> Dict[str, Optional[dict]]:
+        """
+        POST InformacionBasicaPorCI por trozos de batch_size (sin mirar la
+        caché). Una cédula de un lote a la que no se le pudo asignar ningún
+        registro se vuelve a consultar sola antes de darla por no encontrada.
+        """
+        resultado: Dict[str, Optional[dict]] = {}
+        for i in range(0, len(cedulas), self.batch_size):
+            lote = cedulas[i:i + self.batch_size]
+            data = self._post_estudiantes(lote)
+            if data is _FALLO:
+                resultado.update(dict.fromkeys(lote))
+                continue
+            por_cedula = _asignar_por_cedula(data, lote)
+            for cedula in lote:
+                if cedula not in por_cedula and len(lote) > 1:
+                    data = self._post_estudiantes([cedula])
+                    if data is _FALLO:
+                        resultado[cedula] = None
+                        continue
+                    por_cedula.update(_asignar_por_cedula(data, [cedula]))
+                usuario = por_cedula.get(cedula)
+                resultado[cedula] = usuario
+                self._a_cache(cedula, "estudiante", usuario)
+        return resultado
+
+    def _post_estudiantes(self, lote: List[str]) -> Any:
+        url = f"{self.estudiante_base_url}/api/Estudiante/InformacionBasicaPorCI"
+        t0 = time.perf_counter()
+        # aquí va un POST con un array de cédulas
+        data = self._post(self.sessions["estudiante"], url, lote)
+        self._registrar_llamada(t0, len(lote), data)
+        return data
+
+    def _lote_estudiantes(self, cedulas: List[str]) -> List[Optional[dict]]:
+        # Función del MicroBatcher: un resultado por cada consulta agrupada
+        resultado = self._buscar_estudiantes(list(dict.fromkeys(cedulas)))
+        return [resultado.get(c) for c in cedulas]
+
+    def _desde_cache(self, cedula: str, user_type: UserType) -> Tuple[bool, Optional[dict]]:
+        """(True, datos o None) si la cédula está en caché; (False, None) si hay que consultarla."""
+        if self.cache is None:
+            return False, None
+        cached = self.cache.get((cedula, user_type))
+        if cached is None:
+            return False, None
+        return True, (None if cached is _NO_ENCONTRADO else cached)
+
+    def _a_cache(self, cedula: str, user_type: UserType, usuario: Optional[dict]) -> None:
+        if self.cache is None:
+            return
+        if usuario is None:
+            self.cache.set((cedula, user_type), _NO_ENCONTRADO, ttl=self.negative_ttl)
+        else:
+            self.cache.set((cedula, user_type), usuario)
+
+    def _registrar_llamada(self, t0: float, n_cedulas: int, data: Any) -> None:
+        DEPENDENCY_SECONDS.observe(
+            time.perf_counter() - t0, "unach_api", "lote" if n_cedulas > 1 else "cedula",
+            "error" if data is _FALLO else "ok"
+        )
+        with self._stats_lock:
+            self.upstream_calls += 1
+            self.upstream_cedulas += n_cedulas
+            if data is _FALLO:
+                self.upstream_errors += 1
+            self.total_upstream_ms += (time.perf_counter() - t0) * 1000
 
     def get_correo_por_cedula(
         self,
@@ -111,16 +265,7 @@ class UnachApi:
         """
         Extrae correo principal o temporal del usuario.
         """
-        usuario = self.get_por_cedula(cedula, user_type)
-        if not usuario:
-            logger.info("%s no encontrado: %s", user_type, cedula)
-            return None
-        for key in ("correoElectronico", "correoElectronicoTmp", "correoInstitucional"):
-            c = usuario.get(key)
-            if isinstance(c, str) and c.strip():
-                return c.strip()
-        logger.info("%s %s sin correo disponible", user_type, cedula)
-        return None
+        return _correo_de(self.get_por_cedula(cedula, user_type), cedula, user_type)
 
     def get_nombre_por_cedula(
         self,
@@ -131,22 +276,167 @@ class UnachApi:
         Construye nombre completo (nombres + primer apellido).
         Para estudiantes también intenta 'nombresCompletos'.
         """
-        usuario = self.get_por_cedula(cedula, user_type)
-        if not usuario:
-            return None
+        return _nombre_de(self.get_por_cedula(cedula, user_type))
 
-        nombres = (
-            usuario.get("nombresCompletos")
-            or usuario.get("nombres")
-            or usuario.get("nombre")
-            or ""
-        )
-        apellido = (
-            usuario.get("apellidoPaterno")
-            or usuario.get("apellidoMaterno")
-            or usuario.get("apellido")
-            or ""
-        )
+    # ------------------------ Versiones async (hilo de trabajo) ------------------------
+    async def get_por_cedula_async(self, cedula: str, user_type: UserType) -> Optional[dict]:
+        if user_type == "estudiante" and self._coalescer is not None:
+            encontrado, usuario = self._desde_cache(cedula, user_type)
+            if encontrado:
+                return usuario
+            return await self._coalescer.submit(cedula)
+        return await asyncio.to_thread(self.get_por_cedula, cedula, user_type)
+
+    async def get_por_cedulas_async(self, cedulas: Iterable[str], user_type: UserType) -> Dict[str, Optional[dict]]:
+        return await asyncio.to_thread(self.get_por_cedulas, list(cedulas), user_type)
+
+    async def get_correo_por_cedula_async(self, cedula: str, user_type: UserType) -> Optional[str]:
+        return _correo_de(await self.get_por_cedula_async(cedula, user_type), cedula, user_type)
+
+    async def get_nombre_por_cedula_async(self, cedula: str, user_type: UserType) -> Optional[str]:
+        return _nombre_de(await self.get_por_cedula_async(cedula, user_type))
+
+    async def close(self) -> None:
+        if self._coalescer is not None:
+            await self._coalescer.close()
+        for s in self.sessions.values():
+            s.close()
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            info = {
+                "upstream_calls": self.upstream_calls,
+                "upstream_errors": self.upstream_errors,
+                "cedulas_por_llamada": (
+                    round(self.upstream_cedulas / self.upstream_calls, 2) if self.upstream_calls else 0.0
+                ),
+                "avg_upstream_ms": (
+                    round(self.total_upstream_ms / self.upstream_calls, 2) if self.upstream_calls else 0.0
+                ),
+            }
+        if self.cache is not None:
+            info["cache"] = self.cache.stats()
+        if self._coalescer is not None:
+            info["coalescer"] = self._coalescer.stats()
+        return info
+
+
+def _es_404(e: requests.RequestException) -> bool:
+    return isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code == 404
+
+
+def _asignar_por_cedula(data: Any, lote: List[str]) -> Dict[str, dict]:
+    """
+    Reparte la respuesta de InformacionBasicaPorCI entre las cédulas pedidas
+    según el campo de cédula de cada registro (_CAMPOS_CEDULA; se ignoran los
+    ceros a la izquierda, que se pierden si la API la devuelve como número).
+    Con una sola cédula se conserva el comportamiento original (primer registro).
+    """
+    registros = data if isinstance(data, list) else [data] if isinstance(data, dict) else []
+    registros = [r for r in registros if isinstance(r, dict)]
+    if len(lote) == 1:
+        return {lote[0]: registros[0]} if registros else {}
+
+    pedidas = {_clave_cedula(c): c for c in lote}
+    resultado: Dict[str, dict] = {}
+    for registro in registros:
+        for campo in _CAMPOS_CEDULA:
+            valor = registro.get(campo)
+            if isinstance(valor, (str, int)) and _clave_cedula(valor) in pedidas:
+                resultado.setdefault(pedidas[_clave_cedula(valor)], registro)
+                break
+    return resultado
+
+
+def _clave_cedula(valor: Any) -> str:
+    return str(valor).strip().lstrip("0")
+
+
+def _correo_de(usuario: Optional[dict], cedula: str, user_type: str) -> Optional[str]:
+    """Correo principal o temporal del usuario."""
+    if not usuario:
+        logger.info("%s no encontrado: %s", user_type, cedula)
+        return None
+    for key in ("correoElectronico", "correoElectronicoTmp", "correoInstitucional"):
+        c = usuario.get(key)
+        if isinstance(c, str) and c.strip():
+            return c.strip()
+    logger.info("%s %s sin correo disponible", user_type, cedula)
+    return None
+
+
+def _nombre_de(usuario: Optional[dict]) -> Optional[str]:
+    """Nombre completo (nombres + primer apellido); para estudiantes también 'nombresCompletos'."""
+    if not usuario:
+        return None
+
+    nombres = (
+        usuario.get("nombresCompletos")
+        or usuario.get("nombres")
+        or usuario.get("nombre")
+        or ""
+    )
+    apellido = (
+        usuario.get("apellidoPaterno")
+        or usuario.get("apellidoMaterno")
+        or usuario.get("apellido")
+        or ""
+    )
+
+    full = f"{nombres} {apellido}".strip()
+    return full or None
+
+
+# ------------------------ SINGLETON Y FUNCIÓN DE ACCESO ------------------------
+_api: Optional[UnachApi] = None
+_api_lock = threading.Lock()
+
+def get_unach_api() -> UnachApi:
+    """
+    Cliente compartido por el proceso: sesiones keep-alive y caché de
+    consultas por cédula comunes a todas las peticiones.
+    """
+    global _api
+    if _api is None:
+        with _api_lock:
+            if _api is None:
+                _api = UnachApi(
+                    verify_ssl=False,
+                    pool_size=settings.UNACH_API_POOL_SIZE,
+                    cache_size=settings.UNACH_CACHE_SIZE,
+                    cache_ttl=settings.UNACH_CACHE_TTL,
+                    negative_ttl=settings.UNACH_CACHE_NEGATIVE_TTL,
+                    batch_size=settings.UNACH_BATCH_SIZE,
+                    coalesce_ms=settings.UNACH_COALESCE_MS,
+                    coalesce_workers=settings.UNACH_COALESCE_WORKERS
+                )
+    return _api
+
+
+async def close_unach_api() -> None:
+    if _api is not None:
+        await _api.close()
+
+
+if __name__ == "__main__":
+    # Validación masiva (p. ej. al inicio del semestre): una cédula por línea
+    #   python -m app.routes.unach_client cedulas.txt [estudiante|servidor]
+    import sys
+
+    archivo = sys.argv[1]
+    tipo = sys.argv[2] if len(sys.argv) > 2 else "estudiante"
+    with open(archivo, encoding="utf-8") as f:
+        cedulas = [linea.strip() for linea in f if linea.strip()]
 
-        full = f"{nombres} {apellido}".strip()
-        return full or None
+    api = get_unach_api()
+    t0 = time.perf_counter()
+    resultados = api.get_por_cedulas(cedulas, tipo)
+    for cedula in cedulas:
+        usuario = resultados.get(cedula)
+        print(f"{cedula}\t{'si' if usuario else 'no'}\t{_correo_de(usuario, cedula, tipo) or ''}")
+    encontrados = sum(1 for u in resultados.values() if u)
+    print(
+        f"# {encontrados}/{len(resultados)} encontrados en {time.perf_counter() - t0:.2f}s; "
+        f"{api.stats()['upstream_calls']} llamadas a la API",
+        file=sys.stderr
+    )
@@ -0,0 +1,275 @@
+# app/services/account_index.py
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+import ldap3
+import numpy as np
+from sqlalchemy import text
+
+from app.config.settings import get_settings
+from app.services.ldap_service import get_zoom_pool, zoom_account_exists
+from app.utils.db import SessionLocalEstudiantes, SessionLocalServidores, run_db
+
+logger = logging.getLogger("uvicorn.error")
+settings = get_settings()
+
+# Las sincronizaciones incrementales de LDAP releen desde unos minutos antes
+# de la anterior: cubre el desfase de reloj entre el worker y el directorio
+_SOLAPE_LDAP = 300.0
+
+
+def _hash(username: str) -> int:
+    return int.from_bytes(hashlib.blake2b(username.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class CompactSet:
+    """
+    Conjunto de nombres de usuario guardado como hashes de 64 bits en un
+    array ordenado (8 bytes por cuenta, búsqueda binaria). Las altas
+    incrementales van a un set pequeño que se fusiona al superar `merge_at`;
+    las bajas conocidas se anotan aparte hasta la próxima reconstrucción.
+    """
+
+    def __init__(self, usernames: Iterable[str] = (), merge_at: int = 1024):
+        self.merge_at = merge_at
+        self._hashes = np.unique(np.fromiter((_hash(u) for u in usernames), dtype=np.uint64))
+        self._nuevos: set = set()
+        self._bajas: set = set()
+        self._lock = threading.Lock()
+
+    def _en_array(self, h: int) -> bool:
+        hashes = self._hashes
+        i = int(np.searchsorted(hashes, np.uint64(h)))
+        return i < len(hashes) and int(hashes[i]) == h
+
+    def __contains__(self, username: str) -> bool:
+        h = _hash(username)
+        return h not in self._bajas and (h in self._nuevos or self._en_array(h))
+
+    def add_many(self, usernames: Iterable[str]) -> None:
+        with self._lock:
+            hashes = set(map(_hash, usernames))
+            self._bajas -= hashes
+            self._nuevos.update(h for h in hashes if not self._en_array(h))
+            if len(self._nuevos) >= self.merge_at:
+                self._fusionar()
+
+    def discard(self, username: str) -> None:
+        h = _hash(username)
+        with self._lock:
+            self._nuevos.discard(h)
+            if self._en_array(h):
+                self._bajas.add(h)
+
+    def _fusionar(self) -> None:
+        nuevos = np.fromiter(self._nuevos, dtype=np.uint64, count=len(self._nuevos))
+        self._hashes = np.union1d(self._hashes, nuevos)
+        self._nuevos = set()
+
+    def __len__(self) -> int:
+        return len(self._hashes) + len(self._nuevos)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._hashes.nbytes) + 8 * (len(self._nuevos) + len(self._bajas))
+
+
+class _Indice:
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.cuentas: Optional[CompactSet] = None
+        self.watermark = 0            # último radcheck.id leído (solo RADIUS)
+        self.marca: Optional[str] = None  # modifyTimestamp desde el que releer (solo LDAP)
+        self.actualizado = 0.0        # monotonic de la última sincronización correcta
+        self.completo = 0.0           # monotonic de la última reconstrucción completa
+        self.aciertos = 0
+        self.consultas_vivas = 0
+
+
+# ------------------------ Consultas en vivo (respaldo) ------------------------
+def _radius_factory(user_type: str):
+    return SessionLocalEstudiantes if user_type == "estudiante" else SessionLocalServidores
+
+
+def existe_en_radius(cedula: str, user_type: str) -> bool:
+    with _radius_factory(user_type)() as session:
+        row = session.execute(
+            text("SELECT 1 FROM radcheck WHERE username = :u LIMIT 1"),
+            {"u": cedula}
+        ).first()
+        return row is not None
+
+
+class AccountIndex:
+    """
+    Índice en memoria de las cuentas existentes por servicio: usernames de
+    radcheck (estudiantes y servidores) y cn del LDAP de Zoom. Un acierto
+    con el índice al día se responde sin consultar MySQL ni LDAP; si la
+    cuenta no está o el índice está desactualizado (más de `max_age`
+    segundos sin sincronizar) se hace la consulta en vivo de siempre, y un
+    positivo en vivo se agrega al índice. Las bajas solo se ven en la
+    reconstrucción completa: entre medias, `confirm` comprueba en vivo una
+    cuenta cuyo cambio de contraseña falló y la retira si ya no existe.
+    """
+
+    def __init__(self, max_age: float = 900.0, batch: int = 5000):
+        self.max_age = max_age
+        self.batch = batch
+        self._indices: Dict[Tuple[str, str], _Indice] = {
+            ("wifi", "estudiante"): _Indice("radius_estudiantes"),
+            ("wifi", "servidor"): _Indice("radius_servidores"),
+            ("zoom", "*"): _Indice("ldap_zoom"),
+        }
+
+    def _indice(self, servicio: str, user_type: str) -> Optional[_Indice]:
+        if servicio == "zoom":
+            return self._indices[("zoom", "*")]
+        if servicio == "wifi":
+            return self._indices[("wifi", "estudiante" if user_type == "estudiante" else "servidor")]
+        return None
+
+    # ------------------------ Consulta ------------------------
+    async def exists(self, servicio: str, user_type: str, cedula: str) -> bool:
+        idx = self._indice(servicio, user_type)
+        if idx is None:
+            return False
+        fresco = idx.cuentas is not None and time.monotonic() - idx.actualizado <= self.max_age
+        if fresco and cedula in idx.cuentas:
+            idx.aciertos += 1
+            return True
+
+        return await self._en_vivo(idx, servicio, user_type, cedula)
+
+    async def confirm(self, servicio: str, user_type: str, cedula: str) -> bool:
+        """Consulta en vivo (sin mirar el índice) y actualiza el índice con el resultado."""
+        idx = self._indice(servicio, user_type)
+        if idx is None:
+            return False
+        return await self._en_vivo(idx, servicio, user_type, cedula)
+
+    async def _en_vivo(self, idx: _Indice, servicio: str, user_type: str, cedula: str) -> bool:
+        idx.consultas_vivas += 1
+        if servicio == "wifi":
+            existe = await run_db(existe_en_radius, cedula, user_type)
+        else:
+            existe = await asyncio.to_thread(zoom_account_exists, cedula)
+        if idx.cuentas is not None:
+            if existe:
+                idx.cuentas.add_many([cedula])
+            else:
+                idx.cuentas.discard(cedula)
+        return existe
+
+    # ------------------------ Sincronización ------------------------
+    def _sync_radius(self, user_type: str, completo: bool) -> int:
+        idx = self._indice("wifi", user_type)
+        desde = 0 if completo or idx.cuentas is None else idx.watermark
+        leidos = []
+        with _radius_factory(user_type)() as session:
+            while True:
+                filas = session.execute(text(
+                    "SELECT id, username FROM radcheck WHERE id > :w ORDER BY id LIMIT :n"
+                ), {"w": desde, "n": self.batch}).all()
+                if not filas:
+                    break
+                leidos.extend(u for _, u in filas)
+                desde = filas[-1][0]
+                if len(filas) < self.batch:
+                    break
+        if completo or idx.cuentas is None:
+            idx.cuentas = CompactSet(leidos)
+            idx.completo = time.monotonic()
+        else:
+            idx.cuentas.add_many(leidos)
+        idx.watermark = desde
+        idx.actualizado = time.monotonic()
+        return len(leidos)
+
+    def _sync_ldap(self, completo: bool) -> int:
+        idx = self._indices[("zoom", "*")]
+        completo = completo or idx.cuentas is None or idx.marca is None
+        inicio = datetime.utcnow() - timedelta(seconds=_SOLAPE_LDAP)
+        if completo:
+            filtro = "(cn=*)"
+        else:
+            # Solo las entradas creadas o modificadas desde la última lectura
+            filtro = f"(&(cn=*)(|(modifyTimestamp>={idx.marca})(createTimestamp>={idx.marca})))"
+
+        def listar(conn: ldap3.Connection):
+            cns = []
+            for entrada in conn.extend.standard.paged_search(
+                search_base=settings.LDAP_ZOOM_BASE_DN,
+                search_filter=filtro,
+                attributes=["cn"],
+                paged_size=1000,
+                generator=True
+            ):
+                cn = entrada.get("attributes", {}).get("cn")
+                cns.extend(cn if isinstance(cn, list) else [cn] if cn else [])
+            return cns
+
+        cns = get_zoom_pool().run(listar)
+        if completo:
+            idx.cuentas = CompactSet(cns)
+            idx.completo = time.monotonic()
+        else:
+            idx.cuentas.add_many(cns)
+        idx.marca = inicio.strftime("%Y%m%d%H%M%SZ")
+        idx.actualizado = time.monotonic()
+        return len(cns)
+
+    def refresh(self, full: bool = False, full_every: float = 3600.0) -> Dict:
+        """
+        Sincroniza los tres índices. RADIUS solo lee las filas nuevas de
+        radcheck (id mayor que el último visto) y LDAP las entradas creadas
+        o modificadas desde la lectura anterior (solo el atributo cn,
+        paginado), salvo en la reconstrucción completa, que se hace con
+        `full` o cada `full_every` segundos y recoge también las bajas. Un
+        origen caído no afecta a los demás.
+        """
+        resumen = {}
+        ahora = time.monotonic()
+        for (servicio, user_type), idx in self._indices.items():
+            completo = full or idx.cuentas is None or ahora - idx.completo >= full_every
+            try:
+                if servicio == "wifi":
+                    resumen[idx.nombre] = self._sync_radius(user_type, completo)
+                else:
+                    resumen[idx.nombre] = self._sync_ldap(completo)
+            except Exception as e:
+                logger.warning("[CUENTAS] No se pudo sincronizar %s: %s", idx.nombre, e)
+        return resumen
+
+    def stats(self) -> Dict:
+        ahora = time.monotonic()
+        return {
+            idx.nombre: {
+                "cuentas": len(idx.cuentas) if idx.cuentas is not None else 0,
+                "kb": round(idx.cuentas.nbytes / 1024, 1) if idx.cuentas is not None else 0.0,
+                "edad_s": round(ahora - idx.actualizado, 1) if idx.actualizado else None,
+                "aciertos": idx.aciertos,
+                "consultas_vivas": idx.consultas_vivas,
+            }
+            for idx in self._indices.values()
+        }
+
+
+# Instancia compartida por el proceso
+account_index = AccountIndex(max_age=settings.ACCOUNT_INDEX_MAX_AGE)
+
+
+async def periodic_account_refresh(interval: float, full_every: float) -> None:
+    """Tarea de fondo: carga inicial del índice y sincronización cada `interval` segundos."""
+    while True:
+        try:
+            resumen = await asyncio.to_thread(account_index.refresh, False, full_every)
+            logger.info("[CUENTAS] Índice sincronizado: %s", resumen)
+        except Exception as e:
+            logger.error("[CUENTAS] Error sincronizando el índice: %s", e)
+        await asyncio.sleep(interval)
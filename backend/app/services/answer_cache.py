@@ -0,0 +1,120 @@
+# app/services/answer_cache.py
+
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.utils.text_utils import normalizar_texto
+from app.utils.ttl_cache import TTLCache
+
+
+class AnswerCache:
+    """
+    Caché de respuestas de /query en dos niveles:
+      1) coincidencia exacta del texto normalizado (LRU + TTL);
+      2) semántica: reutiliza la respuesta de una pregunta casi idéntica
+         cuyo embedding supera `umbral` de similitud.
+    Cada `invalidate` avanza `generacion`: quien resolvió la pregunta con el
+    estado anterior de las FAQs pasa la generación leída antes de resolverla
+    y su `put` se descarta, en vez de volver a guardar una respuesta obsoleta.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 2048,
+        ttl: float = 3600.0,
+        semantic_size: int = 1024,
+        umbral: float = 0.95
+    ):
+        self.exact = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        self.semantic_size = semantic_size
+        self.umbral = umbral
+        self._lock = threading.Lock()
+        self._emb: Optional[np.ndarray] = None
+        self._respuestas: list = [None] * semantic_size
+        self._expira = np.zeros(semantic_size)
+        self._siguiente = 0
+        self.semantic_hits = 0
+        self.semantic_misses = 0
+        self.generacion = 0
+        self.descartadas = 0
+
+    # ------------------------ NIVEL 1 ------------------------
+    def get(self, pregunta: str) -> Optional[Dict]:
+        resp = self.exact.get(normalizar_texto(pregunta))
+        return dict(resp) if resp is not None else None
+
+    # ------------------------ NIVEL 2 ------------------------
+    def get_semantic(self, emb: np.ndarray) -> Optional[Dict]:
+        with self._lock:
+            if self._emb is None or self.semantic_size == 0:
+                self.semantic_misses += 1
+                return None
+            sims = self._emb @ emb
+            sims[self._expira < time.monotonic()] = -1.0
+            idx = int(sims.argmax())
+            if sims[idx] >= self.umbral and self._respuestas[idx] is not None:
+                self.semantic_hits += 1
+                return dict(self._respuestas[idx])
+            self.semantic_misses += 1
+            return None
+
+    def put(
+        self,
+        pregunta: str,
+        emb: Optional[np.ndarray],
+        respuesta: Dict,
+        generacion: Optional[int] = None
+    ) -> None:
+        with self._lock:
+            if generacion is not None and generacion != self.generacion:
+                self.descartadas += 1
+                return
+            self.exact.set(normalizar_texto(pregunta), dict(respuesta))
+            if emb is None or self.semantic_size == 0:
+                return
+            if self._emb is None:
+                self._emb = np.zeros((self.semantic_size, len(emb)), dtype=np.float32)
+            # Búfer circular: se sobrescribe la entrada más antigua
+            i = self._siguiente
+            self._emb[i] = emb
+            self._respuestas[i] = dict(respuesta)
+            self._expira[i] = time.monotonic() + self.ttl
+            self._siguiente = (i + 1) % self.semantic_size
+
+    def invalidate(self) -> None:
+        """Vacía ambos niveles (p. ej. al recargar la caché de FAQs)."""
+        with self._lock:
+            self.generacion += 1
+            self.exact.clear()
+            self._emb = None
+            self._respuestas = [None] * self.semantic_size
+            self._expira = np.zeros(self.semantic_size)
+            self._siguiente = 0
+
+    def stats(self) -> Dict:
+        sem_total = self.semantic_hits + self.semantic_misses
+        return {
+            "exact": self.exact.stats(),
+            "semantic": {
+                "hits": self.semantic_hits,
+                "misses": self.semantic_misses,
+                "hit_rate": round(self.semantic_hits / sem_total, 4) if sem_total else 0.0,
+                "umbral": self.umbral,
+            },
+            "generacion": self.generacion,
+            "descartadas": self.descartadas,
+        }
+
+
+_settings = get_settings()
+answer_cache = AnswerCache(
+    maxsize=_settings.ANSWER_CACHE_SIZE,
+    ttl=_settings.ANSWER_CACHE_TTL,
+    semantic_size=_settings.SEMANTIC_CACHE_SIZE,
+    umbral=_settings.SEMANTIC_CACHE_THRESHOLD,
+)
@@ -0,0 +1,156 @@
+# app/services/bm25_index.py
+
+import math
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.vector_index import VectorIndex
+from app.utils.text_utils import tokenizar
+
+LEXICAL_MODES = ("off", "rerank", "fusion")
+
+
+class BM25Index:
+    """
+    Índice invertido en memoria con puntuación BM25. Cada posting guarda ya
+    su peso BM25, así que una consulta solo suma los pesos de sus términos.
+    """
+
+    def __init__(self, docs: Iterable[str], k1: float = 1.5, b: float = 0.75, keep_terms: bool = False):
+        ids_por_termino: Dict[str, List[int]] = defaultdict(list)
+        tf_por_termino: Dict[str, List[int]] = defaultdict(list)
+        longitudes = []
+        # Conjunto de términos por documento (solo para `confident`)
+        self._terminos: Optional[List[frozenset]] = [] if keep_terms else None
+        for doc_id, doc in enumerate(docs):
+            tokens = tokenizar(doc)
+            longitudes.append(len(tokens))
+            if self._terminos is not None:
+                self._terminos.append(frozenset(tokens))
+            for termino, tf in Counter(tokens).items():
+                ids_por_termino[termino].append(doc_id)
+                tf_por_termino[termino].append(tf)
+
+        self.n_docs = len(longitudes)
+        dl = np.array(longitudes, dtype=np.float32)
+        avgdl = float(dl.mean()) if self.n_docs and dl.mean() > 0 else 1.0
+        norma = k1 * (1 - b + b * dl / avgdl)
+
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for termino, ids in ids_por_termino.items():
+            ids = np.array(ids, dtype=np.int64)
+            tf = np.array(tf_por_termino[termino], dtype=np.float32)
+            df = len(ids)
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            self._postings[termino] = (ids, (idf * tf * (k1 + 1) / (tf + norma[ids])).astype(np.float32))
+
+        self._queries = 0
+        self._total_ms = 0.0
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def search(self, query: str, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """(scores, ids) de los k documentos con mayor BM25; vacío si ningún término aparece."""
+        t0 = time.perf_counter()
+        acumulado = None
+        for termino in set(tokenizar(query)):
+            posting = self._postings.get(termino)
+            if posting is None:
+                continue
+            if acumulado is None:
+                acumulado = np.zeros(self.n_docs, dtype=np.float32)
+            ids, pesos = posting
+            acumulado[ids] += pesos
+
+        if acumulado is None:
+            scores, ids = np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        else:
+            ids = np.flatnonzero(acumulado)
+            if len(ids) > k:
+                ids = ids[np.argpartition(-acumulado[ids], k - 1)[:k]]
+            ids = ids[np.argsort(-acumulado[ids])]
+            scores = acumulado[ids]
+        self._queries += 1
+        self._total_ms += (time.perf_counter() - t0) * 1000
+        return scores, ids
+
+    def confident(self, query: str, min_overlap: float, margin: float) -> Optional[int]:
+        """
+        Documento que responde a la consulta solo por sus términos, sin
+        necesidad del modelo: el mejor BM25 comparte con la consulta al menos
+        `min_overlap` de sus términos (Jaccard) y supera al segundo por un
+        factor `margin`. None si no hay un ganador claro.
+        """
+        if self._terminos is None:
+            return None
+        terminos = frozenset(tokenizar(query))
+        if not terminos:
+            return None
+        scores, ids = self.search(query, k=2)
+        if not len(ids):
+            return None
+        if len(ids) > 1 and scores[0] < margin * scores[1]:
+            return None
+        doc = self._terminos[int(ids[0])]
+        if len(terminos & doc) / len(terminos | doc) < min_overlap:
+            return None
+        return int(ids[0])
+
+    def stats(self) -> Dict:
+        return {
+            "docs": self.n_docs,
+            "terms": len(self._postings),
+            "queries": self._queries,
+            "avg_ms": round(self._total_ms / self._queries, 4) if self._queries else 0.0,
+        }
+
+
+def rrf(rankings: Sequence[Sequence[int]], k: int = 60) -> Dict[int, float]:
+    """Reciprocal Rank Fusion: suma de 1 / (k + posición) en cada ranking."""
+    fusion: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for pos, doc_id in enumerate(ranking):
+            fusion[int(doc_id)] += 1.0 / (k + pos + 1)
+    return fusion
+
+
+def hybrid_best(
+    lexical: Optional[BM25Index],
+    index: VectorIndex,
+    query_text: Optional[str],
+    query_embedding: np.ndarray,
+    mode: str,
+    top_n: int,
+    rrf_k: int = 60,
+    offset: int = 0
+) -> Optional[Tuple[float, int]]:
+    """
+    Mejor documento combinando BM25 y similitud semántica. Los documentos
+    ocupan las filas [offset, offset + len(lexical)) de `index`.
+      - rerank: solo los top_n candidatos léxicos se puntúan semánticamente;
+      - fusion: RRF entre el ranking léxico y el semántico.
+    Devuelve (similitud coseno, id local) o None si el modo está apagado o
+    ningún término de la consulta aparece (se usa la búsqueda semántica normal).
+    """
+    if mode not in LEXICAL_MODES:
+        raise ValueError(f"Modo léxico desconocido: {mode}")
+    if mode == "off" or lexical is None or not query_text or not len(lexical):
+        return None
+    _, candidatos = lexical.search(query_text, k=top_n)
+    if not len(candidatos):
+        return None
+
+    if mode == "rerank":
+        sims = index.score_rows(query_embedding, candidatos + offset)
+        mejor = int(sims.argmax())
+        return float(sims[mejor]), int(candidatos[mejor])
+
+    sims = index.score_rows(query_embedding, np.arange(offset, offset + len(lexical)))
+    semantico = np.argsort(-sims)[:top_n]
+    fusion = rrf([candidatos, semantico], k=rrf_k)
+    mejor = max(fusion, key=fusion.get)
+    return float(sims[mejor]), mejor
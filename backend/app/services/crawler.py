@@ -0,0 +1,248 @@
+# app/services/crawler.py
+
+import logging
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from app.services.page_store import PageStore
+
+logger = logging.getLogger("uvicorn.error")
+
+USER_AGENT = "UnachitoBot/1.0 (+https://chatbot.unach.edu.ec)"
+
+# Extensiones que no aportan texto HTML
+_EXT_BINARIAS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".zip", ".rar",
+    ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".mp3", ".mp4", ".avi", ".css", ".js",
+)
+_PUERTOS_DEFECTO = {"http": 80, "https": 443}
+
+
+def normalize_url(href: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Forma canónica de una URL para el frontier: resuelve relativas, descarta
+    fragmentos, parámetros utm_*, puertos por defecto y esquemas no HTTP.
+    Devuelve None si la URL no debe rastrearse.
+    """
+    url = urljoin(base, href.strip()) if base else href.strip()
+    p = urlparse(url)
+    if p.scheme not in ("http", "https") or not p.hostname:
+        return None
+    if p.path.lower().endswith(_EXT_BINARIAS):
+        return None
+
+    host = p.hostname.lower()
+    if p.port and p.port != _PUERTOS_DEFECTO[p.scheme]:
+        host = f"{host}:{p.port}"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(p.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_")
+    ))
+    return urlunparse((p.scheme, host, p.path or "/", "", query, ""))
+
+
+_TAGS_TEXTO = ['p', 'li', 'span']
+
+
+def extract_texts(soup: BeautifulSoup) -> List[str]:
+    """
+    Texto visible de párrafos, elementos de lista y spans. Solo se toma el
+    elemento más externo: un span dentro de un li no se emite dos veces.
+    """
+    texts = []
+    for tag in soup.find_all(_TAGS_TEXTO):
+        if tag.find_parent(_TAGS_TEXTO) is not None:
+            continue
+        content = tag.get_text(' ', strip=True)
+        if content:
+            texts.append(content)
+    return texts
+
+
+@dataclass
+class PageResult:
+    url: str
+    seed: str
+    status: int
+    texts: List[str] = field(default_factory=list)
+    links: List[str] = field(default_factory=list)
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    not_modified: bool = False
+    skipped: bool = False
+    error: Optional[str] = None
+
+
+class Crawler:
+    """
+    Rastreador concurrente con un pool acotado de hilos, límite de
+    peticiones simultáneas y espera de cortesía por host, frontier
+    deque + set y GET condicionales para saltar páginas sin cambios.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        per_host: int = 2,
+        delay: float = 0.5,
+        timeout: float = 10.0,
+        max_pages: int = 5,
+        state: Optional[PageStore] = None
+    ):
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.delay = delay
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self.state = state if state is not None else PageStore(path=None)
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT})
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._siguiente: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------ DESCARGA ------------------------
+    def _esperar_turno(self, host: str) -> None:
+        """Respeta `delay` segundos entre peticiones al mismo host."""
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._siguiente.get(host, 0.0))
+            self._siguiente[host] = turno + self.delay
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+    def fetch(self, url: str, seed: str) -> PageResult:
+        """
+        Descarga y analiza una página. Nunca lanza: cualquier fallo (red o
+        análisis del HTML) vuelve como PageResult con `error`, para que una
+        página rota no detenga el rastreo de las demás semillas.
+        """
+        try:
+            return self._fetch(url, seed)
+        except Exception as e:
+            return PageResult(url, seed, 0, error=f"{type(e).__name__}: {e}")
+
+    def _fetch(self, url: str, seed: str) -> PageResult:
+        host = urlparse(url).netloc
+        previo = self.state.get(url)
+        headers = {}
+        if previo:
+            if previo.get("etag"):
+                headers["If-None-Match"] = previo["etag"]
+            if previo.get("last_modified"):
+                headers["If-Modified-Since"] = previo["last_modified"]
+
+        self._esperar_turno(host)
+        try:
+            r = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            return PageResult(url, seed, 0, error=str(e))
+
+        if r.status_code == 304 and previo:
+            return PageResult(
+                url, seed, 304,
+                texts=previo.get("texts", []),
+                links=previo.get("links", []),
+                etag=previo.get("etag"),
+                last_modified=previo.get("last_modified"),
+                not_modified=True,
+            )
+        if r.status_code >= 400:
+            return PageResult(url, seed, r.status_code, error=f"HTTP {r.status_code}")
+        if "html" not in r.headers.get("Content-Type", "text/html"):
+            # Sin texto que extraer: no se guarda como página vacía
+            return PageResult(url, seed, r.status_code, skipped=True)
+
+        soup = BeautifulSoup(r.text, 'html.parser')
+        links = []
+        for link in soup.find_all('a', href=True):
+            destino = normalize_url(link['href'], base=r.url)
+            # Solo enlaces del mismo dominio que la semilla
+            if destino and urlparse(destino).netloc == host:
+                links.append(destino)
+        return PageResult(
+            url, seed, r.status_code,
+            texts=extract_texts(soup),
+            links=links,
+            etag=r.headers.get("ETag"),
+            last_modified=r.headers.get("Last-Modified"),
+        )
+
+    # ------------------------ PLANIFICACIÓN ------------------------
+    def crawl(self, seeds: List[str]) -> Dict[str, List[PageResult]]:
+        """
+        Rastrea todas las semillas a la vez (hasta max_pages por semilla) y
+        devuelve las páginas obtenidas agrupadas por semilla.
+        """
+        frontiers: Dict[str, deque] = {}
+        seed_de_host: Dict[str, str] = {}
+        vistos = set()
+        for seed in seeds:
+            url = normalize_url(seed)
+            if not url or url in vistos:
+                continue
+            host = urlparse(url).netloc
+            vistos.add(url)
+            frontiers.setdefault(host, deque()).append(url)
+            seed_de_host[host] = seed
+
+        resultados: Dict[str, List[PageResult]] = {seed: [] for seed in seeds}
+        programadas = Counter()
+        en_vuelo_host = Counter()
+        en_vuelo = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crawler") as pool:
+            while True:
+                # Reparto round-robin entre hosts respetando los límites
+                for host, cola in frontiers.items():
+                    while (
+                        cola
+                        and len(en_vuelo) < self.max_workers
+                        and en_vuelo_host[host] < self.per_host
+                        and programadas[host] < self.max_pages
+                    ):
+                        url = cola.popleft()
+                        fut = pool.submit(self.fetch, url, seed_de_host[host])
+                        en_vuelo[fut] = host
+                        en_vuelo_host[host] += 1
+                        programadas[host] += 1
+
+                if not en_vuelo:
+                    break
+
+                hechos, _ = wait(list(en_vuelo), return_when=FIRST_COMPLETED)
+                for fut in hechos:
+                    host = en_vuelo.pop(fut)
+                    en_vuelo_host[host] -= 1
+                    res = fut.result()
+                    if res.error:
+                        logger.warning("[CRAWL] Error en %s: %s", res.url, res.error)
+                        programadas[host] -= 1
+                        continue
+                    if res.skipped:
+                        logger.debug("[CRAWL] %s no es HTML, se omite", res.url)
+                        programadas[host] -= 1
+                        continue
+                    resultados[res.seed].append(res)
+                    self.state.update(res)
+                    for link in res.links:
+                        if link not in vistos:
+                            vistos.add(link)
+                            frontiers[host].append(link)
+
+        self.state.save()
+        total = sum(len(v) for v in resultados.values())
+        sin_cambios = sum(r.not_modified for v in resultados.values() for r in v)
+        logger.info("[CRAWL] %d páginas (%d sin cambios, 304)", total, sin_cambios)
+        return resultados
@@ -0,0 +1,111 @@
+# app/services/dedup.py
+
+import hashlib
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from app.utils.text_utils import normalizar_texto
+
+# Parámetros MinHash/LSH: 64 permutaciones en 16 bandas de 4 filas
+NUM_PERM = 64
+BANDS = 16
+_PRIMO = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(42)
+_A = _rng.integers(1, 2**32 - 1, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 2**32 - 1, size=NUM_PERM, dtype=np.uint64)
+
+
+@dataclass
+class DedupReport:
+    lineas_entrada: int = 0
+    lineas_salida: int = 0
+    bloques_sin_dedup: int = 0      # fragmentos que se habrían indexado sin esta etapa
+    bloques_entrada: int = 0        # fragmentos tras quitar líneas duplicadas
+    bloques_salida: int = 0
+
+    @property
+    def reduccion_bloques(self) -> float:
+        base = self.bloques_sin_dedup or self.bloques_entrada
+        if not base:
+            return 0.0
+        return 1 - self.bloques_salida / base
+
+    def as_dict(self) -> Dict:
+        d = asdict(self)
+        d["reduccion_bloques"] = round(self.reduccion_bloques, 4)
+        return d
+
+
+def dedup_lines(textos: Iterable[Tuple[str, str]], report: DedupReport) -> Iterator[Tuple[str, str]]:
+    """
+    Elimina líneas repetidas (por hash del texto normalizado) en todas las
+    páginas y subdominios; se conserva la primera aparición. Es un generador:
+    solo retiene los hashes vistos, no los textos.
+    """
+    vistas = set()
+    for fuente, texto in textos:
+        lineas = []
+        for linea in texto.split('\n'):
+            if not linea.strip():
+                continue
+            report.lineas_entrada += 1
+            h = hashlib.blake2b(normalizar_texto(linea).encode('utf-8'), digest_size=8).digest()
+            if h in vistas:
+                continue
+            vistas.add(h)
+            lineas.append(linea)
+        report.lineas_salida += len(lineas)
+        yield fuente, '\n'.join(lineas)
+
+
+def _shingles(texto: str, k: int = 3) -> np.ndarray:
+    palabras = normalizar_texto(texto).split()
+    if len(palabras) <= k:
+        grams = [' '.join(palabras)]
+    else:
+        grams = [' '.join(palabras[i:i + k]) for i in range(len(palabras) - k + 1)]
+    return np.array(sorted({zlib.crc32(g.encode('utf-8')) for g in grams}), dtype=np.uint64)
+
+
+def minhash(texto: str) -> np.ndarray:
+    """Firma MinHash (NUM_PERM valores) de los 3-gramas de palabras del texto."""
+    h = _shingles(texto)
+    return ((_A[:, None] * h[None, :] + _B[:, None]) % _PRIMO).min(axis=1)
+
+
+def dedup_blocks(
+    bloques: Iterable[Tuple[str, str]],
+    umbral: float = 0.8,
+    report: DedupReport = None
+) -> List[Tuple[str, str]]:
+    """
+    Descarta bloques (fuente, texto) casi duplicados de otro ya conservado:
+    candidatos por LSH sobre la firma MinHash y confirmación con la
+    similitud de Jaccard estimada >= umbral. `fuente` se conserva tal cual.
+    """
+    filas = NUM_PERM // BANDS
+    cubetas: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+    firmas: List[np.ndarray] = []
+    salida = []
+    entrada = 0
+    for fuente, texto in bloques:
+        entrada += 1
+        firma = minhash(texto)
+        claves = [(b, firma[b * filas:(b + 1) * filas].tobytes()) for b in range(BANDS)]
+        candidatos = {i for clave in claves for i in cubetas.get(clave, ())}
+        if any(np.mean(firmas[i] == firma) >= umbral for i in candidatos):
+            continue
+        idx = len(firmas)
+        firmas.append(firma)
+        for clave in claves:
+            cubetas[clave].append(idx)
+        salida.append((fuente, texto))
+
+    if report is not None:
+        report.bloques_entrada += entrada
+        report.bloques_salida += len(salida)
+    return salida
@@ -0,0 +1,220 @@
+# app/services/embedding_codec.py
+
+import logging
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger("uvicorn.error")
+
+DTYPES = ("float32", "float16", "int8")
+
+# Filas por bloque al puntuar formatos compactos: acota la copia temporal en float32
+_BLOQUE = 4096
+# Máximo de filas usadas para ajustar la proyección PCA
+_PCA_MUESTRA = 20000
+
+
+class QuantizedMatrix:
+    """
+    Matriz de embeddings contigua en float32, float16 o int8. En int8 cada
+    fila guarda además su escala (max |x| / 127) y el score se reescala
+    tras el producto.
+    """
+
+    def __init__(self, data: np.ndarray, scales: Optional[np.ndarray] = None):
+        self.data = np.ascontiguousarray(data)
+        self.scales = None if scales is None else np.ascontiguousarray(scales, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def dtype(self) -> str:
+        return self.data.dtype.name
+
+    @property
+    def dim(self) -> int:
+        return self.data.shape[1] if self.data.ndim == 2 else 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Producto interno de `query` (float32, ya proyectada) con las filas indicadas."""
+        data = self.data if rows is None else self.data[rows]
+        if data.dtype == np.float32:
+            out = data @ query
+        else:
+            out = np.empty(len(data), dtype=np.float32)
+            for i in range(0, len(data), _BLOQUE):
+                out[i:i + _BLOQUE] = data[i:i + _BLOQUE].astype(np.float32) @ query
+        if self.scales is not None:
+            out *= self.scales if rows is None else self.scales[rows]
+        return out
+
+    def decode(self) -> np.ndarray:
+        """Copia en float32 (para entrenar particiones o evaluar; no en caliente)."""
+        out = self.data.astype(np.float32)
+        if self.scales is not None:
+            out *= self.scales[:, None]
+        return out
+
+
+class EmbeddingCodec:
+    """
+    Formato de almacenamiento de un índice: proyección PCA opcional
+    (ajustada sobre el corpus, sin centrar, con renormalización para que
+    los umbrales de coseno sigan valiendo) seguida de cuantización.
+    Las consultas se proyectan igual y se puntúan contra la forma compacta.
+    """
+
+    def __init__(
+        self,
+        dtype: str = "float32",
+        pca_dim: int = 0,
+        components: Optional[np.ndarray] = None
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"Tipo de almacenamiento de embeddings desconocido: {dtype}")
+        self.dtype = dtype
+        self.pca_dim = pca_dim
+        self.components = None if components is None else components.astype(np.float32)
+
+    def fit(self, vectors: np.ndarray) -> "EmbeddingCodec":
+        """Ajusta la proyección PCA si está configurada y hay datos suficientes."""
+        n, d = vectors.shape if vectors.ndim == 2 else (0, 0)
+        if not self.pca_dim or self.pca_dim >= d:
+            return self
+        if n < self.pca_dim:
+            logger.warning(
+                "[VECTOR] PCA a %d dimensiones omitida: solo hay %d vectores", self.pca_dim, n
+            )
+            return self
+        t0 = time.perf_counter()
+        muestra = vectors
+        if n > _PCA_MUESTRA:
+            idx = np.random.default_rng(0).choice(n, size=_PCA_MUESTRA, replace=False)
+            muestra = vectors[idx]
+        _, s, vt = np.linalg.svd(muestra.astype(np.float32), full_matrices=False)
+        self.components = vt[:self.pca_dim]
+        energia = float((s[:self.pca_dim] ** 2).sum() / (s ** 2).sum())
+        logger.info(
+            "[VECTOR] PCA %d→%d dimensiones (%.1f%% de la energía, %.1fs)",
+            d, self.pca_dim, energia * 100, time.perf_counter() - t0
+        )
+        return self
+
+    def project(self, x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32)
+        if self.components is None:
+            return x
+        y = x @ self.components.T
+        norma = np.linalg.norm(y, axis=-1, keepdims=True)
+        return y / (norma + 1e-12)
+
+    def quantize(self, x: np.ndarray) -> QuantizedMatrix:
+        if self.dtype == "float32":
+            return QuantizedMatrix(x.astype(np.float32))
+        if self.dtype == "float16":
+            return QuantizedMatrix(x.astype(np.float16))
+        maximo = np.abs(x).max(axis=1) if len(x) else np.zeros(0, dtype=np.float32)
+        scales = np.where(maximo > 0, maximo / 127.0, 1.0).astype(np.float32)
+        data = np.clip(np.rint(x / scales[:, None]), -127, 127).astype(np.int8)
+        return QuantizedMatrix(data, scales)
+
+    def encode(self, vectors: np.ndarray) -> QuantizedMatrix:
+        return self.quantize(self.project(vectors))
+
+    # ------------------------ PERSISTENCIA ------------------------
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {"codec_dtype": np.array(self.dtype)}
+        if self.components is not None:
+            arrays["pca_components"] = self.components
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "EmbeddingCodec":
+        dtype = str(arrays["codec_dtype"]) if "codec_dtype" in arrays else "float32"
+        components = arrays["pca_components"] if "pca_components" in arrays else None
+        pca_dim = len(components) if components is not None else 0
+        return cls(dtype, pca_dim, components)
+
+
+def compression_report(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    configs: List[tuple],
+    ks=(1, 10)
+) -> List[Dict]:
+    """
+    Memoria y recall@k de cada configuración (dtype, pca_dim) frente a la
+    búsqueda exacta en float32 sobre los mismos vectores.
+    """
+    base = vectors.astype(np.float32)
+    ref = [np.argsort(-(base @ q)) for q in queries]
+    filas = []
+    for dtype, pca_dim in configs:
+        codec = EmbeddingCodec(dtype, pca_dim).fit(base)
+        matriz = codec.encode(base)
+        aciertos = {k: 0 for k in ks}
+        for q, orden in zip(queries, ref):
+            scores = matriz.scores(codec.project(q))
+            top = np.argsort(-scores)
+            for k in ks:
+                aciertos[k] += len(np.intersect1d(top[:k], orden[:k]))
+        n = max(1, len(queries))
+        fila = {
+            "dtype": dtype,
+            "pca_dim": pca_dim if codec.components is not None else 0,
+            "kb": round(matriz.nbytes / 1024, 1),
+            "ahorro": round(1 - matriz.nbytes / base.nbytes, 4) if base.nbytes else 0.0,
+        }
+        for k in ks:
+            fila[f"recall@{k}"] = round(aciertos[k] / (n * min(k, len(base))), 4) if len(base) else 1.0
+        filas.append(fila)
+    return filas
+
+
+if __name__ == "__main__":
+    # Informe de memoria y recall para las FAQs y el corpus scrapeado.
+    # Consultas: preguntas reales (FAQ + sin respuesta) codificadas con el modelo.
+    from sqlalchemy import text
+
+    from app.services.model_registry import get_model
+    from app.services.scraped_index import load_scraped_index
+    from app.utils.db import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    model = get_model()
+    db = SessionLocal()
+    try:
+        faqs = [r[0].lower() for r in db.execute(text("SELECT pregunta FROM faq")).fetchall()]
+        sin_respuesta = [r[0] for r in db.execute(text("SELECT pregunta FROM unanswered")).fetchall()]
+    finally:
+        db.close()
+
+    def _enc(textos):
+        return model.encode(textos, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False)
+
+    preguntas = faqs + sin_respuesta
+    consultas = _enc(preguntas) if preguntas else None
+    dim = model.get_sentence_embedding_dimension()
+    configs = [("float32", 0), ("float16", 0), ("int8", 0), ("float16", dim // 2), ("int8", dim // 2), ("int8", dim // 4)]
+
+    if faqs:
+        print(f"== FAQ ({len(faqs)} preguntas, {len(preguntas)} consultas) ==")
+        for fila in compression_report(_enc(faqs), consultas, configs):
+            print(fila)
+
+    scraped = load_scraped_index(build_missing=True)
+    if len(scraped):
+        vectores = scraped.index.vectors if scraped.index.codec.components is None \
+            and scraped.index.matrix.dtype == "float32" else _enc(scraped.chunks)
+        if consultas is None:
+            consultas = vectores[:200]
+        print(f"== Scraping ({len(scraped)} fragmentos, {len(consultas)} consultas) ==")
+        for fila in compression_report(vectores, consultas, configs):
+            print(fila)
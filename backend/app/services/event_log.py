@@ -0,0 +1,69 @@
+# app/services/event_log.py
+
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import text
+
+from app.config.settings import get_settings
+from app.models.unanswered_model import Unanswered
+from app.utils.db import engine
+from app.utils.write_behind import WriteBehindSink
+
+settings = get_settings()
+
+
+def _sink(statement, name: str) -> WriteBehindSink:
+    return WriteBehindSink(
+        engine,
+        statement,
+        name=name,
+        max_batch=settings.WRITE_BEHIND_BATCH,
+        flush_seconds=settings.WRITE_BEHIND_FLUSH_SECONDS,
+        max_pending=settings.WRITE_BEHIND_MAX_PENDING
+    )
+
+
+# Preguntas sin respuesta (tabla unanswered)
+unanswered_sink = _sink(Unanswered.__table__.insert(), "unanswered")
+
+# Auditoría de cambios de contraseña (tabla logs_password_changes)
+password_log_sink = _sink(text("""
+    INSERT INTO logs_password_changes (usuario, sistema, ip_origen, fecha_hora, observacion)
+    VALUES (:usuario, :sistema, :ip_origen, :fecha_hora, :observacion)
+"""), "logs_password_changes")
+
+_SINKS = (unanswered_sink, password_log_sink)
+
+
+def registrar_unanswered(pregunta: str, ip: str, url_origen: str) -> None:
+    """Encola una pregunta sin respuesta; la fecha es la del momento de la consulta."""
+    unanswered_sink.put({
+        "pregunta": pregunta,
+        "fecha": datetime.now(),
+        "usuario_ip": ip,
+        "origen": "API Chatbot",
+        "url_origen": url_origen,
+        "estado": "pendiente",
+    })
+
+
+def registrar_log_password_change(usuario: str, sistema: str, ip: str, observacion: str) -> None:
+    """Encola el registro de un cambio de contraseña en logs_password_changes."""
+    password_log_sink.put({
+        "usuario": usuario,
+        "sistema": sistema,
+        "ip_origen": ip,
+        "fecha_hora": datetime.utcnow(),
+        "observacion": observacion,
+    })
+
+
+def close_event_log() -> None:
+    """Vacía los búferes pendientes (se llama al apagar el servidor)."""
+    for sink in _SINKS:
+        sink.close()
+
+
+def event_log_stats() -> Dict:
+    return {sink.name: sink.stats() for sink in _SINKS}
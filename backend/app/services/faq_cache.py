@@ -0,0 +1,140 @@
+# app/services/faq_cache.py
+
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.faq_model import FAQ
+from app.services.answer_cache import answer_cache
+from app.services.intent_router import IntentRouter, intent_router
+from app.services.model_registry import get_model
+from app.utils.db import SessionLocal
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class FaqCache:
+    """
+    Copia en memoria de la tabla FAQ con sus embeddings. `refresh` solo lee
+    y recodifica las filas nuevas o modificadas desde la última
+    sincronización y publica el resultado en el router de intenciones.
+    """
+
+    def __init__(self, router: IntentRouter):
+        self.router = router
+        self._preguntas: Dict[int, str] = {}
+        self._respuestas: Dict[int, str] = {}
+        self._emb: Dict[int, np.ndarray] = {}
+        self._watermark: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self.last_sync: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self._preguntas)
+
+    def refresh(self, db: Session, full: bool = False) -> Dict:
+        """
+        Sincroniza con la BD. Con full=True relee y recodifica todas las filas.
+        Devuelve cuántas filas cambiaron y cuántas se eliminaron.
+        """
+        with self._lock:
+            conocidas = {} if full else self._preguntas
+            ids_actuales = {i for (i,) in db.query(FAQ.id).all()}
+            eliminadas = set(conocidas) - ids_actuales
+            nuevas = ids_actuales - set(conocidas)
+
+            marca = func.coalesce(FAQ.fecha_update, FAQ.fecha_creacion)
+            if full or self._watermark is None:
+                filas = db.query(FAQ).all()
+            else:
+                filas = db.query(FAQ).filter(marca >= self._watermark).all()
+                vistas = {f.id for f in filas}
+                faltantes = nuevas - vistas
+                if faltantes:
+                    filas += db.query(FAQ).filter(FAQ.id.in_(faltantes)).all()
+
+            # Trabajamos sobre copias: el estado publicado no se toca hasta el final
+            preguntas = {} if full else dict(self._preguntas)
+            respuestas = {} if full else dict(self._respuestas)
+            embs = {} if full else dict(self._emb)
+            for i in eliminadas:
+                preguntas.pop(i, None)
+                respuestas.pop(i, None)
+                embs.pop(i, None)
+
+            a_codificar = []
+            cambios = 0
+            watermark = self._watermark
+            for f in filas:
+                texto = f.pregunta.lower()
+                if preguntas.get(f.id) != texto or f.id not in embs:
+                    a_codificar.append((f.id, texto))
+                if preguntas.get(f.id) != texto or respuestas.get(f.id) != f.respuesta:
+                    cambios += 1
+                preguntas[f.id] = texto
+                respuestas[f.id] = f.respuesta
+                ts = f.fecha_update or f.fecha_creacion
+                if ts is not None and (watermark is None or ts > watermark):
+                    watermark = ts
+
+            if a_codificar:
+                nuevos = get_model().encode(
+                    [t for _, t in a_codificar],
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False,
+                )
+                for (i, _), e in zip(a_codificar, nuevos):
+                    embs[i] = e
+
+            self.last_sync = datetime.utcnow()
+            self._watermark = watermark
+            if not (full or cambios or eliminadas):
+                return {"cambiadas": 0, "eliminadas": 0, "recodificadas": 0, "total": len(preguntas)}
+
+            ids = sorted(preguntas)
+            matriz = np.vstack([embs[i] for i in ids]) if ids else None
+            self.router.set_faqs(
+                [preguntas[i] for i in ids],
+                [respuestas[i] for i in ids],
+                embeddings=matriz,
+            )
+            self._preguntas, self._respuestas, self._emb = preguntas, respuestas, embs
+            # Las respuestas cacheadas pueden provenir de FAQs que cambiaron
+            answer_cache.invalidate()
+
+            resumen = {
+                "cambiadas": cambios,
+                "eliminadas": len(eliminadas),
+                "recodificadas": len(a_codificar),
+                "total": len(ids),
+            }
+            logger.info("[FAQ] Caché sincronizada: %s", resumen)
+            return resumen
+
+    def refresh_new_session(self, full: bool = False) -> Dict:
+        db = SessionLocal()
+        try:
+            return self.refresh(db, full=full)
+        finally:
+            db.close()
+
+
+# Instancia compartida por el proceso
+faq_cache = FaqCache(intent_router)
+
+
+async def periodic_refresh(interval: float) -> None:
+    """Tarea de fondo: sincroniza la caché de FAQs cada `interval` segundos."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(faq_cache.refresh_new_session)
+        except Exception as e:
+            logger.error("[FAQ] Error en la sincronización periódica: %s", e)
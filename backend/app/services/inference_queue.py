@@ -0,0 +1,40 @@
+# app/services/inference_queue.py
+
+from typing import List
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.services.model_registry import get_model
+from app.utils.batcher import MicroBatcher
+
+settings = get_settings()
+
+
+def _encode_batch(textos: List[str]) -> List[np.ndarray]:
+    """Codifica un lote de textos con el modelo compartido (hilo de trabajo)."""
+    emb = get_model().encode(
+        textos,
+        batch_size=len(textos),
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+    return list(emb)
+
+
+# Cola única de inferencia por proceso: agrupa las consultas concurrentes
+encoder_queue = MicroBatcher(
+    _encode_batch,
+    max_batch=settings.ENCODE_MAX_BATCH,
+    max_wait_ms=settings.ENCODE_MAX_WAIT_MS,
+    name="encode",
+)
+
+
+async def encode_async(texto: str) -> np.ndarray:
+    """
+    Embedding normalizado de `texto` calculado fuera del event loop,
+    en lote con las demás consultas que lleguen en la misma ventana.
+    """
+    return await encoder_queue.submit(texto)
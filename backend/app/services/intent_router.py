@@ -0,0 +1,233 @@
+# app/services/intent_router.py
+
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.services.bm25_index import BM25Index, hybrid_best
+from app.services.keyword_matcher import FastPath
+from app.services.model_registry import get_model
+from app.services.vector_index import VectorIndex, build_index
+
+logger = logging.getLogger("uvicorn.error")
+
+INTENTS_FILE = os.path.join(os.path.dirname(__file__), '..', 'config', 'intents.json')
+
+# Intención especial cuyas filas son las preguntas de la tabla FAQ
+FAQ_INTENT = "faq"
+
+
+def load_intents(path: Optional[str] = None) -> List[dict]:
+    """
+    Lee las intenciones (frases, umbral y respuesta) en orden de prioridad.
+    """
+    path = path or get_settings().INTENTS_FILE or INTENTS_FILE
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class _RouterState(NamedTuple):
+    refs: np.ndarray            # frases de referencia de las intenciones no FAQ, apiladas
+    offsets: np.ndarray         # fila inicial de cada intención de `nombres` en `refs`
+    nombres: List[str]          # intenciones no FAQ con frases, en orden
+    index: VectorIndex          # preguntas FAQ (top-k / IVF)
+    faq_respuestas: List[str]
+    faq_lexical: Optional[BM25Index]  # BM25 sobre las preguntas FAQ
+
+
+class IntentRouter:
+    """
+    Enruta una pregunta con un solo embedding: un producto matricial exacto
+    contra las frases apiladas de saludos e intenciones de contraseña (pocas
+    filas, ninguna puede quedar fuera) y una búsqueda en el índice vectorial
+    de las preguntas FAQ.
+    """
+
+    def __init__(self, intents: List[dict]):
+        self.intents = intents
+        self._ref_emb: Optional[Dict[str, np.ndarray]] = None
+        self._faq_emb: Optional[np.ndarray] = None
+        self._faq_respuestas: List[str] = []
+        self._faq_preguntas: List[str] = []
+        self._state: Optional[_RouterState] = None
+        self._lock = threading.Lock()
+
+    # ------------------------ CONSTRUCCIÓN ------------------------
+    def _referencias(self) -> Dict[str, np.ndarray]:
+        if self._ref_emb is None:
+            model = get_model()
+            self._ref_emb = {
+                i["nombre"]: model.encode(
+                    i["frases"], convert_to_numpy=True, normalize_embeddings=True
+                )
+                for i in self.intents if i.get("frases")
+            }
+        return self._ref_emb
+
+    def _build(self) -> _RouterState:
+        refs = self._referencias()
+        bloques, offsets, nombres = [], [], []
+        fila = 0
+        for intent in self.intents:
+            nombre = intent["nombre"]
+            emb = refs.get(nombre)
+            if nombre == FAQ_INTENT or emb is None or not len(emb):
+                continue
+            bloques.append(emb.astype(np.float32))
+            offsets.append(fila)
+            nombres.append(nombre)
+            fila += len(emb)
+
+        dim = get_model().get_sentence_embedding_dimension()
+        vacia = np.zeros((0, dim), dtype=np.float32)
+        faqs = self._faq_emb if self._faq_emb is not None else vacia
+        return _RouterState(
+            np.vstack(bloques) if bloques else vacia,
+            np.array(offsets, dtype=np.int64),
+            nombres,
+            build_index(faqs),
+            self._faq_respuestas,
+            BM25Index(self._faq_preguntas, keep_terms=True) if self._faq_preguntas else None
+        )
+
+    def set_faqs(
+        self,
+        preguntas: List[str],
+        respuestas: List[str],
+        embeddings: Optional[np.ndarray] = None
+    ) -> None:
+        """
+        Reemplaza las FAQs del índice apilado. Si no se pasan `embeddings`,
+        las preguntas se codifican en lote. El nuevo estado se construye
+        aparte y se publica con una sola asignación: ninguna consulta ve
+        un índice a medio construir.
+        """
+        if embeddings is None and preguntas:
+            embeddings = get_model().encode(
+                preguntas, convert_to_numpy=True, normalize_embeddings=True
+            )
+        with self._lock:
+            self._faq_emb = embeddings if preguntas else None
+            self._faq_respuestas = list(respuestas)
+            self._faq_preguntas = list(preguntas)
+            self._state = self._build()
+
+    @property
+    def faq_count(self) -> int:
+        return len(self._faq_respuestas)
+
+    def stats(self) -> Dict:
+        state = self._state
+        if state is None:
+            return {}
+        stats = state.index.stats()
+        if state.faq_lexical is not None:
+            stats["faq_bm25"] = state.faq_lexical.stats()
+        return stats
+
+    # ------------------------ CONSULTA ------------------------
+    def _current(self) -> _RouterState:
+        state = self._state
+        if state is None:
+            with self._lock:
+                if self._state is None:
+                    self._state = self._build()
+                state = self._state
+        return state
+
+    def scores(self, emb: np.ndarray, state: Optional[_RouterState] = None) -> Dict[str, tuple]:
+        """
+        Mejor similitud y fila ganadora por intención: {nombre: (score, idx)}.
+        Las intenciones no FAQ se puntúan con todas sus frases (máximo de su
+        tramo [offset, siguiente offset) en un único producto exacto); la
+        FAQ con el vecino más cercano del índice.
+        """
+        state = state or self._current()
+        resultado = {}
+        if len(state.refs):
+            sims = state.refs @ np.asarray(emb, dtype=np.float32)
+            fines = np.append(state.offsets[1:], len(sims))
+            for nombre, ini, fin in zip(state.nombres, state.offsets, fines):
+                idx = int(sims[ini:fin].argmax())
+                resultado[nombre] = (float(sims[ini + idx]), idx)
+        if len(state.index):
+            faq_sims, faq_ids = state.index.search(emb, k=1)
+            resultado[FAQ_INTENT] = (float(faq_sims[0]), int(faq_ids[0]))
+        return resultado
+
+    def _faq_hibrido(self, emb: np.ndarray, pregunta: Optional[str], state: _RouterState) -> Optional[tuple]:
+        """Mejor FAQ según la etapa léxica configurada, o None si no aplica."""
+        if not len(state.index):
+            return None
+        settings = get_settings()
+        return hybrid_best(
+            state.faq_lexical, state.index, pregunta, emb,
+            settings.LEXICAL_MODE, settings.LEXICAL_TOPN, settings.RRF_K
+        )
+
+    @staticmethod
+    def _respuesta_faq(intent: dict, state: _RouterState, idx: int) -> Dict:
+        return {
+            "respuesta": state.faq_respuestas[idx],
+            "fuente": intent.get("fuente", "FAQ BD"),
+            "acciones": list(intent.get("acciones", [])),
+        }
+
+    def route_lexical(self, pregunta: str) -> Optional[Dict]:
+        """
+        Respuesta FAQ decidida solo por BM25, antes de calcular el embedding:
+        el mejor candidato léxico comparte con la pregunta al menos
+        LEXICAL_SHORTCUT_MIN_OVERLAP de sus términos y supera al segundo por
+        LEXICAL_SHORTCUT_MARGIN. None si la etapa léxica está apagada o no hay
+        un ganador claro (entonces decide el modelo).
+        """
+        settings = get_settings()
+        if settings.LEXICAL_MODE == "off" or settings.LEXICAL_SHORTCUT_MIN_OVERLAP <= 0:
+            return None
+        state = self._current()
+        intent = next((i for i in self.intents if i["nombre"] == FAQ_INTENT), None)
+        if intent is None or state.faq_lexical is None:
+            return None
+        idx = state.faq_lexical.confident(
+            pregunta, settings.LEXICAL_SHORTCUT_MIN_OVERLAP, settings.LEXICAL_SHORTCUT_MARGIN
+        )
+        return self._respuesta_faq(intent, state, idx) if idx is not None else None
+
+    def route(self, emb: np.ndarray, faq_threshold: float, pregunta: Optional[str] = None) -> Optional[Dict]:
+        """
+        Devuelve la respuesta de la primera intención (en orden de prioridad)
+        que supera su umbral, o None si ninguna aplica. Con `pregunta`, la FAQ
+        candidata sale de la etapa léxica BM25 (LEXICAL_MODE); si esa
+        candidata no llega al umbral se conserva la mejor semántica.
+        """
+        state = self._current()
+        scores = self.scores(emb, state)
+        hibrido = self._faq_hibrido(emb, pregunta, state)
+        if hibrido is not None and (hibrido[0] >= faq_threshold or FAQ_INTENT not in scores):
+            scores[FAQ_INTENT] = hibrido
+        for intent in self.intents:
+            nombre = intent["nombre"]
+            if nombre not in scores:
+                continue
+            score, idx = scores[nombre]
+            if nombre == FAQ_INTENT:
+                if score >= faq_threshold:
+                    return self._respuesta_faq(intent, state, idx)
+            elif score >= intent["umbral"]:
+                return {
+                    "respuesta": intent["respuesta"],
+                    "fuente": intent["fuente"],
+                    "acciones": list(intent.get("acciones", [])),
+                }
+        return None
+
+
+# Instancias compartidas por el proceso
+_intents = load_intents()
+intent_router = IntentRouter(_intents)
+fast_path = FastPath(_intents, cobertura_minima=get_settings().FASTPATH_MIN_COVERAGE)
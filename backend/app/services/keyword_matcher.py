@@ -0,0 +1,188 @@
+# app/services/keyword_matcher.py
+
+import re
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.utils.text_utils import normalizar_texto
+
+# Palabras que no cuentan para la cobertura (artículos, preposiciones, cortesía)
+_RELLENO = frozenset("""
+a al de del el la las lo los un una unos unas mi mis me tu su y o e que en con para por
+quiero quisiera necesito deseo porfa favor please ayuda ayudame podria puedo como
+""".split())
+
+_TOKENS = re.compile(r"[a-z0-9]+")
+_REPETIDAS = re.compile(r"(.)\1+")
+
+
+def plegar_token(token: str) -> str:
+    """
+    Forma tolerante de una palabra ya normalizada: sin 'h' muda, letras
+    repetidas colapsadas ("holaaa") y grafías que se confunden al escribir
+    (v/b, z/s, y/i, w/u) unificadas. La 'h' se conserva si quitarla deja
+    una sola letra ("hi" → "i"), para que un atajo corto no acabe
+    reconociendo una letra suelta.
+    """
+    t = token.replace("v", "b").replace("z", "s").replace("w", "u").replace("y", "i")
+    t = _REPETIDAS.sub(r"\1", t)
+    sin_h = _REPETIDAS.sub(r"\1", re.sub(r"(?<!c)h", "", t))
+    return sin_h if len(sin_h) >= 2 else (t or token)
+
+
+def _a_una_edicion(a: str, b: str) -> bool:
+    """True si a y b difieren en una sustitución, inserción, borrado o transposición."""
+    if abs(len(a) - len(b)) > 1 or a == b:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (
+            i + 1 < len(a) and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+        )
+    return a[i:] == b[i + 1:]
+
+
+class AhoCorasick:
+    """
+    Autómata de Aho-Corasick sobre secuencias de palabras: encuentra todas
+    las frases patrón en un solo recorrido del texto.
+    """
+
+    def __init__(self, patrones: Iterable[Tuple[Sequence[str], object]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, object]]] = [[]]
+        for tokens, valor in patrones:
+            nodo = 0
+            for tok in tokens:
+                sig = self._goto[nodo].get(tok)
+                if sig is None:
+                    sig = len(self._goto)
+                    self._goto[nodo][tok] = sig
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                nodo = sig
+            if tokens:
+                self._out[nodo].append((len(tokens), valor))
+        self._enlazar()
+
+    def _enlazar(self) -> None:
+        cola = deque(self._goto[0].values())
+        while cola:
+            nodo = cola.popleft()
+            for tok, hijo in self._goto[nodo].items():
+                f = self._fail[nodo]
+                while f and tok not in self._goto[f]:
+                    f = self._fail[f]
+                destino = self._goto[f].get(tok, 0)
+                self._fail[hijo] = destino if destino != hijo else 0
+                self._out[hijo] = self._out[hijo] + self._out[self._fail[hijo]]
+                cola.append(hijo)
+
+    def buscar(self, tokens: Sequence[str]) -> List[Tuple[int, int, object]]:
+        """Coincidencias (inicio, fin exclusivo, valor) en `tokens`."""
+        encontrados = []
+        nodo = 0
+        for pos, tok in enumerate(tokens):
+            while nodo and tok not in self._goto[nodo]:
+                nodo = self._fail[nodo]
+            nodo = self._goto[nodo].get(tok, 0)
+            for largo, valor in self._out[nodo]:
+                encontrados.append((pos + 1 - largo, pos + 1, valor))
+        return encontrados
+
+
+class FastPath:
+    """
+    Respuesta sin modelo para saludos y peticiones de contraseña: las frases
+    de cada intención (`frases` y `atajos` en intents.json) se compilan en un
+    autómata y un mensaje se responde directamente si las frases de una sola
+    intención cubren al menos `cobertura_minima` de sus palabras. Las frases
+    de intenciones de `cortesia` (saludos) cuentan como cubiertas cuando
+    acompañan a otra intención: "hola, olvidé mi contraseña".
+    """
+
+    def __init__(self, intents: List[dict], cobertura_minima: float = 0.75):
+        self.cobertura_minima = cobertura_minima
+        self._intents = {}
+        self._cortesia = {i["nombre"] for i in intents if i.get("cortesia")}
+        patrones = []
+        for intent in intents:
+            frases = list(intent.get("frases", [])) + list(intent.get("atajos", []))
+            if not frases or "respuesta" not in intent:
+                continue
+            self._intents[intent["nombre"]] = intent
+            for frase in frases:
+                tokens = self._tokens(frase, corregir=False)
+                if tokens:
+                    patrones.append((tokens, intent["nombre"]))
+        self._vocabulario = {t for tokens, _ in patrones for t in tokens}
+        self._automata = AhoCorasick(patrones)
+        self._lock = threading.Lock()
+        self.consultas = 0
+        self.omitidas: Dict[str, int] = {nombre: 0 for nombre in self._intents}
+
+    def _corregir(self, token: str) -> str:
+        # Erratas de una letra en palabras largas: solo si el candidato es único
+        if token in self._vocabulario or len(token) < 5:
+            return token
+        candidatos = [v for v in self._vocabulario if len(v) >= 5 and _a_una_edicion(token, v)]
+        return candidatos[0] if len(candidatos) == 1 else token
+
+    def _tokens(self, texto: str, corregir: bool = True) -> List[str]:
+        tokens = [
+            plegar_token(t) for t in _TOKENS.findall(normalizar_texto(texto))
+            if t not in _RELLENO
+        ]
+        return [self._corregir(t) for t in tokens] if corregir else tokens
+
+    def classify(self, texto: str) -> Optional[Tuple[str, float]]:
+        """(intención, cobertura) de la intención cuyas frases cubren más palabras."""
+        tokens = self._tokens(texto)
+        if not tokens:
+            return None
+        cubiertas: Dict[str, set] = {}
+        for inicio, fin, nombre in self._automata.buscar(tokens):
+            cubiertas.setdefault(nombre, set()).update(range(inicio, fin))
+        if not cubiertas:
+            return None
+        nombre = max(cubiertas, key=lambda n: len(cubiertas[n]))
+        cubierto = set(cubiertas[nombre])
+        if nombre not in self._cortesia:
+            for otro in self._cortesia & cubiertas.keys():
+                cubierto |= cubiertas[otro]
+        return nombre, len(cubierto) / len(tokens)
+
+    def match(self, texto: str) -> Optional[Dict]:
+        """
+        Respuesta de la intención si el mensaje la expresa con confianza
+        (cobertura suficiente); si no, None y la consulta sigue por el modelo.
+        """
+        resultado = self.classify(texto)
+        with self._lock:
+            self.consultas += 1
+            if resultado is None or resultado[1] < self.cobertura_minima:
+                return None
+            self.omitidas[resultado[0]] += 1
+        intent = self._intents[resultado[0]]
+        return {
+            "respuesta": intent["respuesta"],
+            "fuente": intent["fuente"],
+            "acciones": list(intent.get("acciones", [])),
+        }
+
+    def stats(self) -> Dict:
+        total = sum(self.omitidas.values())
+        return {
+            "consultas": self.consultas,
+            "modelo_omitido": total,
+            "tasa": round(total / self.consultas, 4) if self.consultas else 0.0,
+            "por_intencion": dict(self.omitidas),
+            "cobertura_minima": self.cobertura_minima,
+        }
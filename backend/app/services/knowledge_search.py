@@ -1,11 +1,11 @@
+import logging
 import os
-from sentence_transformers import SentenceTransformer, util
 
-# Ruta donde están los archivos de scraping
-SCRAPED_DATA_DIR = os.path.join(os.path.dirname(__file__), 'scraped_data')
+from app.config.settings import get_settings
+from app.services.model_registry import get_model
+from app.services.scraped_index import SCRAPED_DATA_DIR, get_scraped_index
 
-# Cargar el modelo BERT multilingüe una sola vez
-model = SentenceTransformer('distiluse-base-multilingual-cased-v1')
+logger = logging.getLogger("uvicorn.error")
 
 def load_scraped_data():
     """
@@ -38,37 +38,27 @@ def split_text_into_chunks(text, max_chunk_size=500):
         chunks.append(current_chunk.strip())
     return chunks
 
-def search_in_scraped_data(pregunta_usuario, umbral_similitud=0.65, return_source=False):
+def search_in_scraped_data(pregunta_usuario, umbral_similitud=0.65, return_source=False,
+                           pregunta_embedding=None):
     """
-    Busca la pregunta en los archivos scrapeados y devuelve el fragmento más similar.
+    Busca la pregunta en el índice precalculado del corpus scrapeado y devuelve
+    el fragmento más similar (un único producto matriz-vector por consulta).
     Si return_source=True, devuelve una tupla (respuesta, fuente).
     """
-    scraped_data = load_scraped_data()
-    pregunta_embedding = model.encode(pregunta_usuario, convert_to_tensor=True)
+    index = get_scraped_index()
+    if index is None:
+        return (None, None) if return_source else None
+    if pregunta_embedding is None or index.model_name != get_settings().EMBEDDING_MODEL:
+        pregunta_embedding = get_model(index.model_name).encode(
+            pregunta_usuario, convert_to_numpy=True, normalize_embeddings=True
+        )
+    mejor_similitud, mejor_fragmento, mejor_fuente, _ = index.search(pregunta_embedding, query_text=pregunta_usuario)
 
-    mejor_similitud = 0
-    mejor_fragmento = None
-    mejor_fuente = None
-
-    for archivo, texto in scraped_data.items():
-        chunks = split_text_into_chunks(texto)
-        for chunk in chunks:
-            chunk_embedding = model.encode(chunk, convert_to_tensor=True)
-            similitud = util.pytorch_cos_sim(pregunta_embedding, chunk_embedding).item()
-
-            if similitud > mejor_similitud:
-                mejor_similitud = similitud
-                mejor_fragmento = chunk
-                mejor_fuente = archivo
-
-    print(f"[🔎] Mejor similitud: {mejor_similitud:.2f} (fuente: {mejor_fuente})")
+    logger.debug("[🔎] Mejor similitud: %.2f (fuente: %s)", mejor_similitud, mejor_fuente)
 
     if mejor_similitud >= umbral_similitud:
         if return_source:
-            import os
-            nombre_limpio = os.path.splitext(mejor_fuente)[0] if mejor_fuente else None
-            return mejor_fragmento.strip(), nombre_limpio
-
+            return mejor_fragmento.strip(), mejor_fuente
         else:
             return mejor_fragmento.strip()
     else:
@@ -76,4 +66,3 @@ def search_in_scraped_data(pregunta_usuario, umbral_similitud=0.65, return_sourc
             return None, None
         else:
             return None
-
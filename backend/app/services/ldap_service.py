@@ -1,76 +1,99 @@
 import ldap3
 import logging
-from datetime import datetime
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from app.config.settings import Settings
+import threading
+from typing import Dict, Optional
+from ldap3.utils.conv import escape_filter_chars
+from app.config.settings import Settings, get_settings
+from app.services.event_log import registrar_log_password_change
+from app.utils.ldap_pool import LdapPool
 
 logger = logging.getLogger(__name__)
 
+# Pool compartido por la verificación de cuentas y el cambio de contraseña
+_zoom_pool: Optional[LdapPool] = None
+_zoom_pool_lock = threading.Lock()
+
+
+def get_zoom_pool(settings: Optional[Settings] = None) -> LdapPool:
+    """Devuelve (creándolo la primera vez) el pool de conexiones al LDAP de Zoom."""
+    global _zoom_pool
+    if _zoom_pool is None:
+        with _zoom_pool_lock:
+            if _zoom_pool is None:
+                settings = settings or get_settings()
+                _zoom_pool = LdapPool(
+                    settings.LDAP_ZOOM_HOST,
+                    port=settings.LDAP_ZOOM_PORT,
+                    user=settings.LDAP_ZOOM_USER,
+                    password=settings.LDAP_ZOOM_PASSWORD.get_secret_value(),
+                    size=settings.LDAP_ZOOM_POOL_SIZE,
+                    strategy=settings.LDAP_ZOOM_STRATEGY,
+                    timeout=settings.LDAP_ZOOM_TIMEOUT,
+                    max_idle=settings.LDAP_ZOOM_MAX_IDLE
+                )
+    return _zoom_pool
+
+
+def close_zoom_pool() -> None:
+    if _zoom_pool is not None:
+        _zoom_pool.close()
+
+
+def zoom_pool_stats() -> Dict:
+    return _zoom_pool.stats() if _zoom_pool is not None else {}
+
+
+def zoom_account_exists(cedula: str, settings: Optional[Settings] = None) -> bool:
+    """True si existe en el LDAP de Zoom una entrada con cn=<cedula>."""
+    settings = settings or get_settings()
+
+    def buscar(conn: ldap3.Connection) -> bool:
+        conn.search(
+            search_base=settings.LDAP_ZOOM_BASE_DN,
+            search_filter=f"(cn={escape_filter_chars(cedula)})",
+            attributes=["cn"]
+        )
+        return bool(conn.entries)
+
+    return get_zoom_pool(settings).run(buscar)
+
+
 def change_ldap_zoom_password(
     username: str,
     new_password: str,
     settings: Settings,
-    db: Session,
     client_ip: str = "N/A"
 ) -> None:
     """
     Cambia la contraseña del usuario Zoom en LDAP y registra el evento.
     """
 
-    # 1) Extraigo la contraseña real del SecretStr
-    ldap_password = settings.LDAP_ZOOM_PASSWORD.get_secret_value()
-
-    # 2) Conexión al servidor LDAP
-    server = ldap3.Server(settings.LDAP_ZOOM_HOST, port=settings.LDAP_ZOOM_PORT, get_info=ldap3.ALL)
-    conn = ldap3.Connection(
-        server,
-        user=settings.LDAP_ZOOM_USER,
-        password=ldap_password,    # <-- ya es un str
-        auto_bind=True
-    )
-
-    # 3) Busco al usuario por su cn/uid
-    search_filter = f"(cn={username})"
-    conn.search(
-        search_base=settings.LDAP_ZOOM_BASE_DN,
-        search_filter=search_filter,
-        attributes=["uid"]
-    )
-    if not conn.entries:
-        conn.unbind()
-        logger.warning(f"[LDAP-ZOOM] Usuario '{username}' no encontrado.")
-        raise Exception(f"Usuario '{username}' no encontrado en LDAP.")
-
-    user_dn = conn.entries[0].entry_dn
-
-    # 4) Modifico la contraseña
-    success = conn.modify(
-        user_dn,
-        {"userPassword": [(ldap3.MODIFY_REPLACE, [new_password])]}
-    )
-    if not success:
-        error_msg = conn.result.get("message", "")
-        conn.unbind()
-        logger.error(f"[LDAP-ZOOM] Error modificando contraseña de {username}: {error_msg}")
-        raise Exception(f"Error al actualizar la contraseña: {error_msg}")
-
-    conn.unbind()
-
-    # 5) Registrar el cambio en la base de datos
-    try:
-        db.execute(text("""
-            INSERT INTO logs_password_changes
-              (usuario, sistema, ip_origen, fecha_hora, observacion)
-            VALUES
-              (:u, 'zoom', :ip, :dt, 'Cambio de contraseña exitoso')
-        """), {
-            "u": username,
-            "ip": client_ip,
-            "dt": datetime.utcnow()
-        })
-        db.commit()
-        logger.info(f"[LDAP-ZOOM] Contraseña cambiada para {username} desde {client_ip}")
-    except Exception as db_err:
-        db.rollback()
-        logger.warning(f"[LDAP-ZOOM] Cambio realizado, pero no se pudo registrar en logs: {db_err}")
+    def cambiar(conn: ldap3.Connection) -> None:
+        # 1) Busco al usuario por su cn/uid
+        conn.search(
+            search_base=settings.LDAP_ZOOM_BASE_DN,
+            search_filter=f"(cn={escape_filter_chars(username)})",
+            attributes=["uid"]
+        )
+        if not conn.entries:
+            logger.warning(f"[LDAP-ZOOM] Usuario '{username}' no encontrado.")
+            raise Exception(f"Usuario '{username}' no encontrado en LDAP.")
+
+        user_dn = conn.entries[0].entry_dn
+
+        # 2) Modifico la contraseña
+        success = conn.modify(
+            user_dn,
+            {"userPassword": [(ldap3.MODIFY_REPLACE, [new_password])]}
+        )
+        if not success:
+            error_msg = conn.result.get("message", "")
+            logger.error(f"[LDAP-ZOOM] Error modificando contraseña de {username}: {error_msg}")
+            raise Exception(f"Error al actualizar la contraseña: {error_msg}")
+
+    # Conexión ya enlazada del pool (sin bind ni descarga de esquema por petición)
+    get_zoom_pool(settings).run(cambiar)
+
+    # 3) Registrar el cambio en la base de datos (escritura diferida)
+    registrar_log_password_change(username, "zoom", client_ip, "Cambio de contraseña exitoso")
+    logger.info(f"[LDAP-ZOOM] Contraseña cambiada para {username} desde {client_ip}")
@@ -0,0 +1,228 @@
+# app/services/mail_outbox.py
+
+import asyncio
+import logging
+import time
+from collections import deque
+from email.message import EmailMessage
+from typing import Dict, List, Optional
+
+import aiosmtplib
+import numpy as np
+
+from app.config.settings import get_settings
+from app.utils.metrics import medir_dependencia
+
+logger = logging.getLogger("uvicorn.error")
+settings = get_settings()
+
+
+class _Envio:
+    __slots__ = ("msg", "intentos", "encolado")
+
+    def __init__(self, msg: EmailMessage):
+        self.msg = msg
+        self.intentos = 0
+        self.encolado = time.perf_counter()
+
+
+class SmtpOutbox:
+    """
+    Bandeja de salida SMTP: los correos se encolan sin esperar y `connections`
+    tareas los envían, cada una por su propia conexión SMTP autenticada que se
+    mantiene abierta entre mensajes (un solo connect/STARTTLS/login en lugar
+    de uno por correo). Si la conexión lleva más de `idle_seconds` parada se
+    verifica con NOOP antes de usarla. Ante un error de conexión esta se
+    descarta y se abre otra; el mensaje se reintenta con espera exponencial hasta `max_retries`
+    veces; los rechazos permanentes (5xx) no se reintentan.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str,
+        password: str,
+        start_tls: bool = True,
+        connections: int = 1,
+        max_retries: int = 4,
+        backoff_seconds: float = 2.0,
+        timeout: float = 10.0,
+        idle_seconds: float = 60.0
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self._password = password
+        self.start_tls = start_tls
+        self.connections = max(1, connections)
+        self.max_retries = max(0, max_retries)
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._reintentos_pendientes: set = set()
+        self._abiertas: set = set()   # clientes conectados y autenticados por _conectar
+
+        # Estadísticas
+        self.encolados = 0
+        self.enviados = 0
+        self.fallidos = 0
+        self.reintentos = 0
+        self.conexiones = 0
+        self._latencias_ms: deque = deque(maxlen=1000)
+
+    def _ensure_started(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or not self._workers or all(w.done() for w in self._workers):
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._workers = [
+                loop.create_task(self._worker()) for _ in range(self.connections)
+            ]
+        return self._queue
+
+    def send(self, msg: EmailMessage) -> None:
+        """Encola un correo; no espera a la conexión ni al envío."""
+        self._ensure_started().put_nowait(_Envio(msg))
+        self.encolados += 1
+
+    async def _conectar(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=self.host,
+            port=self.port,
+            start_tls=self.start_tls,
+            timeout=self.timeout,
+        )
+        await client.connect()
+        try:
+            await client.login(self.user, self._password)
+        except Exception:
+            client.close()
+            raise
+        self.conexiones += 1
+        self._abiertas.add(client)
+        return client
+
+    async def _cerrar(self, client: Optional[aiosmtplib.SMTP]) -> None:
+        if client is None:
+            return
+        self._abiertas.discard(client)
+        try:
+            if client.is_connected:
+                await client.quit()
+        except Exception:
+            client.close()
+
+    async def _viva(self, client: Optional[aiosmtplib.SMTP], ultimo_uso: float) -> bool:
+        """True si la conexión actual sigue utilizable (NOOP tras inactividad)."""
+        if client is None or not client.is_connected:
+            return False
+        if time.monotonic() - ultimo_uso <= self.idle_seconds:
+            return True
+        try:
+            await client.noop()
+            return True
+        except Exception:
+            return False
+
+    async def _worker(self) -> None:
+        client: Optional[aiosmtplib.SMTP] = None
+        ultimo_uso = time.monotonic()
+        try:
+            while True:
+                envio: _Envio = await self._queue.get()
+                try:
+                    if not await self._viva(client, ultimo_uso):
+                        # Se suelta antes de reconectar: si _conectar falla,
+                        # el except no debe volver a cerrar la conexión vieja
+                        await self._cerrar(client)
+                        client = None
+                        client = await self._conectar()
+                    with medir_dependencia("smtp", "send_message"):
+                        await client.send_message(envio.msg)
+                    ultimo_uso = time.monotonic()
+                    self.enviados += 1
+                    self._latencias_ms.append((time.perf_counter() - envio.encolado) * 1000)
+                    logger.info("✅ Correo enviado a %s", envio.msg["To"])
+                except Exception as e:
+                    # Un código de respuesta deja la sesión usable; cualquier
+                    # otro error puede dejarla en un estado inválido: se descarta
+                    if not (isinstance(e, aiosmtplib.SMTPResponseException)
+                            and client is not None and client.is_connected):
+                        await self._cerrar(client)
+                        client = None
+                    self._fallo(envio, e)
+                finally:
+                    self._queue.task_done()
+        finally:
+            await self._cerrar(client)
+
+    def _fallo(self, envio: _Envio, error: Exception) -> None:
+        permanente = isinstance(error, aiosmtplib.SMTPResponseException) and error.code >= 500
+        envio.intentos += 1
+        if permanente or envio.intentos > self.max_retries:
+            self.fallidos += 1
+            logger.error("❗ Error enviando correo a %s (%d intentos): %s",
+                         envio.msg["To"], envio.intentos, error)
+            return
+        self.reintentos += 1
+        espera = self.backoff_seconds * 2 ** (envio.intentos - 1)
+        logger.warning("[SMTP] Fallo enviando a %s, reintento en %.1fs: %s",
+                       envio.msg["To"], espera, error)
+        tarea = self._loop.create_task(self._reencolar(envio, espera))
+        self._reintentos_pendientes.add(tarea)
+        tarea.add_done_callback(self._reintentos_pendientes.discard)
+
+    async def _reencolar(self, envio: _Envio, espera: float) -> None:
+        await asyncio.sleep(espera)
+        self._queue.put_nowait(envio)
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Espera (hasta `timeout`) a que se vacíe la cola y cierra las conexiones."""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("[SMTP] Se apaga con %d correos sin enviar", self._queue.qsize())
+        if self._reintentos_pendientes:
+            logger.warning("[SMTP] Se descartan %d correos en espera de reintento",
+                           len(self._reintentos_pendientes))
+        for tarea in list(self._reintentos_pendientes) + self._workers:
+            tarea.cancel()
+        await asyncio.gather(*self._reintentos_pendientes, *self._workers, return_exceptions=True)
+        self._workers = []
+
+    def stats(self) -> Dict:
+        latencias = np.array(self._latencias_ms) if self._latencias_ms else None
+        return {
+            "en_cola": self._queue.qsize() if self._queue is not None else 0,
+            "en_espera_reintento": len(self._reintentos_pendientes),
+            "encolados": self.encolados,
+            "enviados": self.enviados,
+            "fallidos": self.fallidos,
+            "reintentos": self.reintentos,
+            "conexiones_abiertas": len(self._abiertas),
+            "conexiones_creadas": self.conexiones,
+            "p50_ms": round(float(np.percentile(latencias, 50)), 2) if latencias is not None else 0.0,
+            "p95_ms": round(float(np.percentile(latencias, 95)), 2) if latencias is not None else 0.0,
+        }
+
+
+# Bandeja única por proceso para los correos OTP
+mail_outbox = SmtpOutbox(
+    settings.SMTP_HOST,
+    port=settings.SMTP_PORT,
+    user=settings.SMTP_USER,
+    password=settings.SMTP_PASSWORD.get_secret_value(),
+    start_tls=settings.SMTP_START_TLS,
+    connections=settings.SMTP_CONNECTIONS,
+    max_retries=settings.SMTP_MAX_RETRIES,
+    backoff_seconds=settings.SMTP_RETRY_BACKOFF,
+    timeout=settings.SMTP_TIMEOUT,
+    idle_seconds=settings.SMTP_IDLE_SECONDS,
+)
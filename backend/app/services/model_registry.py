@@ -0,0 +1,182 @@
+# app/services/model_registry.py
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from app.config.settings import get_settings
+
+logger = logging.getLogger("uvicorn.error")
+
+# Registro de modelos compartido por todo el proceso (uno por nombre y modo)
+_models: Dict[Tuple[str, bool], SentenceTransformer] = {}
+_stats: Dict[str, dict] = {}
+_lock = threading.Lock()
+_torch_configurado = False
+
+
+def _rss_bytes() -> Optional[int]:
+    """Memoria residente actual del proceso (solo Linux)."""
+    try:
+        import resource
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, ImportError, ValueError, IndexError):
+        return None
+
+
+def _tensor_bytes(valor) -> int:
+    # Los pesos cuantizados se guardan empaquetados (tuplas de tensores)
+    if isinstance(valor, (tuple, list)):
+        return sum(_tensor_bytes(v) for v in valor)
+    if hasattr(valor, "element_size") and hasattr(valor, "numel"):
+        return valor.numel() * valor.element_size()
+    return 0
+
+
+def _param_bytes(model: SentenceTransformer) -> int:
+    return sum(_tensor_bytes(v) for v in model.state_dict().values())
+
+
+def _configurar_torch() -> None:
+    """Hilos intra-op de torch para este proceso (cada worker de uvicorn es uno)."""
+    global _torch_configurado
+    if _torch_configurado:
+        return
+    _torch_configurado = True
+    hilos = get_settings().TORCH_NUM_THREADS
+    if hilos > 0:
+        import torch
+        torch.set_num_threads(hilos)
+        logger.info("[MODEL] torch usará %d hilos intra-op", hilos)
+
+
+def _quantize(model: SentenceTransformer) -> SentenceTransformer:
+    """Cuantización dinámica int8 de las capas lineales (inferencia en CPU)."""
+    import torch
+
+    model.to("cpu")
+    torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return model
+
+
+def get_model(name: Optional[str] = None, quantize: Optional[bool] = None) -> SentenceTransformer:
+    """
+    Devuelve el SentenceTransformer `name` (por defecto EMBEDDING_MODEL),
+    cargándolo la primera vez que se pide y reutilizándolo después.
+    Con quantize=None se sigue EMBEDDING_QUANTIZE.
+    """
+    settings = get_settings()
+    name = name or settings.EMBEDDING_MODEL
+    quantize = settings.EMBEDDING_QUANTIZE if quantize is None else quantize
+    clave = (name, quantize)
+    model = _models.get(clave)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(clave)
+        if model is not None:
+            return model
+
+        _configurar_torch()
+        rss_antes = _rss_bytes()
+        t0 = time.perf_counter()
+        model = SentenceTransformer(name)
+        if quantize:
+            model = _quantize(model)
+        max_seq = settings.EMBEDDING_MAX_SEQ_LENGTH
+        if max_seq > 0 and getattr(model, "max_seq_length", None):
+            model.max_seq_length = min(max_seq, model.max_seq_length)
+        load_s = time.perf_counter() - t0
+        rss_despues = _rss_bytes()
+
+        etiqueta = f"{name} (int8)" if quantize else name
+        _stats[etiqueta] = {
+            "load_seconds": round(load_s, 3),
+            "param_mb": round(_param_bytes(model) / 2**20, 1),
+            "rss_delta_mb": (
+                round((rss_despues - rss_antes) / 2**20, 1)
+                if rss_antes is not None and rss_despues is not None else None
+            ),
+            "dim": model.get_sentence_embedding_dimension(),
+            "quantized": quantize,
+            "max_seq_length": getattr(model, "max_seq_length", None),
+        }
+        _models[clave] = model
+        logger.info(
+            "[MODEL] %s cargado en %.1fs (%.1f MB de parámetros)",
+            etiqueta, load_s, _stats[etiqueta]["param_mb"]
+        )
+        return model
+
+
+def model_stats() -> Dict[str, dict]:
+    """Tiempo de carga y huella de memoria de cada modelo residente."""
+    return {name: dict(st) for name, st in _stats.items()}
+
+
+def compare_quantized(textos: List[str], name: Optional[str] = None, batch_size: int = 32) -> Dict:
+    """
+    Compara el modelo completo con su versión cuantizada sobre `textos`:
+    latencia por consulta individual, rendimiento en lote y similitud coseno
+    entre los embeddings de ambos.
+    """
+    resultado = {}
+    embs = {}
+    for modo, quantize in (("float32", False), ("int8", True)):
+        model = get_model(name, quantize=quantize)
+        model.encode(textos[:4], show_progress_bar=False)  # calentamiento
+        latencias = []
+        for t in textos:
+            t0 = time.perf_counter()
+            model.encode(t, convert_to_numpy=True, show_progress_bar=False)
+            latencias.append((time.perf_counter() - t0) * 1000)
+        t0 = time.perf_counter()
+        embs[modo] = model.encode(
+            textos, batch_size=batch_size, convert_to_numpy=True,
+            normalize_embeddings=True, show_progress_bar=False
+        )
+        lote_s = time.perf_counter() - t0
+        resultado[modo] = {
+            "p50_ms": round(float(np.percentile(latencias, 50)), 2),
+            "p95_ms": round(float(np.percentile(latencias, 95)), 2),
+            "textos_por_s": round(len(textos) / lote_s, 1) if lote_s else None,
+        }
+
+    cosenos = (embs["float32"] * embs["int8"]).sum(axis=1)
+    sims_full = embs["float32"] @ embs["float32"].T
+    sims_q = embs["int8"] @ embs["int8"].T
+    np.fill_diagonal(sims_full, -1)
+    np.fill_diagonal(sims_q, -1)
+    resultado["coseno"] = {
+        "media": round(float(cosenos.mean()), 4),
+        "min": round(float(cosenos.min()), 4),
+        # Pregunta más parecida (excluida ella misma) igual en ambos modelos
+        "vecino_igual": round(float((sims_full.argmax(1) == sims_q.argmax(1)).mean()), 4),
+    }
+    resultado["modelos"] = model_stats()
+    return resultado
+
+
+if __name__ == "__main__":
+    # Comparación completo vs. int8 sobre las preguntas FAQ de la base de datos
+    import json
+
+    from sqlalchemy import text
+
+    from app.utils.db import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        preguntas = [r[0].lower() for r in db.execute(text("SELECT pregunta FROM faq")).fetchall()]
+    finally:
+        db.close()
+    if len(preguntas) < 2:
+        raise SystemExit("Se necesitan al menos dos preguntas FAQ para comparar")
+    print(json.dumps(compare_quantized(preguntas), indent=2, ensure_ascii=False))
@@ -0,0 +1,168 @@
+# app/services/otp_store.py
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, text
+
+from app.config.settings import get_settings
+from app.utils.db import SessionLocal, run_db
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger("uvicorn.error")
+settings = get_settings()
+
+OTP_REAP_MODES = ("off", "delete", "archive")
+
+_CAMPOS = ("id", "cedula", "correo", "codigo_otp", "expiracion", "usado")
+
+
+class OtpStore:
+    """
+    Tokens OTP vigentes en memoria (TTLCache que caduca con cada token) con
+    escritura inmediata en otp_tokens. La búsqueda por (cédula, código) se
+    resuelve en memoria y solo va a la BD si el token no está (otro worker,
+    reinicio). El consumo es un UPDATE condicional, así que un mismo OTP no
+    puede verificarse dos veces aunque haya varios workers.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self._vivos = TTLCache(maxsize=maxsize, ttl=600.0)
+        self.db_lookups = 0
+        self.reaped = 0
+
+    # ------------------------ memoria ------------------------
+    def _guardar(self, rec: Dict) -> None:
+        restante = (rec["expiracion"] - datetime.utcnow()).total_seconds()
+        if restante > 0:
+            self._vivos.set((rec["cedula"], rec["codigo_otp"]), rec, ttl=restante)
+
+    def _en_memoria(self, cedula: str, codigo: str) -> Optional[Dict]:
+        rec = self._vivos.get((cedula, codigo))
+        return dict(rec) if rec is not None else None
+
+    # ------------------------ BD (síncrono, vía run_db) ------------------------
+    def create(self, cedula: str, correo: str, codigo: str, expiracion: datetime, ip: str) -> Dict:
+        with SessionLocal() as db:
+            res = db.execute(text(
+                "INSERT INTO otp_tokens(cedula,correo,codigo_otp,expiracion,ip_origen,comentario) "
+                "VALUES(:c,:e,:o,:x,:ip,'OTP enviado')"
+            ), {"c": cedula, "e": correo, "o": codigo, "x": expiracion, "ip": ip})
+            otp_id = res.lastrowid
+            db.commit()
+        rec = {
+            "id": otp_id, "cedula": cedula, "correo": correo,
+            "codigo_otp": codigo, "expiracion": expiracion, "usado": False,
+        }
+        self._guardar(rec)
+        return dict(rec)
+
+    def _buscar_db(self, cedula: str, codigo: str) -> Optional[Dict]:
+        self.db_lookups += 1
+        with SessionLocal() as db:
+            fila = db.execute(text(
+                "SELECT id, cedula, correo, codigo_otp, expiracion, usado FROM otp_tokens "
+                "WHERE cedula=:c AND codigo_otp=:o ORDER BY id DESC LIMIT 1"
+            ), {"c": cedula, "o": codigo}).mappings().first()
+        if fila is None:
+            return None
+        rec = {k: fila[k] for k in _CAMPOS}
+        rec["usado"] = bool(rec["usado"])
+        self._guardar(rec)
+        return dict(rec)
+
+    def _actualizar_usado(self, rec: Dict, condicional: bool) -> bool:
+        sql = "UPDATE otp_tokens SET usado=TRUE WHERE id=:id"
+        if condicional:
+            sql += " AND usado=FALSE"
+        with SessionLocal() as db:
+            filas = db.execute(text(sql), {"id": rec["id"]}).rowcount
+            db.commit()
+        rec = dict(rec, usado=True)
+        self._guardar(rec)
+        return filas == 1 or not condicional
+
+    # ------------------------ API async ------------------------
+    async def find(self, cedula: str, codigo: str) -> Optional[Dict]:
+        """Último OTP emitido con ese código para la cédula (o None)."""
+        rec = self._en_memoria(cedula, codigo)
+        if rec is not None:
+            return rec
+        return await run_db(self._buscar_db, cedula, codigo)
+
+    async def consume(self, rec: Dict) -> bool:
+        """Marca el OTP como usado solo si aún no lo estaba; False si otro lo consumió antes."""
+        return await run_db(self._actualizar_usado, rec, True)
+
+    async def mark_used(self, rec: Dict) -> None:
+        await run_db(self._actualizar_usado, rec, False)
+
+    async def create_async(self, cedula: str, correo: str, codigo: str, expiracion: datetime, ip: str) -> Dict:
+        return await run_db(self.create, cedula, correo, codigo, expiracion, ip)
+
+    # ------------------------ limpieza ------------------------
+    def reap(self, mode: str = "archive", grace_seconds: float = 3600.0, batch: int = 500) -> int:
+        """
+        Archiva (copia a otp_tokens_archive) o borra, en lotes de `batch`, los
+        tokens caducados hace más de `grace_seconds`. Los usados siguen en la
+        tabla hasta caducar porque los endpoints de reset los vuelven a leer.
+        """
+        if mode not in OTP_REAP_MODES:
+            raise ValueError(f"Modo de limpieza OTP desconocido: {mode}")
+        self._vivos.purge_expired()
+        if mode == "off":
+            return 0
+
+        corte = datetime.utcnow() - timedelta(seconds=grace_seconds)
+        borrar = text("DELETE FROM otp_tokens WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+        archivar = text(
+            "INSERT INTO otp_tokens_archive SELECT * FROM otp_tokens WHERE id IN :ids"
+        ).bindparams(bindparam("ids", expanding=True))
+        total = 0
+        while True:
+            with SessionLocal() as db:
+                ids = [i for (i,) in db.execute(text(
+                    "SELECT id FROM otp_tokens WHERE expiracion < :corte ORDER BY id LIMIT :n"
+                ), {"corte": corte, "n": batch})]
+                if not ids:
+                    break
+                if mode == "archive":
+                    db.execute(archivar, {"ids": ids})
+                db.execute(borrar, {"ids": ids})
+                db.commit()
+            total += len(ids)
+            if len(ids) < batch:
+                break
+        if total:
+            self.reaped += total
+            logger.info("[OTP] %d tokens caducados %s", total, "archivados" if mode == "archive" else "eliminados")
+        return total
+
+    def stats(self) -> Dict:
+        return {
+            "vivos": len(self._vivos),
+            "memoria": self._vivos.stats(),
+            "db_lookups": self.db_lookups,
+            "reaped": self.reaped,
+        }
+
+
+# Instancia compartida por el proceso
+otp_store = OtpStore(maxsize=settings.OTP_CACHE_SIZE)
+
+
+async def periodic_reap(interval: float) -> None:
+    """Tarea de fondo: limpia los OTP caducados cada `interval` segundos."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_db(
+                otp_store.reap,
+                settings.OTP_REAP_MODE,
+                settings.OTP_REAP_GRACE_SECONDS,
+                settings.OTP_REAP_BATCH,
+            )
+        except Exception as e:
+            logger.error("[OTP] Error en la limpieza periódica: %s", e)
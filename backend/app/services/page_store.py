@@ -0,0 +1,182 @@
+# app/services/page_store.py
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger("uvicorn.error")
+
+SCRAPED_DATA_DIR = os.path.join(os.path.dirname(__file__), 'scraped_data')
+PAGE_STORE_FILE = os.path.join(SCRAPED_DATA_DIR, 'pages.jsonl')
+
+
+def content_hash(texto: str) -> str:
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def iter_pages(path: str = PAGE_STORE_FILE, domain: Optional[str] = None) -> Iterator[dict]:
+    """
+    Recorre el almacén registro a registro (memoria constante).
+    Cada registro: url, domain, fetched_at, etag, last_modified,
+    content_hash, links y text.
+    """
+    if not path or not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for linea in f:
+            if not linea.strip():
+                continue
+            rec = json.loads(linea)
+            if domain is None or rec.get("domain") == domain:
+                yield rec
+
+
+class PageStore:
+    """
+    Almacén JSONL de páginas rastreadas, una línea por URL. En memoria solo
+    se guardan los validadores HTTP y los enlaces (para GET condicionales);
+    el texto permanece en disco. Implementa la interfaz de estado del Crawler;
+    con path=None funciona solo en memoria (no persiste nada).
+
+    Los registros migrados de los .txt (legacy=True) se descartan en cuanto
+    el rastreo guarda páginas reales de su mismo dominio.
+    """
+
+    def __init__(self, path: Optional[str] = PAGE_STORE_FILE):
+        self.path = path
+        self._meta: Dict[str, dict] = {}
+        self._pendientes: Dict[str, dict] = {}
+        self._tocadas: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        for rec in iter_pages(path):
+            self._meta[rec["url"]] = {
+                "etag": rec.get("etag"),
+                "last_modified": rec.get("last_modified"),
+                "content_hash": rec.get("content_hash"),
+                "links": rec.get("links", []),
+            }
+
+    def __len__(self) -> int:
+        return len(self._meta)
+
+    def get(self, url: str) -> Optional[dict]:
+        return self._meta.get(url)
+
+    def update(self, res) -> None:
+        """Registra el resultado de una descarga (PageResult del Crawler)."""
+        ahora = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with self._lock:
+            if res.not_modified:
+                self._tocadas[res.url] = ahora
+                return
+            texto = '\n'.join(' '.join(t.split()) for t in res.texts)
+            rec = {
+                "url": res.url,
+                "domain": urlparse(res.url).netloc,
+                "fetched_at": ahora,
+                "etag": res.etag,
+                "last_modified": res.last_modified,
+                "content_hash": content_hash(texto),
+                "links": res.links,
+                "text": texto,
+            }
+            self._pendientes[res.url] = rec
+            self._meta[res.url] = {k: rec[k] for k in ("etag", "last_modified", "content_hash", "links")}
+
+    def save(self) -> int:
+        """
+        Vuelca los cambios: reescribe el archivo en streaming sustituyendo los
+        registros actualizados y lo reemplaza de forma atómica.
+        Devuelve cuántos registros nuevos o modificados se escribieron.
+        """
+        with self._lock:
+            pendientes, tocadas = self._pendientes, self._tocadas
+            self._pendientes, self._tocadas = {}, {}
+        if not self.path or not (pendientes or tocadas):
+            return 0
+
+        dominios_frescos = {rec["domain"] for rec in pendientes.values()}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        escritas = 0
+        with open(tmp, 'w', encoding='utf-8') as out:
+            for rec in iter_pages(self.path):
+                if rec.get("legacy") and rec["domain"] in dominios_frescos and rec["url"] not in pendientes:
+                    with self._lock:
+                        self._meta.pop(rec["url"], None)
+                    continue
+                nuevo = pendientes.pop(rec["url"], None)
+                if nuevo is not None:
+                    rec = nuevo
+                    escritas += 1
+                elif rec["url"] in tocadas:
+                    rec["fetched_at"] = tocadas[rec["url"]]
+                out.write(json.dumps(rec, ensure_ascii=False) + '\n')
+            for rec in pendientes.values():
+                out.write(json.dumps(rec, ensure_ascii=False) + '\n')
+                escritas += 1
+        os.replace(tmp, self.path)
+        logger.info("[PAGES] %d páginas nuevas o modificadas guardadas en %s", escritas, self.path)
+        return escritas
+
+
+def migrate_txt_files(data_dir: str = SCRAPED_DATA_DIR, path: str = PAGE_STORE_FILE) -> int:
+    """
+    Convierte los `<dominio>.txt` heredados en registros del almacén (uno por
+    archivo, con la raíz del dominio como URL). No pisa URLs ya presentes.
+    """
+    existentes = {rec["url"] for rec in iter_pages(path)}
+    nuevos = 0
+    with open(path, 'a', encoding='utf-8') as out:
+        for filename in sorted(os.listdir(data_dir)):
+            if not filename.endswith('.txt'):
+                continue
+            domain = os.path.splitext(filename)[0]
+            url = f"https://{domain}/"
+            if url in existentes:
+                continue
+            filepath = os.path.join(data_dir, filename)
+            with open(filepath, 'r', encoding='utf-8') as f:
+                texto = f.read()
+            rec = {
+                "url": url,
+                "domain": domain,
+                "fetched_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(os.path.getmtime(filepath))),
+                "etag": None,
+                "last_modified": None,
+                "content_hash": content_hash(texto),
+                "links": [],
+                "text": texto,
+                "legacy": True,
+            }
+            out.write(json.dumps(rec, ensure_ascii=False) + '\n')
+            nuevos += 1
+    return nuevos
+
+
+def iter_corpus(data_dir: str = SCRAPED_DATA_DIR, path: str = PAGE_STORE_FILE) -> Iterator[Tuple[str, str, str]]:
+    """
+    Genera (dominio, url, texto) página a página para el indexador. Si aún no
+    hay almacén JSONL, recorre los .txt heredados de uno en uno.
+    """
+    if os.path.exists(path):
+        for rec in iter_pages(path):
+            if rec.get("text"):
+                yield rec["domain"], rec["url"], rec["text"]
+        return
+    for filename in sorted(os.listdir(data_dir)):
+        if not filename.endswith('.txt'):
+            continue
+        domain = os.path.splitext(filename)[0]
+        with open(os.path.join(data_dir, filename), 'r', encoding='utf-8') as f:
+            yield domain, f"https://{domain}/", f.read()
+
+
+if __name__ == "__main__":
+    n = migrate_txt_files()
+    print(f"[✔️] {n} archivos .txt migrados a {PAGE_STORE_FILE}")
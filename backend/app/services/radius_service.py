@@ -2,9 +2,9 @@
 
 from sqlalchemy import text
 from sqlalchemy.orm import Session
-from app.utils.db import SessionLocalEstudiantes, SessionLocalServidores, SessionLocal
+from app.utils.db import SessionLocalEstudiantes, SessionLocalServidores
+from app.services.event_log import registrar_log_password_change
 from fastapi import HTTPException
-from datetime import datetime
 import logging
 
 logger = logging.getLogger("uvicorn.error")
@@ -40,7 +40,7 @@ def change_radius_password(username: str, new_password: str, group: str, ip_orig
         db_radius.commit()
         logger.info(f"[RADIUS] Contraseña actualizada para usuario: {username}")
 
-        # Registrar en logs con IP
+        # Registrar en logs con IP (escritura diferida)
         registrar_log_password_change(username, "radius", ip_origen, "Cambio de contraseña exitoso")
 
     except HTTPException:
@@ -52,28 +52,3 @@ def change_radius_password(username: str, new_password: str, group: str, ip_orig
         raise HTTPException(status_code=500, detail="Error interno actualizando RADIUS")
     finally:
         db_radius.close()
-
-
-def registrar_log_password_change(usuario: str, sistema: str, ip: str, observacion: str):
-    """
-    Registra un cambio de contraseña en la tabla logs_password_changes.
-    """
-    try:
-        db = SessionLocal()
-        stmt = text("""
-            INSERT INTO logs_password_changes (usuario, sistema, ip_origen, fecha_hora, observacion)
-            VALUES (:u, :s, :ip, :dt, :obs)
-        """)
-        db.execute(stmt, {
-            "u": usuario,
-            "s": sistema,
-            "ip": ip,
-            "dt": datetime.utcnow(),
-            "obs": observacion
-        })
-        db.commit()
-    except Exception as e:
-        logger.warning(f"[RADIUS] Cambio realizado, pero error registrando en DB: {e}")
-    finally:
-        db.close()
-
@@ -0,0 +1,267 @@
+# app/services/scraped_index.py
+
+import json
+import logging
+import os
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.services.bm25_index import BM25Index, hybrid_best
+from app.services.dedup import DedupReport, dedup_blocks, dedup_lines
+from app.services.model_registry import get_model
+from app.services.page_store import PAGE_STORE_FILE, iter_corpus
+from app.services.vector_index import VectorIndex, build_index, load_index
+
+logger = logging.getLogger("uvicorn.error")
+
+# Directorio de los textos scrapeados y del índice precalculado
+SCRAPED_DATA_DIR = os.path.join(os.path.dirname(__file__), 'scraped_data')
+SCRAPED_INDEX_DIR = os.path.join(SCRAPED_DATA_DIR, '_index')
+
+VECTORS_FILE = 'vectors.npz'
+META_FILE = 'meta.json'
+
+
+class ScrapedIndex:
+    """
+    Índice en disco del corpus scrapeado: fragmentos, dominio y URL de origen
+    y un índice vectorial sobre sus embeddings normalizados (una fila por fragmento).
+    """
+
+    def __init__(
+        self,
+        chunks: List[str],
+        fuentes: List[str],
+        index: VectorIndex,
+        model_name: str,
+        fingerprint: Optional[dict] = None,
+        dedup: Optional[dict] = None,
+        urls: Optional[List[str]] = None
+    ):
+        self.chunks = chunks
+        self.fuentes = fuentes
+        self.urls = urls or [f"https://{f}/" for f in fuentes]
+        # El índice léxico se reconstruye al cargar: es barato y no se persiste
+        self.lexical = BM25Index(chunks)
+        self.index = index
+        self.model_name = model_name
+        self.fingerprint = fingerprint or {}
+        self.dedup = dedup or {}
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        query_text: Optional[str] = None
+    ) -> Tuple[float, Optional[str], Optional[str], Optional[str]]:
+        """
+        Devuelve (similitud, fragmento, fuente, url) del fragmento más parecido.
+        query_embedding debe venir normalizado con el mismo modelo del índice;
+        con query_text se aplica la etapa léxica configurada (LEXICAL_MODE).
+        """
+        settings = get_settings()
+        hibrido = hybrid_best(
+            self.lexical, self.index, query_text, query_embedding,
+            settings.LEXICAL_MODE, settings.LEXICAL_TOPN, settings.RRF_K
+        )
+        if hibrido is not None:
+            score, best_idx = hibrido
+        else:
+            scores, ids = self.index.search(query_embedding, k=1)
+            if not len(ids):
+                return 0.0, None, None, None
+            score, best_idx = float(scores[0]), int(ids[0])
+        return score, self.chunks[best_idx], self.fuentes[best_idx], self.urls[best_idx]
+
+    def save(self, index_dir: str = SCRAPED_INDEX_DIR) -> None:
+        """
+        Escribe en archivos temporales y los renombra al final: un worker que
+        arranca mientras se reconstruye el índice nunca lee uno a medias.
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        vectores = os.path.join(index_dir, VECTORS_FILE)
+        self.index.save(f"{vectores}.tmp.npz")
+        meta = {
+            "model": self.model_name,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "fingerprint": self.fingerprint,
+            "dedup": self.dedup,
+            "chunks": [
+                {"texto": c, "fuente": f, "url": u}
+                for c, f, u in zip(self.chunks, self.fuentes, self.urls)
+            ],
+        }
+        ruta_meta = os.path.join(index_dir, META_FILE)
+        with open(f"{ruta_meta}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(f"{vectores}.tmp.npz", vectores)
+        os.replace(f"{ruta_meta}.tmp", ruta_meta)
+
+    @classmethod
+    def load(cls, index_dir: str = SCRAPED_INDEX_DIR) -> "ScrapedIndex":
+        with open(os.path.join(index_dir, META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return cls(
+            chunks=[c["texto"] for c in meta["chunks"]],
+            fuentes=[c["fuente"] for c in meta["chunks"]],
+            index=load_index(os.path.join(index_dir, VECTORS_FILE)),
+            model_name=meta["model"],
+            fingerprint=meta.get("fingerprint", {}),
+            dedup=meta.get("dedup", {}),
+            urls=[c.get("url") or f"https://{c['fuente']}/" for c in meta["chunks"]],
+        )
+
+
+def corpus_fingerprint(data_dir: str = SCRAPED_DATA_DIR) -> dict:
+    """
+    Huella (tamaño y mtime) del almacén de páginas y de cada .txt, para
+    detectar un índice desactualizado.
+    """
+    huella = {}
+    for filename in sorted(os.listdir(data_dir)):
+        if filename.endswith('.txt') or filename == os.path.basename(PAGE_STORE_FILE):
+            st = os.stat(os.path.join(data_dir, filename))
+            huella[filename] = [st.st_size, int(st.st_mtime)]
+    return huella
+
+
+def build_scraped_index(model_name: Optional[str] = None, data_dir: str = SCRAPED_DATA_DIR) -> ScrapedIndex:
+    """
+    Recorre las páginas en streaming, descarta líneas y bloques duplicados
+    entre páginas y subdominios, y codifica el resto en un lote.
+    """
+    from app.services.knowledge_search import split_text_into_chunks
+
+    settings = get_settings()
+    model_name = model_name or settings.EMBEDDING_MODEL
+    model = get_model(model_name)
+    report = DedupReport()
+
+    def paginas():
+        # Solo una página en memoria a la vez; se cuenta la línea base sin dedup
+        for domain, url, texto in iter_corpus(data_dir, os.path.join(data_dir, os.path.basename(PAGE_STORE_FILE))):
+            report.bloques_sin_dedup += sum(1 for c in split_text_into_chunks(texto) if c)
+            yield (domain, url), texto
+
+    bloques = (
+        (origen, chunk)
+        for origen, texto in dedup_lines(paginas(), report)
+        for chunk in split_text_into_chunks(texto) if chunk
+    )
+    bloques = dedup_blocks(bloques, umbral=settings.DEDUP_NEAR_THRESHOLD, report=report)
+    logger.info(
+        "[INDEX] Deduplicación: %d→%d líneas, %d→%d fragmentos (-%.1f%%)",
+        report.lineas_entrada, report.lineas_salida,
+        report.bloques_sin_dedup, report.bloques_salida, report.reduccion_bloques * 100
+    )
+    fuentes = [domain for (domain, _), _ in bloques]
+    urls = [url for (_, url), _ in bloques]
+    chunks = [c for _, c in bloques]
+
+    t0 = time.perf_counter()
+    if chunks:
+        embeddings = model.encode(
+            chunks,
+            batch_size=64,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        ).astype(np.float32)
+    else:
+        embeddings = np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    logger.info(
+        "[INDEX] %d fragmentos codificados en %.1fs", len(chunks), time.perf_counter() - t0
+    )
+    return ScrapedIndex(
+        chunks, fuentes, build_index(embeddings), model_name,
+        corpus_fingerprint(data_dir), dedup=report.as_dict(), urls=urls
+    )
+
+
+# ------------------------ SINGLETON DEL ÍNDICE ------------------------
+_index: Optional[ScrapedIndex] = None
+_aviso_sin_indice = False
+
+
+def load_scraped_index(
+    model_name: Optional[str] = None,
+    index_dir: str = SCRAPED_INDEX_DIR,
+    build_missing: bool = False
+) -> Optional[ScrapedIndex]:
+    """
+    Carga el índice desde disco una sola vez. Si no existe o fue construido con
+    otro modelo devuelve None (el arranque no codifica el corpus: cada worker
+    lo haría a la vez); con build_missing=True, para las herramientas de
+    línea de comandos, lo construye y lo guarda.
+    """
+    global _index
+    model_name = model_name or get_settings().EMBEDDING_MODEL
+    index = None
+    if os.path.exists(os.path.join(index_dir, META_FILE)):
+        try:
+            index = ScrapedIndex.load(index_dir)
+        except Exception as e:
+            logger.warning("[INDEX] No se pudo leer el índice scrapeado: %s", e)
+        if index is not None and index.model_name != model_name:
+            logger.warning(
+                "[INDEX] Índice construido con %s, se esperaba %s.", index.model_name, model_name
+            )
+            index = None
+        if index is not None and index.fingerprint != corpus_fingerprint():
+            logger.warning(
+                "[INDEX] El corpus cambió desde la última construcción; "
+                "ejecute `python -m app.services.scraped_index` para actualizarlo."
+            )
+
+    if index is None and not build_missing:
+        logger.error(
+            "[INDEX] No hay índice scrapeado utilizable en %s; la búsqueda en scraping queda "
+            "desactivada. Ejecute `python -m app.services.scraped_index` para construirlo.",
+            index_dir
+        )
+        return None
+    if index is None:
+        index = build_scraped_index(model_name)
+        index.save(index_dir)
+
+    _index = index
+    logger.info("[INDEX] Índice scrapeado listo: %d fragmentos", len(index))
+    return index
+
+
+def get_scraped_index() -> Optional[ScrapedIndex]:
+    """
+    Índice cargado en el arranque, o None si esa carga falló. Nunca lo
+    construye aquí: desde una petición eso codificaría todo el corpus.
+    """
+    global _aviso_sin_indice
+    if _index is None and not _aviso_sin_indice:
+        _aviso_sin_indice = True
+        logger.warning(
+            "[INDEX] El índice scrapeado no está cargado; la búsqueda en scraping no "
+            "devolverá resultados hasta reiniciar o ejecutar `python -m app.services.scraped_index`."
+        )
+    return _index
+
+
+def rebuild_scraped_index(index_dir: str = SCRAPED_INDEX_DIR) -> ScrapedIndex:
+    """
+    Reconstruye el índice desde el almacén de páginas y lo persiste (tras un scraping).
+    """
+    global _index
+    index = build_scraped_index()
+    index.save(index_dir)
+    _index = index
+    return index
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    idx = rebuild_scraped_index()
+    print(f"[✔️] Índice reconstruido: {len(idx)} fragmentos en {SCRAPED_INDEX_DIR}")
+    print(f"    Deduplicación: {idx.dedup}")
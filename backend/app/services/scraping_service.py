@@ -2,6 +2,12 @@ import requests
 from bs4 import BeautifulSoup
 import os
 
+from app.config.settings import get_settings
+from app.services.crawler import Crawler, extract_texts
+from app.services.model_registry import get_model
+from app.services.page_store import PAGE_STORE_FILE, PageStore, migrate_txt_files
+from app.services.scraped_index import get_scraped_index
+
 # Directorio donde guardamos los textos scrapeados
 SCRAPED_DATA_DIR = os.path.join(os.path.dirname(__file__), 'scraped_data')
 
@@ -42,71 +48,52 @@ def clean_text(text):
     """Limpia el texto eliminando saltos de línea y espacios extra."""
     return ' '.join(text.split())
 
-from urllib.parse import urljoin, urlparse
+
+def _new_crawler(max_pages):
+    settings = get_settings()
+    return Crawler(
+        max_workers=settings.CRAWL_MAX_WORKERS,
+        per_host=settings.CRAWL_PER_HOST,
+        delay=settings.CRAWL_DELAY_SECONDS,
+        max_pages=max_pages,
+        state=PageStore(PAGE_STORE_FILE),
+    )
+
+
+def crawl_and_save(urls, max_pages=5, crawler=None):
+    """
+    Rastrea todas las URLs en paralelo (hasta max_pages por sitio) y guarda
+    cada página como un registro del almacén JSONL. Devuelve las URLs
+    semilla que obtuvieron páginas.
+    """
+    if crawler is None:
+        # Primera ejecución: se conservan los .txt heredados hasta que su
+        # dominio se rastree con éxito
+        if not os.path.exists(PAGE_STORE_FILE):
+            migrate_txt_files(SCRAPED_DATA_DIR, PAGE_STORE_FILE)
+        crawler = _new_crawler(max_pages)
+    resultados = crawler.crawl(urls)
+
+    semillas = []
+    for url in urls:
+        paginas = resultados.get(url, [])
+        if not paginas:
+            print(f"[⚠️] Sin páginas para {url}; se conservan los registros anteriores")
+            continue
+        sin_cambios = sum(p.not_modified for p in paginas)
+        print(f"[✔️] {url}: {len(paginas)} páginas ({sin_cambios} sin cambios)")
+        semillas.append(url)
+    return semillas
+
 
 def scrape_and_save(url, max_pages=5):
     """
     Scrapea una URL y también visita enlaces internos (hasta max_pages).
-    Guarda todo el texto en un archivo local.
+    Guarda cada página en el almacén y devuelve su ruta.
     """
-    visited = set()
-    to_visit = [url]
-    all_texts = []
-
-    while to_visit and len(visited) < max_pages:
-        current_url = to_visit.pop(0)
-        if current_url in visited:
-            continue
+    crawl_and_save([url], max_pages=max_pages)
+    return PAGE_STORE_FILE
 
-        print(f"Scrapeando: {current_url}")
-        try:
-            response = requests.get(current_url, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Extraer texto visible
-            texts = []
-            for tag in soup.find_all(['p', 'li', 'span']):
-                content = tag.get_text(strip=True)
-                if content:
-                    texts.append(content)
-
-            all_texts.extend(texts)
-            visited.add(current_url)
-
-            # Buscar enlaces internos
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                full_url = urljoin(url, href)
-                # Asegurar que pertenece al mismo dominio
-                if urlparse(full_url).netloc == urlparse(url).netloc:
-                    if full_url not in visited and full_url not in to_visit:
-                        to_visit.append(full_url)
-
-        except Exception as e:
-            print(f"[⚠️] Error scrapeando {current_url}: {e}")
-
-    # Limpiar y unir texto
-    final_text = '\n'.join([clean_text(t) for t in all_texts])
-
-    # Guardar en archivo local
-    domain = url.replace('https://', '').replace('http://', '').replace('/', '_')
-    filepath = os.path.join(SCRAPED_DATA_DIR, f"{domain}.txt")
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(final_text)
-
-    print(f"[✔️] Scraping + crawling completado para: {url} (guardado en {filepath})")
-    return filepath
-
-
-def load_scraped_data():
-    """Carga todos los textos scrapeados y los devuelve en un diccionario."""
-    data = {}
-    for filename in os.listdir(SCRAPED_DATA_DIR):
-        if filename.endswith('.txt'):
-            with open(os.path.join(SCRAPED_DATA_DIR, filename), 'r', encoding='utf-8') as f:
-                data[filename] = f.read()
-    return data
 
 def scrape_live(url):
     """Scrapea en vivo y devuelve el texto sin guardarlo."""
@@ -114,11 +101,7 @@ def scrape_live(url):
         response = requests.get(url, timeout=10)
         response.raise_for_status()
         soup = BeautifulSoup(response.text, 'html.parser')
-        texts = []
-        for tag in soup.find_all(['p', 'li', 'span']):
-            content = tag.get_text(strip=True)
-            if content:
-                texts.append(content)
+        texts = extract_texts(soup)
         final_text = '\n'.join([clean_text(t) for t in texts])
         print(f"[🔎] Scraping en vivo completado para: {url}")
         return final_text
@@ -127,42 +110,23 @@ def scrape_live(url):
         return ''
 
 
-
-
-from sentence_transformers import SentenceTransformer, util
-
-# Modelo reutilizable (evita cargar múltiples veces)
-_model = SentenceTransformer("all-MiniLM-L6-v2")
-
-def search_in_scraped_data(query: str, threshold: float = 0.6) -> str:
+def search_in_scraped_data(query: str, threshold: float = 0.6, query_embedding=None) -> str:
     """
-    Busca semánticamente en los textos scrapeados usando embeddings.
+    Busca semánticamente en el índice precalculado de textos scrapeados.
     Retorna el fragmento más similar si supera el umbral.
+    query_embedding permite reutilizar el embedding ya calculado de la pregunta.
     """
-    query_embedding = _model.encode(query, convert_to_tensor=True)
-
-    data = load_scraped_data()
-    mejores_similitudes = []
+    index = get_scraped_index()
+    if index is None:
+        return ""
+    if query_embedding is None or index.model_name != get_settings().EMBEDDING_MODEL:
+        query_embedding = get_model(index.model_name).encode(
+            query, convert_to_numpy=True, normalize_embeddings=True
+        )
 
-    for archivo, texto in data.items():
-        oraciones = [line.strip() for line in texto.split('\n') if len(line.strip()) > 20]
-        if not oraciones:
-            continue
-
-        oraciones_embeddings = _model.encode(oraciones, convert_to_tensor=True)
-        similitudes = util.pytorch_cos_sim(query_embedding, oraciones_embeddings)[0]
-
-        best_idx = similitudes.argmax().item()
-        best_score = similitudes[best_idx].item()
+    score, frag, _, url = index.search(query_embedding, query_text=query)
 
-        if best_score >= threshold:
-            fragmento = oraciones[best_idx]
-            mejores_similitudes.append((best_score, archivo, fragmento))
-
-    if mejores_similitudes:
-        mejores_similitudes.sort(reverse=True)  # mayor similitud primero
-        score, archivo, frag = mejores_similitudes[0]
-        return f"{frag} <br><small>🔎 Fuente scraping: {archivo} (similitud: {score:.2f})</small>"
+    if frag and score >= threshold:
+        return f"{frag} <br><small>🔎 Fuente scraping: <a href=\"{url}\" target=\"_blank\">{url}</a> (similitud: {score:.2f})</small>"
 
     return ""
-
@@ -0,0 +1,279 @@
+# app/services/vector_index.py
+
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.services.embedding_codec import EmbeddingCodec, QuantizedMatrix
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class VectorIndex(ABC):
+    """
+    Índice de vectores normalizados con búsqueda top-k por producto interno
+    (similitud coseno). Las implementaciones concretas definen cómo se
+    seleccionan los candidatos. Los vectores se guardan en el formato
+    compacto de `codec` (float32 por defecto) y se puntúan sin descomprimir.
+    """
+
+    kind = "base"
+
+    def __init__(
+        self,
+        vectors: Optional[np.ndarray] = None,
+        codec: Optional[EmbeddingCodec] = None,
+        matrix: Optional[QuantizedMatrix] = None
+    ):
+        self.codec = codec or EmbeddingCodec()
+        self.matrix = matrix if matrix is not None else self.codec.encode(vectors)
+        self._queries = 0
+        self._total_ms = 0.0
+        self._latencias = []
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.dim
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Vectores almacenados en float32 (proyectados si hay PCA). Crea una copia."""
+        return self.matrix.decode()
+
+    @abstractmethod
+    def _search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        ...
+
+    def search(self, query: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Devuelve (scores, ids) de los k vectores más parecidos, en orden descendente.
+        """
+        if not len(self):
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        t0 = time.perf_counter()
+        scores, ids = self._search(self.codec.project(query), min(k, len(self)))
+        ms = (time.perf_counter() - t0) * 1000
+        self._queries += 1
+        self._total_ms += ms
+        self._latencias.append(ms)
+        if len(self._latencias) > 1000:
+            del self._latencias[:500]
+        return scores, ids
+
+    def score_rows(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Similitud de la consulta con filas concretas (re-puntuación de candidatos)."""
+        return self.matrix.scores(self.codec.project(query), rows=np.asarray(rows, dtype=np.int64))
+
+    def stats(self) -> Dict:
+        lat = np.array(self._latencias) if self._latencias else np.zeros(1)
+        return {
+            "kind": self.kind,
+            "vectors": len(self),
+            "dtype": self.matrix.dtype,
+            "dim": self.dim,
+            "mb": round(self.matrix.nbytes / 2**20, 3),
+            "queries": self._queries,
+            "avg_ms": round(self._total_ms / self._queries, 4) if self._queries else 0.0,
+            "p50_ms": round(float(np.percentile(lat, 50)), 4),
+            "p99_ms": round(float(np.percentile(lat, 99)), 4),
+        }
+
+    # ------------------------ PERSISTENCIA ------------------------
+    def _extra_arrays(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    def save(self, path: str) -> None:
+        extra = self._extra_arrays()
+        if self.matrix.scales is not None:
+            extra["scales"] = self.matrix.scales
+        np.savez(
+            path, kind=np.array(self.kind), vectors=self.matrix.data,
+            **self.codec.to_arrays(), **extra
+        )
+
+    @staticmethod
+    def _load_matrix(arrays) -> Tuple[EmbeddingCodec, QuantizedMatrix]:
+        scales = arrays["scales"] if "scales" in arrays else None
+        return EmbeddingCodec.from_arrays(arrays), QuantizedMatrix(arrays["vectors"], scales)
+
+    @classmethod
+    def _from_arrays(cls, arrays) -> "VectorIndex":
+        codec, matrix = cls._load_matrix(arrays)
+        return cls(codec=codec, matrix=matrix)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Posiciones de los k mayores scores, ordenadas de mayor a menor."""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+class ExactIndex(VectorIndex):
+    """Búsqueda exhaustiva: un producto matriz-vector sobre todos los vectores."""
+
+    kind = "exact"
+
+    def _search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = self.matrix.scores(query)
+        ids = _top_k(scores, k)
+        return scores[ids], ids
+
+
+class IVFIndex(VectorIndex):
+    """
+    Índice aproximado IVF: los vectores se reparten en `nlist` particiones
+    (k-means sobre el corpus) y cada consulta solo puntúa las `nprobe`
+    particiones cuyo centroide es más parecido.
+    """
+
+    kind = "ivf"
+
+    def __init__(
+        self,
+        vectors: Optional[np.ndarray] = None,
+        nlist: int = 0,
+        nprobe: int = 8,
+        centroids: Optional[np.ndarray] = None,
+        assignments: Optional[np.ndarray] = None,
+        codec: Optional[EmbeddingCodec] = None,
+        matrix: Optional[QuantizedMatrix] = None
+    ):
+        super().__init__(vectors, codec=codec, matrix=matrix)
+        self.nprobe = nprobe
+        if centroids is None or assignments is None:
+            centroids, assignments = self._train(nlist)
+        self.centroids = centroids.astype(np.float32)
+        self.assignments = assignments.astype(np.int64)
+        # Listas invertidas: ids ordenados por partición + desplazamientos
+        self._order = np.argsort(self.assignments, kind="stable")
+        self._offsets = np.searchsorted(
+            self.assignments[self._order], np.arange(len(self.centroids) + 1)
+        )
+
+    def _train(self, nlist: int) -> Tuple[np.ndarray, np.ndarray]:
+        from sklearn.cluster import MiniBatchKMeans
+
+        n = len(self)
+        nlist = nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        t0 = time.perf_counter()
+        km = MiniBatchKMeans(n_clusters=nlist, batch_size=4096, n_init=3, random_state=0)
+        assignments = km.fit_predict(self.vectors)
+        centroids = km.cluster_centers_
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True) + 1e-12
+        logger.info(
+            "[VECTOR] IVF entrenado: %d vectores en %d particiones (%.1fs)",
+            n, nlist, time.perf_counter() - t0
+        )
+        return centroids, assignments
+
+    def _search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        listas = _top_k(self.centroids @ query, min(self.nprobe, len(self.centroids)))
+        candidatos = np.concatenate(
+            [self._order[self._offsets[c]:self._offsets[c + 1]] for c in listas]
+        )
+        if not len(candidatos):
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        scores = self.matrix.scores(query, rows=candidatos)
+        pos = _top_k(scores, min(k, len(candidatos)))
+        return scores[pos], candidatos[pos]
+
+    def _extra_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "centroids": self.centroids,
+            "assignments": self.assignments,
+            "nprobe": np.array(self.nprobe),
+        }
+
+    @classmethod
+    def _from_arrays(cls, arrays) -> "IVFIndex":
+        codec, matrix = cls._load_matrix(arrays)
+        return cls(
+            nprobe=get_settings().IVF_NPROBE or int(arrays["nprobe"]),
+            centroids=arrays["centroids"],
+            assignments=arrays["assignments"],
+            codec=codec,
+            matrix=matrix,
+        )
+
+
+_BACKENDS = {ExactIndex.kind: ExactIndex, IVFIndex.kind: IVFIndex}
+
+
+def build_index(vectors: np.ndarray, kind: Optional[str] = None) -> VectorIndex:
+    """
+    Construye el índice configurado (VECTOR_INDEX_BACKEND) con el formato de
+    almacenamiento configurado (VECTOR_DTYPE, VECTOR_PCA_DIM). Por debajo de
+    IVF_MIN_VECTORS el índice aproximado no compensa y se usa el exacto.
+    """
+    settings = get_settings()
+    kind = kind or settings.VECTOR_INDEX_BACKEND
+    if kind not in _BACKENDS:
+        raise ValueError(f"Backend de índice vectorial desconocido: {kind}")
+    vectors = np.asarray(vectors, dtype=np.float32)
+    codec = EmbeddingCodec(settings.VECTOR_DTYPE, settings.VECTOR_PCA_DIM).fit(vectors)
+    if kind == IVFIndex.kind and len(vectors) >= settings.IVF_MIN_VECTORS:
+        return IVFIndex(vectors, nlist=settings.IVF_NLIST, nprobe=settings.IVF_NPROBE, codec=codec)
+    return ExactIndex(vectors, codec=codec)
+
+
+def load_index(path: str) -> VectorIndex:
+    with np.load(path) as arrays:
+        kind = str(arrays["kind"])
+        return _BACKENDS[kind]._from_arrays(arrays)
+
+
+def evaluate_recall(index: VectorIndex, queries: np.ndarray, k: int = 10) -> Dict:
+    """
+    Recall@k del índice frente a la búsqueda exacta sobre los mismos vectores
+    almacenados, con latencias medias.
+    """
+    exacto = ExactIndex(codec=index.codec, matrix=index.matrix)
+    aciertos = 0
+    t_idx = t_ex = 0.0
+    for q in queries:
+        t0 = time.perf_counter()
+        _, ids = index.search(q, k)
+        t1 = time.perf_counter()
+        _, ref = exacto.search(q, k)
+        t2 = time.perf_counter()
+        aciertos += len(np.intersect1d(ids, ref))
+        t_idx += t1 - t0
+        t_ex += t2 - t1
+    n = max(1, len(queries))
+    return {
+        "kind": index.kind,
+        "k": k,
+        "queries": len(queries),
+        "recall": round(aciertos / (n * min(k, len(index))), 4) if len(index) else 1.0,
+        "avg_ms": round(t_idx / n * 1000, 4),
+        "exact_avg_ms": round(t_ex / n * 1000, 4),
+    }
+
+
+if __name__ == "__main__":
+    # Recall y latencia del backend configurado sobre el índice scrapeado
+    from app.services.scraped_index import load_scraped_index
+
+    logging.basicConfig(level=logging.INFO)
+    settings = get_settings()
+    base = load_scraped_index(build_missing=True).index
+    vectores = base.vectors
+    rng = np.random.default_rng(0)
+    muestra = vectores[rng.choice(len(vectores), size=min(200, len(vectores)), replace=False)]
+    # Los vectores ya están proyectados: el IVF se entrena sin volver a aplicar PCA
+    ivf = IVFIndex(
+        vectores, nlist=settings.IVF_NLIST, nprobe=settings.IVF_NPROBE,
+        codec=EmbeddingCodec(base.matrix.dtype)
+    )
+    print(evaluate_recall(ivf, muestra, k=10))
+    print(ivf.stats())
@@ -0,0 +1,216 @@
+# app/utils/admission.py
+
+import math
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config.settings import get_settings
+from app.utils.ttl_cache import TTLCache
+
+settings = get_settings()
+
+# Carriles: "modelo" (inferencia, con tope global de peticiones en curso),
+# "prioridad" (OTP y cambios de contraseña: nunca compiten con el modelo)
+# y "general" para el resto
+_MODELO = frozenset({"/api/chatbot/query"})
+_PRIORIDAD = frozenset({
+    "/api/chatbot/enviar_otp",
+    "/api/chatbot/verificar_otp",
+    "/api/chatbot/reset_radius_password",
+    "/api/chatbot/reset_zoom_password",
+})
+
+
+def ip_cliente(scope: Scope, proxies: Iterable[str] = ()) -> str:
+    """
+    IP del cliente para las cubetas. Si la conexión viene de un proxy de
+    confianza se toma de X-Forwarded-For la última dirección que no sea otro
+    proxy (lo anterior lo escribe el propio cliente y no es fiable); si no,
+    la IP del par. Detrás de NGINX, sin esto todos compartirían su cubeta.
+    """
+    par = scope["client"][0] if scope.get("client") else "desconocido"
+    confianza = set(proxies)
+    if par not in confianza:
+        return par
+    for nombre, valor in scope.get("headers", ()):
+        if nombre == b"x-forwarded-for":
+            for ip in reversed(valor.decode("latin-1").split(",")):
+                ip = ip.strip()
+                if ip and ip not in confianza:
+                    return ip
+    return par
+
+
+class TokenBucket:
+    """Cubeta de fichas: `rate` fichas por segundo hasta un máximo de `burst`."""
+
+    __slots__ = ("rate", "burst", "tokens", "last")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.last = time.monotonic()
+
+    def take(self) -> float:
+        """Consume una ficha; devuelve 0 si se admitió o los segundos hasta la próxima."""
+        ahora = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (ahora - self.last) * self.rate)
+        self.last = ahora
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class AdmissionController:
+    """
+    Decide si una petición entra: cubeta por IP y carril, cubeta global por
+    endpoint (ADMISSION_ENDPOINT_RATES) y tope de peticiones de modelo en
+    curso. Lo que no entra se rechaza de inmediato (429 por cliente, 503 por
+    capacidad) con Retry-After, en vez de encolar más trabajo de CPU.
+    """
+
+    def __init__(
+        self,
+        ip_rate: float,
+        ip_burst: float,
+        priority_ip_rate: float,
+        priority_ip_burst: float,
+        endpoint_rates: Dict[str, float],
+        max_inflight: int,
+        max_clients: int = 10000
+    ):
+        self.ip_rate, self.ip_burst = ip_rate, ip_burst
+        self.priority_ip_rate, self.priority_ip_burst = priority_ip_rate, priority_ip_burst
+        self.max_inflight = max_inflight
+        self._por_ip = TTLCache(maxsize=max_clients, ttl=600.0)
+        self._por_endpoint = {
+            path: TokenBucket(rate, burst=max(1.0, 2 * rate)) for path, rate in endpoint_rates.items()
+        }
+        self._lock = threading.Lock()
+        self.en_curso = 0
+        self.max_en_curso = 0
+        self.admitidas: Counter = Counter()
+        self.rechazadas: Counter = Counter()
+
+    @staticmethod
+    def carril(path: str) -> str:
+        if path in _MODELO:
+            return "modelo"
+        if path in _PRIORIDAD:
+            return "prioridad"
+        return "general"
+
+    def _bucket_ip(self, ip: str, carril: str) -> TokenBucket:
+        clave = (ip, carril == "prioridad")
+        bucket = self._por_ip.get(clave)
+        if bucket is None:
+            if carril == "prioridad":
+                bucket = TokenBucket(self.priority_ip_rate, self.priority_ip_burst)
+            else:
+                bucket = TokenBucket(self.ip_rate, self.ip_burst)
+            self._por_ip.set(clave, bucket)
+        return bucket
+
+    def admit(self, ip: str, path: str) -> Tuple[Optional[int], float, str]:
+        """
+        (None, 0, carril) si la petición entra (y, en el carril de modelo,
+        ocupa un cupo que se libera con `release`); si no, (status, segundos
+        de Retry-After, carril).
+        """
+        carril = self.carril(path)
+        with self._lock:
+            espera = self._bucket_ip(ip, carril).take()
+            if espera:
+                self.rechazadas[f"{carril}:ip"] += 1
+                return 429, espera, carril
+            if carril != "prioridad":
+                bucket = self._por_endpoint.get(path)
+                espera = bucket.take() if bucket is not None else 0.0
+                if espera:
+                    self.rechazadas[f"{carril}:endpoint"] += 1
+                    return 503, espera, carril
+            if carril == "modelo":
+                if self.en_curso >= self.max_inflight:
+                    self.rechazadas["modelo:en_curso"] += 1
+                    return 503, 1.0, carril
+                self.en_curso += 1
+                self.max_en_curso = max(self.max_en_curso, self.en_curso)
+            self.admitidas[carril] += 1
+            return None, 0.0, carril
+
+    def release(self) -> None:
+        with self._lock:
+            self.en_curso -= 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "en_curso_modelo": self.en_curso,
+                "max_en_curso_modelo": self.max_en_curso,
+                "tope_en_curso": self.max_inflight,
+                "clientes": len(self._por_ip),
+                "admitidas": dict(self.admitidas),
+                "rechazadas": dict(self.rechazadas),
+                "endpoints": {
+                    path: {"rate": b.rate, "fichas": round(b.tokens, 2)}
+                    for path, b in self._por_endpoint.items()
+                },
+            }
+
+
+def mensaje_rechazo(status: int) -> str:
+    """Texto para el cliente según el motivo: 429 (cliente) o 503 (capacidad)."""
+    if status == 429:
+        return "Demasiadas solicitudes, intenta de nuevo en unos segundos."
+    return "El asistente está ocupado, intenta de nuevo en unos segundos."
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI que aplica el AdmissionController a las peticiones HTTP."""
+
+    def __init__(self, app: ASGIApp, controller: "AdmissionController", trusted_proxies: Iterable[str] = ()):
+        self.app = app
+        self.controller = controller
+        self.trusted_proxies = tuple(trusted_proxies)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        ip = ip_cliente(scope, self.trusted_proxies)
+        status, espera, carril = self.controller.admit(ip, scope["path"])
+        if status is not None:
+            respuesta = JSONResponse(
+                {"detail": mensaje_rechazo(status)},
+                status_code=status,
+                headers={"Retry-After": str(max(1, math.ceil(espera)))},
+            )
+            await respuesta(scope, receive, send)
+            return
+
+        if carril != "modelo":
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+
+# Controlador único por proceso
+admission = AdmissionController(
+    ip_rate=settings.ADMISSION_IP_RATE,
+    ip_burst=settings.ADMISSION_IP_BURST,
+    priority_ip_rate=settings.ADMISSION_PRIORITY_IP_RATE,
+    priority_ip_burst=settings.ADMISSION_PRIORITY_IP_BURST,
+    endpoint_rates=settings.ADMISSION_ENDPOINT_RATES,
+    max_inflight=settings.ADMISSION_MAX_INFLIGHT,
+)
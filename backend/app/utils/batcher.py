@@ -0,0 +1,155 @@
+# app/utils/batcher.py
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.utils.metrics import BATCH_SECONDS, BATCH_SIZE
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class MicroBatcher:
+    """
+    Agrupa llamadas concurrentes durante unos milisegundos y las resuelve con
+    una sola invocación de `fn(items) -> resultados` en un hilo de trabajo,
+    sin bloquear el event loop. Cada llamador recibe su resultado vía future.
+    Hasta `workers` lotes se procesan a la vez: con 1 (inferencia, que ya
+    ocupa la CPU) el siguiente lote espera al anterior; con más, una llamada
+    de red lenta no retiene los lotes que llegan detrás.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], List[Any]],
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0,
+        executor: Optional[Executor] = None,
+        name: str = "batcher",
+        workers: int = 1
+    ):
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+        self.workers = max(1, workers)
+        self._executor = executor or ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=name)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._recogiendo: List[Tuple[Any, asyncio.Future]] = []
+        self._en_proceso: Dict[asyncio.Task, List[Tuple[Any, asyncio.Future]]] = {}
+
+        # Estadísticas
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.last_batch_ms = 0.0
+
+    def _ensure_started(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+        return self._queue
+
+    async def submit(self, item: Any) -> Any:
+        queue = self._ensure_started()
+        future = self._loop.create_future()
+        await queue.put((item, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        # Se publica en cuanto sale de la cola para que close() lo encuentre
+        batch = self._recogiendo = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            restante = deadline - self._loop.time()
+            if restante <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), restante))
+            except asyncio.TimeoutError:
+                break
+        # Lo que ya esté encolado entra sin esperar más
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        cupos = asyncio.Semaphore(self.workers)
+
+        def terminado(tarea: asyncio.Task) -> None:
+            self._en_proceso.pop(tarea, None)
+            cupos.release()
+
+        while True:
+            # Con todos los workers ocupados el siguiente lote sigue creciendo en la cola
+            await cupos.acquire()
+            batch = await self._collect()
+            tarea = self._loop.create_task(self._procesar(batch))
+            self._en_proceso[tarea] = batch
+            self._recogiendo = []
+            tarea.add_done_callback(terminado)
+
+    async def _procesar(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        items = [item for item, _ in batch]
+        t0 = time.perf_counter()
+        try:
+            resultados = await self._loop.run_in_executor(self._executor, self.fn, items)
+        except Exception as e:
+            logger.error("[%s] Error procesando lote de %d: %s", self.name, len(items), e)
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        self.batches += 1
+        self.items += len(items)
+        self.max_batch_seen = max(self.max_batch_seen, len(items))
+        self.last_batch_ms = (time.perf_counter() - t0) * 1000
+        BATCH_SIZE.observe(len(items), self.name)
+        BATCH_SECONDS.observe(self.last_batch_ms / 1000, self.name)
+        if len(resultados) != len(batch):
+            logger.error("[%s] Lote de %d devolvió %d resultados", self.name, len(batch), len(resultados))
+        for (_, fut), res in zip(batch, resultados):
+            if not fut.done():
+                fut.set_result(res)
+        # Los que no recibieron resultado no pueden quedarse esperando
+        for _, fut in batch[len(resultados):]:
+            if not fut.done():
+                fut.set_exception(RuntimeError(f"{self.name}: lote sin resultado para este elemento"))
+
+    async def close(self) -> None:
+        """Detiene los lotes, falla todo lo pendiente (en cola o en proceso) y cierra el executor."""
+        tareas = list(self._en_proceso)
+        lotes = [self._recogiendo, *self._en_proceso.values()]
+        if self._task is not None:
+            tareas.append(self._task)
+            self._task = None
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        pendientes = [fut for lote in lotes for _, fut in lote]
+        while self._queue is not None and not self._queue.empty():
+            pendientes.append(self._queue.get_nowait()[1])
+        self._recogiendo = []
+        self._en_proceso = {}
+        for fut in pendientes:
+            if not fut.done():
+                fut.set_exception(RuntimeError(f"{self.name}: batcher cerrado"))
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_seen": self.max_batch_seen,
+            "last_batch_ms": round(self.last_batch_ms, 2),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": len(self._en_proceso),
+        }
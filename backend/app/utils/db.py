@@ -1,24 +1,82 @@
 # app/utils/db.py
 
-from sqlalchemy import create_engine
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from sqlalchemy import create_engine, exc
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from app.config.settings import get_settings
+from app.utils.metrics import medir_dependencia
 
 settings = get_settings()
 
+
+class _PoolStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que mide cuánto espera cada petición por una conexión libre."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = _PoolStats()
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self.stats.lock:
+                self.stats.timeouts += 1
+            raise
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            with self.stats.lock:
+                self.stats.checkouts += 1
+                self.stats.total_wait_ms += ms
+                self.stats.max_wait_ms = max(self.stats.max_wait_ms, ms)
+
+    def recreate(self):
+        # dispose()/invalidación recrean el pool: se conservan las estadísticas
+        nuevo = super().recreate()
+        nuevo.stats = self.stats
+        return nuevo
+
+
+def _create_engine(url, prefijo: str, **kwargs):
+    """Motor con pool medido y tamaños DB_<prefijo>_* de la configuración."""
+    return create_engine(
+        str(url),
+        poolclass=TimedQueuePool,
+        pool_size=getattr(settings, f"DB_{prefijo}_POOL_SIZE"),
+        max_overflow=getattr(settings, f"DB_{prefijo}_MAX_OVERFLOW"),
+        pool_recycle=getattr(settings, f"DB_{prefijo}_POOL_RECYCLE"),
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=True,
+        **kwargs
+    )
+
+
 # -----------------------------------
 # Motor y sesión principal (FAQ/OTP)
-engine = create_engine(
-    str(settings.DATABASE_URL),
-    pool_pre_ping=True
-)
+engine = _create_engine(settings.DATABASE_URL, "MAIN")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # -----------------------------------
 # Sesión para RADIUS Estudiantes (MySQL)
-engine_est = create_engine(
-    str(settings.DATABASE_URL_ESTUDIANTES),
-    pool_pre_ping=True,
+engine_est = _create_engine(
+    settings.DATABASE_URL_ESTUDIANTES, "EST",
     connect_args={"charset": "utf8"}            # <— fuerza utf8
 )
 SessionLocalEstudiantes = sessionmaker(
@@ -27,11 +85,99 @@ SessionLocalEstudiantes = sessionmaker(
 
 # -----------------------------------
 # Sesión para RADIUS servidores (MySQL)
-engine_doc = create_engine(
-    str(settings.DATABASE_URL_SERVIDORES),
-    pool_pre_ping=True,
+engine_doc = _create_engine(
+    settings.DATABASE_URL_SERVIDORES, "SRV",
     connect_args={"charset": "utf8"}            # <— fuerza utf8
 )
 SessionLocalServidores = sessionmaker(
     autocommit=False, autoflush=False, bind=engine_doc
 )
+
+_ENGINES = {"main": engine, "estudiantes": engine_est, "servidores": engine_doc}
+
+
+# -----------------------------------
+# Ejecución sin bloquear el event loop
+class _DbExecutor:
+    """Pool acotado de hilos para el trabajo síncrono de SQLAlchemy."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        self._lock = threading.Lock()
+        self.enviadas = 0
+        self.en_curso = 0
+        self.completadas = 0
+        self.total_cola_ms = 0.0
+
+    def _envolver(self, fn: Callable, encolada: float) -> Any:
+        with self._lock:
+            self.en_curso += 1
+            self.total_cola_ms += (time.perf_counter() - encolada) * 1000
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self.en_curso -= 1
+                self.completadas += 1
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            self.enviadas += 1
+        llamada = functools.partial(fn, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._envolver, llamada, time.perf_counter()
+        )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            iniciadas = self.completadas + self.en_curso
+            return {
+                "workers": self.workers,
+                "en_curso": self.en_curso,
+                "en_cola": self.enviadas - iniciadas,
+                "completadas": self.completadas,
+                "avg_cola_ms": round(self.total_cola_ms / iniciadas, 3) if iniciadas else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+db_executor = _DbExecutor(settings.DB_EXECUTOR_WORKERS)
+
+
+async def run_db(fn: Callable, *args, **kwargs) -> Any:
+    """
+    Ejecuta `fn(*args, **kwargs)` (código síncrono que abre sus propias
+    sesiones) en el pool de hilos de BD y espera el resultado sin bloquear
+    el event loop.
+    """
+    with medir_dependencia("mysql", getattr(fn, "__name__", "run_db")):
+        return await db_executor.run(fn, *args, **kwargs)
+
+
+def db_stats() -> Dict:
+    """Ocupación y tiempos de espera de cada pool, más la cola del executor."""
+    motores = {}
+    for nombre, eng in _ENGINES.items():
+        pool = eng.pool
+        st = getattr(pool, "stats", None)
+        capacidad = pool.size() + max(0, pool._max_overflow)
+        info = {
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "utilizacion": round(pool.checkedout() / capacidad, 4) if capacidad else 0.0,
+        }
+        if st is not None:
+            info.update({
+                "checkouts": st.checkouts,
+                "timeouts": st.timeouts,
+                "avg_wait_ms": round(st.total_wait_ms / st.checkouts, 3) if st.checkouts else 0.0,
+                "max_wait_ms": round(st.max_wait_ms, 3),
+            })
+        motores[nombre] = info
+    return {"engines": motores, "executor": db_executor.stats()}
@@ -0,0 +1,164 @@
+# app/utils/ldap_pool.py
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict
+
+import ldap3
+from ldap3.core.exceptions import LDAPBindError, LDAPCommunicationError
+
+from app.utils.metrics import medir_dependencia
+
+logger = logging.getLogger("uvicorn.error")
+
+# Estrategias síncronas que dejan los resultados en conn.entries
+LDAP_STRATEGIES = ("SYNC", "RESTARTABLE", "MOCK_SYNC")
+
+
+class LdapPool:
+    """
+    Conexiones LDAP ya autenticadas y reutilizables. El Server se crea una
+    sola vez sin descargar el DSE ni el esquema (get_info=NONE); cada
+    conexión se abre y se enlaza (bind) al crearse y vuelve al pool tras
+    usarse. Antes de entregar una conexión se comprueba que siga enlazada y
+    que no lleve más de `max_idle` segundos parada; si no, se reemplaza.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str,
+        password: str,
+        size: int = 4,
+        strategy: str = "SYNC",
+        timeout: float = 5.0,
+        max_idle: float = 300.0
+    ):
+        if strategy not in LDAP_STRATEGIES:
+            raise ValueError(f"Estrategia LDAP no soportada: {strategy}")
+        self.server = ldap3.Server(host, port=port, get_info=ldap3.NONE, connect_timeout=timeout)
+        self.user = user
+        self._password = password
+        self.size = max(1, size)
+        self.strategy = strategy
+        self.timeout = timeout
+        self.max_idle = max_idle
+
+        self._libres: "queue.LifoQueue" = queue.LifoQueue()
+        self._cupos = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+
+        # Estadísticas
+        self.creadas = 0
+        self.reutilizadas = 0
+        self.descartadas = 0
+        self.en_uso = 0
+        self.esperas = 0
+        self.total_wait_ms = 0.0
+
+    def _abrir(self) -> ldap3.Connection:
+        conn = ldap3.Connection(
+            self.server,
+            user=self.user,
+            password=self._password,
+            client_strategy=getattr(ldap3, self.strategy),
+            receive_timeout=self.timeout,
+            raise_exceptions=False
+        )
+        if not conn.bind():
+            raise LDAPBindError(f"Bind LDAP fallido: {conn.result.get('description', '')}")
+        with self._lock:
+            self.creadas += 1
+        return conn
+
+    def _descartar(self, conn: ldap3.Connection) -> None:
+        with self._lock:
+            self.descartadas += 1
+        try:
+            conn.unbind()
+        except Exception:
+            pass
+
+    def _tomar(self) -> ldap3.Connection:
+        t0 = time.perf_counter()
+        if not self._cupos.acquire(timeout=self.timeout):
+            raise LDAPCommunicationError("No hay conexiones LDAP libres en el pool")
+        with self._lock:
+            self.esperas += 1
+            self.total_wait_ms += (time.perf_counter() - t0) * 1000
+        try:
+            while True:
+                try:
+                    conn, desde = self._libres.get_nowait()
+                except queue.Empty:
+                    conn = self._abrir()
+                    break
+                if conn.closed or not conn.bound or time.monotonic() - desde > self.max_idle:
+                    self._descartar(conn)
+                    continue
+                with self._lock:
+                    self.reutilizadas += 1
+                break
+        except Exception:
+            self._cupos.release()
+            raise
+        with self._lock:
+            self.en_uso += 1
+        return conn
+
+    def _devolver(self, conn: ldap3.Connection, sana: bool) -> None:
+        with self._lock:
+            self.en_uso -= 1
+        if sana and not conn.closed:
+            self._libres.put((conn, time.monotonic()))
+        else:
+            self._descartar(conn)
+        self._cupos.release()
+
+    def run(self, fn: Callable[[ldap3.Connection], Any]) -> Any:
+        """
+        Ejecuta `fn(conn)` con una conexión del pool. Si la conexión resultó
+        caída (error de comunicación) se descarta y se reintenta una vez con
+        una nueva.
+        """
+        for intento in (1, 2):
+            conn = self._tomar()
+            sana = True
+            try:
+                with medir_dependencia("ldap", getattr(fn, "__name__", "run")):
+                    return fn(conn)
+            except LDAPCommunicationError as e:
+                sana = False
+                if intento == 2:
+                    raise
+                logger.warning("[LDAP] Conexión caída, se reintenta con una nueva: %s", e)
+            finally:
+                self._devolver(conn, sana)
+
+    def close(self) -> None:
+        """Cierra las conexiones libres (al apagar el servidor)."""
+        while True:
+            try:
+                conn, _ = self._libres.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                conn.unbind()
+            except Exception:
+                pass
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "strategy": self.strategy,
+                "libres": self._libres.qsize(),
+                "en_uso": self.en_uso,
+                "creadas": self.creadas,
+                "reutilizadas": self.reutilizadas,
+                "descartadas": self.descartadas,
+                "avg_wait_ms": round(self.total_wait_ms / self.esperas, 3) if self.esperas else 0.0,
+            }
@@ -0,0 +1,266 @@
+# app/utils/metrics.py
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Límites por defecto de los histogramas de latencia (segundos)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(nombres: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _numero(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metrica:
+    tipo = "untyped"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.register(self)
+
+    def _serie(self, valores: Tuple[str, ...], nueva: Callable[[], object]):
+        serie = self._series.get(valores)
+        if serie is None:
+            if len(valores) != len(self.etiquetas):
+                raise ValueError(f"{self.nombre} espera las etiquetas {self.etiquetas}")
+            with self._lock:
+                serie = self._series.setdefault(valores, nueva())
+        return serie
+
+    def _cabecera(self) -> List[str]:
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+
+
+class Counter(_Metrica):
+    """Contador monótono, opcionalmente con etiquetas: `c.inc("FAQ BD")`."""
+
+    tipo = "counter"
+
+    def inc(self, *valores: str, amount: float = 1) -> None:
+        serie = self._serie(valores, lambda: [0])
+        with self._lock:
+            serie[0] += amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            filas = [(v, s[0]) for v, s in self._series.items()]
+        return self._cabecera() + [
+            f"{self.nombre}{_etiquetas(self.etiquetas, v)} {_numero(x)}" for v, x in filas
+        ]
+
+
+class Gauge(_Metrica):
+    """Valor instantáneo que se fija con `set` y puede subir o bajar."""
+
+    tipo = "gauge"
+
+    def set(self, valor: float, *valores: str) -> None:
+        serie = self._serie(valores, lambda: [0])
+        with self._lock:
+            serie[0] = valor
+
+    def inc(self, *valores: str, amount: float = 1) -> None:
+        serie = self._serie(valores, lambda: [0])
+        with self._lock:
+            serie[0] += amount
+
+    def dec(self, *valores: str, amount: float = 1) -> None:
+        self.inc(*valores, amount=-amount)
+
+    render = Counter.render
+
+
+class Histogram(_Metrica):
+    """
+    Histograma de límites fijos. `observe` solo busca el cubo (bisect) e
+    incrementa un contador, así que puede quedarse activo en producción;
+    el acumulado que pide el formato de Prometheus se calcula al exportar.
+    """
+
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, valor: float, *valores: str) -> None:
+        # [conteos por cubo..., +Inf, suma]
+        serie = self._serie(valores, lambda: [0] * (len(self.buckets) + 2))
+        i = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie[i] += 1
+            serie[-1] += valor
+
+    @contextmanager
+    def time(self, *valores: str):
+        """Mide el bloque `with` en segundos (también si termina con excepción)."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, *valores)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            filas = [(v, list(s)) for v, s in self._series.items()]
+        lineas = self._cabecera()
+        for valores, serie in filas:
+            acumulado = 0
+            for limite, n in zip(self.buckets + (float("inf"),), serie[:-1]):
+                acumulado += n
+                le = 'le="' + _numero(float(limite)) + '"'
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, valores, le)} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, valores)} {_numero(float(serie[-1]))}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, valores)} {acumulado}")
+        return lineas
+
+
+class CallbackMetric:
+    """
+    Métrica calculada al exportar a partir de las estadísticas que ya llevan
+    los componentes (cachés, pools...): `fn()` devuelve pares
+    (valores de etiquetas, valor).
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        ayuda: str,
+        tipo: str,
+        etiquetas: Sequence[str],
+        fn: Callable[[], Iterable[Tuple[Sequence[str], float]]]
+    ):
+        self.nombre, self.ayuda, self.tipo = nombre, ayuda, tipo
+        self.etiquetas = tuple(etiquetas)
+        self.fn = fn
+        REGISTRY.register(self)
+
+    def render(self) -> List[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        for valores, valor in self.fn():
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, valores)} {_numero(valor)}")
+        return lineas
+
+
+class Registry:
+    def __init__(self):
+        self._metricas: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metrica) -> None:
+        with self._lock:
+            if metrica.nombre in self._metricas:
+                raise ValueError(f"Métrica duplicada: {metrica.nombre}")
+            self._metricas[metrica.nombre] = metrica
+
+    def render(self) -> str:
+        """Todas las métricas en el formato de texto de Prometheus."""
+        with self._lock:
+            metricas = list(self._metricas.values())
+        lineas: List[str] = []
+        for m in metricas:
+            try:
+                lineas.extend(m.render())
+            except Exception as e:
+                lineas.append(f"# {m.nombre}: error al exportar: {_escapar(e)}")
+        return "\n".join(lineas) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ------------------------ Métricas del proceso ------------------------
+QUERY_SECONDS = Histogram(
+    "unachito_query_seconds", "Latencia total de /query por fuente de la respuesta", ("fuente",)
+)
+QUERY_STAGE_SECONDS = Histogram(
+    "unachito_query_stage_seconds", "Latencia de cada etapa de /query", ("etapa",)
+)
+QUERY_FUENTE = Counter(
+    "unachito_query_fuente_total", "Respuestas de /query por fuente", ("fuente",)
+)
+DEPENDENCY_SECONDS = Histogram(
+    "unachito_dependency_seconds",
+    "Latencia de las llamadas a dependencias externas (API UNACH, MySQL, LDAP, SMTP)",
+    ("dependencia", "operacion", "resultado"),
+)
+HTTP_SECONDS = Histogram(
+    "unachito_http_request_seconds", "Latencia de las peticiones HTTP por ruta", ("ruta", "metodo", "status")
+)
+BATCH_SIZE = Histogram(
+    "unachito_batch_size", "Elementos por lote de los micro-lotes (encode, API UNACH)", ("lote",),
+    buckets=SIZE_BUCKETS,
+)
+BATCH_SECONDS = Histogram(
+    "unachito_batch_seconds", "Tiempo de proceso de cada micro-lote", ("lote",)
+)
+
+
+@contextmanager
+def medir_dependencia(dependencia: str, operacion: str):
+    """Registra en DEPENDENCY_SECONDS la duración del bloque y si terminó con error."""
+    t0 = time.perf_counter()
+    resultado = "error"
+    try:
+        yield
+        resultado = "ok"
+    finally:
+        DEPENDENCY_SECONDS.observe(time.perf_counter() - t0, dependencia, operacion, resultado)
+
+
+class MetricsMiddleware:
+    """
+    Mide cada petición HTTP con la plantilla de la ruta (no la URL concreta,
+    para acotar el número de series); lo que no coincide con ninguna ruta
+    cuenta como "sin_ruta".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codigo = [500]
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                codigo[0] = mensaje["status"]
+            await send(mensaje)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            ruta = scope.get("route")
+            HTTP_SECONDS.observe(
+                time.perf_counter() - t0,
+                getattr(ruta, "path", "sin_ruta"),
+                scope["method"],
+                str(codigo[0]),
+            )
@@ -0,0 +1,48 @@
+# app/utils/text_utils.py
+
+import re
+import unicodedata
+
+_ESPACIOS = re.compile(r"\s+")
+
+
+def quitar_acentos(texto: str) -> str:
+    """Elimina tildes y diacríticos (la ñ se conserva como n)."""
+    descompuesto = unicodedata.normalize("NFD", texto)
+    return "".join(c for c in descompuesto if unicodedata.category(c) != "Mn")
+
+
+def normalizar_texto(texto: str) -> str:
+    """
+    Forma canónica de una pregunta: minúsculas, sin acentos y con los
+    espacios colapsados.
+    """
+    return _ESPACIOS.sub(" ", quitar_acentos(texto.lower())).strip()
+
+
+# Palabras vacías del español (sin acentos, como quedan tras normalizar)
+STOPWORDS_ES = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes asi aun aunque bajo bien cada como con contra
+cual cuales cuando de del desde donde dos el ella ellas ello ellos en entre era eran es esa esas ese eso
+esos esta estan estas este esto estos fue fueron ha habia han hasta hay la las le les lo los mas me mi
+mis mucho muy nada ni no nos nosotros o os otra otras otro otros para pero poco por porque puede pueden
+que quien quienes se sea ser si sido sin sobre son su sus tal tambien te tiene tienen todo todos tu tus
+un una unas uno unos usted ustedes y ya yo hola buenas quiero quisiera necesito favor saber
+""".split())
+
+_TOKENS = re.compile(r"[a-z0-9]+")
+
+
+def tokenizar(texto: str) -> list:
+    """
+    Tokens para búsqueda léxica: texto normalizado (sin acentos), sin
+    palabras vacías y con el plural simple plegado ("horarios" → "horario").
+    """
+    tokens = []
+    for t in _TOKENS.findall(normalizar_texto(texto)):
+        if t in STOPWORDS_ES or (len(t) < 2 and not t.isdigit()):
+            continue
+        if len(t) > 4 and t.endswith("s"):
+            t = t[:-1]
+        tokens.append(t)
+    return tokens
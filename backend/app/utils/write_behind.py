@@ -0,0 +1,160 @@
+# app/utils/write_behind.py
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from sqlalchemy.engine import Engine
+
+from app.utils.metrics import medir_dependencia
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class WriteBehindSink:
+    """
+    Búfer en memoria para INSERTs que no deben retrasar la respuesta: `put`
+    solo encola la fila y un hilo de fondo la escribe junto con las demás en
+    un único executemany (INSERT multi-fila) cuando se juntan `max_batch`
+    filas o pasan `flush_seconds` desde la más antigua. `close` vacía el
+    búfer antes de terminar; lo que llegue después se descarta (y se cuenta).
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        statement,
+        name: str,
+        max_batch: int = 100,
+        flush_seconds: float = 2.0,
+        max_pending: int = 10000,
+        retries: int = 3
+    ):
+        self.engine = engine
+        self.statement = statement
+        self.name = name
+        self.max_batch = max(1, max_batch)
+        self.flush_seconds = max(0.0, flush_seconds)
+        self.max_pending = max(self.max_batch, max_pending)
+        self.retries = max(1, retries)
+
+        self._pendientes: Deque[Dict] = deque()
+        self._primera: Optional[float] = None
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._cerrado = False
+
+        # Estadísticas
+        self.encoladas = 0
+        self.escritas = 0
+        self.lotes = 0
+        self.descartadas = 0
+        self.tras_cierre = 0
+        self.errores = 0
+        self.last_flush_ms = 0.0
+
+    def put(self, row: Dict) -> None:
+        """Encola una fila; nunca toca la base de datos en el hilo llamador."""
+        with self._cond:
+            if self._cerrado:
+                # Apagando: no hay hilo que la escriba y el llamador puede
+                # ser el event loop, así que no se escribe aquí
+                self.descartadas += 1
+                self.tras_cierre += 1
+                return
+            if len(self._pendientes) >= self.max_pending:
+                # BD caída o muy lenta: se sacrifica la fila más antigua
+                self._pendientes.popleft()
+                self.descartadas += 1
+                logger.warning("[%s] Búfer lleno (%d): se descarta la fila más antigua",
+                               self.name, self.max_pending)
+            if not self._pendientes:
+                self._primera = time.monotonic()
+            self._pendientes.append(row)
+            self.encoladas += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            if len(self._pendientes) >= self.max_batch:
+                self._cond.notify()
+
+    def _siguiente_lote(self) -> Optional[List[Dict]]:
+        with self._cond:
+            while True:
+                if self._pendientes:
+                    espera = self._primera + self.flush_seconds - time.monotonic()
+                    if self._cerrado or len(self._pendientes) >= self.max_batch or espera <= 0:
+                        return self._sacar_lote()
+                    self._cond.wait(espera)
+                elif self._cerrado:
+                    return None
+                else:
+                    self._cond.wait()
+
+    def _sacar_lote(self) -> List[Dict]:
+        n = min(self.max_batch, len(self._pendientes))
+        lote = [self._pendientes.popleft() for _ in range(n)]
+        self._primera = time.monotonic() if self._pendientes else None
+        return lote
+
+    def _run(self) -> None:
+        while True:
+            lote = self._siguiente_lote()
+            if lote is None:
+                return
+            self._escribir(lote)
+
+    def _escribir(self, lote: List[Dict]) -> None:
+        for intento in range(1, self.retries + 1):
+            t0 = time.perf_counter()
+            try:
+                with medir_dependencia("mysql", self.name), self.engine.begin() as conn:
+                    conn.execute(self.statement, lote)
+                self.last_flush_ms = (time.perf_counter() - t0) * 1000
+                self.escritas += len(lote)
+                self.lotes += 1
+                return
+            except Exception as e:
+                self.errores += 1
+                logger.warning("[%s] Error escribiendo lote de %d (intento %d/%d): %s",
+                               self.name, len(lote), intento, self.retries, e)
+                if intento < self.retries:
+                    time.sleep(min(self.flush_seconds, 1.0) * intento)
+        self.descartadas += len(lote)
+        logger.error("[%s] Se descartan %d filas tras %d intentos", self.name, len(lote), self.retries)
+
+    def flush(self) -> None:
+        """Escribe ya todo lo pendiente en el hilo llamador."""
+        while True:
+            with self._cond:
+                if not self._pendientes:
+                    return
+                lote = self._sacar_lote()
+            self._escribir(lote)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Deja de esperar lotes, vacía el búfer y detiene el hilo de fondo."""
+        with self._cond:
+            self._cerrado = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            pendientes = len(self._pendientes)
+        return {
+            "pendientes": pendientes,
+            "encoladas": self.encoladas,
+            "escritas": self.escritas,
+            "lotes": self.lotes,
+            "filas_por_lote": round(self.escritas / self.lotes, 2) if self.lotes else 0.0,
+            "descartadas": self.descartadas,
+            "tras_cierre": self.tras_cierre,
+            "errores": self.errores,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
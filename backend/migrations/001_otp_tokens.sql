@@ -0,0 +1,15 @@
+-- migrations/001_otp_tokens.sql
+-- Índices de otp_tokens y tabla de archivo para la limpieza de caducados.
+-- Aplicar una sola vez sobre la base principal (DATABASE_URL):
+--   mysql -u usuario -p unachito < migrations/001_otp_tokens.sql
+
+-- Búsqueda de verificación: WHERE cedula=? AND codigo_otp=? ORDER BY id DESC LIMIT 1.
+-- En InnoDB el índice secundario ya incluye la clave primaria (id), así que
+-- el orden por id se resuelve dentro del índice sin ordenar filas.
+CREATE INDEX idx_otp_cedula_codigo ON otp_tokens (cedula, codigo_otp);
+
+-- Barrido de caducados: WHERE expiracion < ? ORDER BY id LIMIT ?
+CREATE INDEX idx_otp_expiracion ON otp_tokens (expiracion);
+
+-- Destino de OTP_REAP_MODE=archive (misma estructura que otp_tokens)
+CREATE TABLE IF NOT EXISTS otp_tokens_archive LIKE otp_tokens;
@@ -1,9 +1,14 @@
-from app.services.scraping_service import scrape_and_save, URLS
+from app.config.settings import get_settings
+from app.services.scraping_service import crawl_and_save, URLS
+from app.services.scraped_index import rebuild_scraped_index
 
 def run_batch_scraping():
-    for url in URLS:
-        print(f"Iniciando scraping para: {url}")
-        scrape_and_save(url)
+    print(f"Iniciando scraping concurrente de {len(URLS)} sitios")
+    crawl_and_save(URLS, max_pages=get_settings().CRAWL_MAX_PAGES)
+
+    # Recalcular el índice de embeddings con el corpus recién scrapeado
+    index = rebuild_scraped_index()
+    print(f"[✔️] Índice de scraping reconstruido: {len(index)} fragmentos")
 
 if __name__ == "__main__":
     run_batch_scraping()
@@ -0,0 +1,17 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# Los módulos de app leen la configuración al importarse: se fijan valores
+# locales antes (las variables de entorno tienen prioridad sobre el .env)
+os.environ.update(
+    UNACH_TOKEN_SERVIDOR="test", UNACH_TOKEN_ESTUDIANTE="test",
+    UNACH_API_SERVIDOR="http://127.0.0.1:9", UNACH_API_ESTUDIANTE="http://127.0.0.1:9",
+    DATABASE_URL="sqlite://", DATABASE_URL_ESTUDIANTES="sqlite://", DATABASE_URL_SERVIDORES="sqlite://",
+    SMTP_HOST="127.0.0.1", SMTP_PORT="25", SMTP_USER="bot@unach.edu.ec", SMTP_PASSWORD="test",
+    LDAP_ZOOM_HOST="127.0.0.1", LDAP_ZOOM_USER="cn=admin,dc=unach,dc=edu,dc=ec",
+    LDAP_ZOOM_PASSWORD="test", LDAP_ZOOM_BASE_DN="ou=zoom,dc=unach,dc=edu,dc=ec",
+)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,174 @@
+# tests/test_crawler.py
+
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.crawler import Crawler
+from app.services.page_store import PageStore, iter_pages
+
+# Sitio de prueba: cada página enlaza a otras, con duplicados que solo
+# difieren en fragmento o parámetros utm_*, un enlace externo y un PDF
+PAGINAS = {
+    "/": '<a href="/a">a</a> <a href="/b#arriba">b</a> <a href="/a?utm_source=x">a</a>'
+         '<a href="http://externo.invalid/">fuera</a> <a href="/doc.pdf">pdf</a> <p>Inicio</p>',
+    "/a": '<a href="/">inicio</a> <a href="/b">b</a> <a href="/c">c</a> <p>Página A</p>',
+    "/b": '<a href="/a#x">a</a> <a href="/c">c</a> <a href="/datos">datos</a> <p>Página B</p>',
+    "/c": '<li>Página C <span>con detalle</span></li>',
+    "/roto": '<p>Roto</p>',
+}
+LAST_MODIFIED = "Mon, 06 Oct 2025 10:00:00 GMT"
+
+
+class Sitio:
+    """Servidor HTTP local que cuenta peticiones, concurrencia y respuestas 304."""
+
+    def __init__(self, espera: float = 0.0):
+        sitio = self
+        self.peticiones = Counter()
+        self.no_modificadas = 0
+        self.en_curso = 0
+        self.max_en_curso = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with sitio._lock:
+                    sitio.peticiones[self.path] += 1
+                    sitio.en_curso += 1
+                    sitio.max_en_curso = max(sitio.max_en_curso, sitio.en_curso)
+                try:
+                    time.sleep(espera)
+                    self._responder()
+                finally:
+                    with sitio._lock:
+                        sitio.en_curso -= 1
+
+            def _responder(self):
+                if self.path == "/datos":
+                    cuerpo = b'{"x": 1}'
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(cuerpo)))
+                    self.end_headers()
+                    self.wfile.write(cuerpo)
+                    return
+                html = PAGINAS.get(self.path.split("?")[0])
+                if html is None:
+                    self.send_error(404)
+                    return
+                etag = f'"{abs(hash(html))}"'
+                if self.headers.get("If-None-Match") == etag:
+                    with sitio._lock:
+                        sitio.no_modificadas += 1
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                cuerpo = html.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", LAST_MODIFIED)
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def sitio():
+    s = Sitio()
+    yield s
+    s.close()
+
+
+def test_frontier_sin_duplicados(sitio):
+    crawler = Crawler(max_workers=4, per_host=2, delay=0.0, max_pages=20)
+    resultados = crawler.crawl([sitio.url])
+
+    urls = sorted(r.url.replace(sitio.url, "/") for r in resultados[sitio.url])
+    assert urls == ["/", "/a", "/b", "/c"]
+    # Cada página se pide una sola vez pese a los enlaces duplicados; el PDF
+    # y el dominio externo no entran en el frontier
+    assert sitio.peticiones["/a"] == 1 and sitio.peticiones["/b"] == 1
+    assert "/doc.pdf" not in sitio.peticiones
+    # El contenido que no es HTML se descarga pero no se guarda como página
+    assert sitio.peticiones["/datos"] == 1
+    textos = {r.url.replace(sitio.url, "/"): r.texts for r in resultados[sitio.url]}
+    assert textos["/c"] == ["Página C con detalle"]
+
+
+def test_limites_por_host():
+    lento, otro = Sitio(espera=0.1), Sitio(espera=0.1)
+    try:
+        crawler = Crawler(max_workers=8, per_host=1, delay=0.0, max_pages=3)
+        resultados = crawler.crawl([lento.url, otro.url])
+    finally:
+        lento.close()
+        otro.close()
+
+    # Nunca más de per_host peticiones simultáneas ni más de max_pages por host
+    assert lento.max_en_curso == 1 and otro.max_en_curso == 1
+    assert len(resultados[lento.url]) == 3 and len(resultados[otro.url]) == 3
+    assert sum(lento.peticiones.values()) == 3
+
+
+def test_espera_entre_peticiones_al_mismo_host(sitio):
+    crawler = Crawler(max_workers=4, per_host=2, delay=0.2, max_pages=3)
+    t0 = time.monotonic()
+    crawler.crawl([sitio.url])
+    # Tres peticiones al mismo host separadas por `delay`
+    assert time.monotonic() - t0 >= 0.4
+
+
+def test_segundo_rastreo_reutiliza_validadores(sitio, tmp_path):
+    ruta = str(tmp_path / "pages.jsonl")
+    Crawler(delay=0.0, max_pages=20, state=PageStore(path=ruta)).crawl([sitio.url])
+    primero = {rec["url"]: rec for rec in iter_pages(ruta)}
+    assert primero[sitio.url]["etag"] and primero[sitio.url]["last_modified"] == LAST_MODIFIED
+    assert sitio.no_modificadas == 0
+
+    # Un proceso nuevo carga los validadores del disco y recibe 304
+    resultados = Crawler(delay=0.0, max_pages=20, state=PageStore(path=ruta)).crawl([sitio.url])
+    paginas = resultados[sitio.url]
+    assert sitio.no_modificadas == 4
+    assert all(r.not_modified for r in paginas)
+    # Los enlaces guardados siguen alimentando el frontier
+    assert sorted(r.url.replace(sitio.url, "/") for r in paginas) == ["/", "/a", "/b", "/c"]
+    assert {rec["url"]: rec["content_hash"] for rec in iter_pages(ruta)} == {
+        url: rec["content_hash"] for url, rec in primero.items()
+    }
+
+
+def test_error_de_analisis_no_detiene_el_rastreo(sitio, monkeypatch):
+    import app.services.crawler as crawler_mod
+
+    originales = crawler_mod.extract_texts
+
+    def extraer(soup):
+        if "Roto" in soup.get_text():
+            raise ValueError("HTML inesperado")
+        return originales(soup)
+
+    monkeypatch.setattr(crawler_mod, "extract_texts", extraer)
+    roto = Sitio()
+    try:
+        resultados = Crawler(delay=0.0, max_pages=20).crawl([roto.url + "roto", sitio.url])
+    finally:
+        roto.close()
+
+    assert resultados[roto.url + "roto"] == []
+    assert len(resultados[sitio.url]) == 4
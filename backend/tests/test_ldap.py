@@ -0,0 +1,138 @@
+# tests/test_ldap.py
+
+import time
+
+import ldap3
+import pytest
+from ldap3.core.exceptions import LDAPCommunicationError
+
+from app.config.settings import get_settings
+from app.services import ldap_service
+from app.utils.ldap_pool import LdapPool
+
+ADMIN = "cn=admin,dc=unach,dc=edu,dc=ec"
+BASE = "ou=zoom,dc=unach,dc=edu,dc=ec"
+# Cuentas Zoom del directorio simulado; las dos últimas tienen caracteres
+# especiales de los filtros LDAP en el cn
+CUENTAS = ("0601234567", "0607654321", "x*y", "a(b)\\c")
+
+
+def _pool(**kwargs) -> LdapPool:
+    """Pool MOCK_SYNC sobre un directorio en memoria con el admin y las cuentas Zoom."""
+    pool = LdapPool("ldap-simulado", port=389, user=ADMIN, password="secreto", strategy="MOCK_SYNC", **kwargs)
+    semilla = ldap3.Connection(pool.server, client_strategy=ldap3.MOCK_SYNC)
+    semilla.strategy.add_entry(ADMIN, {"userPassword": "secreto", "objectClass": "person"})
+    for cn in CUENTAS:
+        dn = f"cn={ldap3.utils.dn.escape_rdn(cn)},{BASE}"
+        semilla.strategy.add_entry(dn, {"cn": cn, "uid": f"u{cn}", "userPassword": "vieja", "objectClass": "person"})
+    return pool
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = _pool(size=2)
+    monkeypatch.setattr(ldap_service, "_zoom_pool", pool)
+    cambios = []
+    monkeypatch.setattr(
+        ldap_service, "registrar_log_password_change", lambda *args: cambios.append(args)
+    )
+    pool.cambios = cambios
+    yield pool
+    pool.close()
+
+
+def _password(pool: LdapPool, cn: str):
+    dn = f"cn={ldap3.utils.dn.escape_rdn(cn)},{BASE}"
+    return pool.server.dit[dn]["userPassword"]
+
+
+def test_conexiones_reutilizadas(pool):
+    for _ in range(5):
+        assert ldap_service.zoom_account_exists("0601234567")
+    stats = pool.stats()
+    # Un solo bind: las consultas secuenciales comparten la conexión
+    assert stats["creadas"] == 1 and stats["reutilizadas"] == 4
+    assert stats["libres"] == 1 and stats["en_uso"] == 0
+
+
+def test_conexion_inactiva_se_reemplaza():
+    pool = _pool(size=1, max_idle=0.05)
+    pool.run(lambda conn: conn.search(BASE, "(cn=*)"))
+    time.sleep(0.1)
+    pool.run(lambda conn: conn.search(BASE, "(cn=*)"))
+    stats = pool.stats()
+    assert stats["creadas"] == 2 and stats["descartadas"] == 1 and stats["reutilizadas"] == 0
+
+
+def test_conexion_caida_se_descarta():
+    pool = _pool(size=1)
+    pool.run(lambda conn: None)
+    conn, _ = pool._libres.queue[-1]
+    conn.unbind()
+    pool.run(lambda conn: None)
+    assert pool.stats()["creadas"] == 2 and pool.stats()["descartadas"] == 1
+
+
+def test_un_reintento_ante_error_de_comunicacion():
+    pool = _pool(size=1)
+    llamadas = []
+
+    def buscar(conn):
+        llamadas.append(conn)
+        if len(llamadas) == 1:
+            raise LDAPCommunicationError("socket cerrado")
+        return "ok"
+
+    assert pool.run(buscar) == "ok"
+    # La conexión que falló se descartó y el reintento usó una nueva
+    assert llamadas[0] is not llamadas[1]
+    assert pool.stats()["descartadas"] == 1 and pool.stats()["creadas"] == 2
+
+    def siempre_falla(conn):
+        llamadas.append(conn)
+        raise LDAPCommunicationError("socket cerrado")
+
+    llamadas.clear()
+    with pytest.raises(LDAPCommunicationError):
+        pool.run(siempre_falla)
+    assert len(llamadas) == 2
+    # El cupo vuelve al pool aunque ambos intentos fallen
+    assert pool.stats()["en_uso"] == 0
+    assert pool.run(lambda conn: "libre") == "libre"
+
+
+def test_otros_errores_no_se_reintentan():
+    pool = _pool(size=1)
+    llamadas = []
+
+    def falla(conn):
+        llamadas.append(conn)
+        raise ValueError("error de la aplicación")
+
+    with pytest.raises(ValueError):
+        pool.run(falla)
+    assert len(llamadas) == 1
+    assert pool.stats()["libres"] == 1
+
+
+@pytest.mark.parametrize("cedula", ["*", "06*", "0601234567)(cn=*", "x*", "a(b)", "\\2a"])
+def test_filtro_escapado_en_busqueda(pool, cedula):
+    assert not ldap_service.zoom_account_exists(cedula)
+
+
+@pytest.mark.parametrize("cn", CUENTAS)
+def test_cn_con_caracteres_especiales_se_encuentra(pool, cn):
+    assert ldap_service.zoom_account_exists(cn)
+
+
+def test_cambio_de_password_con_filtro_escapado(pool):
+    settings = get_settings()
+    with pytest.raises(Exception, match="no encontrado"):
+        ldap_service.change_ldap_zoom_password("*", "nueva", settings)
+    assert all(_password(pool, cn) == [b"vieja"] for cn in CUENTAS)
+    assert pool.cambios == []
+
+    ldap_service.change_ldap_zoom_password("x*y", "nueva", settings, client_ip="10.0.0.1")
+    assert _password(pool, "x*y") == [b"nueva"]
+    assert _password(pool, "0601234567") == [b"vieja"]
+    assert pool.cambios == [("x*y", "zoom", "10.0.0.1", "Cambio de contraseña exitoso")]
@@ -0,0 +1,189 @@
+# tests/test_mail_outbox.py
+
+import asyncio
+import time
+from collections import deque
+from email.message import EmailMessage
+
+from app.services.mail_outbox import SmtpOutbox
+
+
+class SumideroSmtp:
+    """
+    Servidor SMTP mínimo en asyncio. Acepta AUTH sin comprobar y guarda los
+    mensajes. `respuestas` fija la réplica a los próximos DATA ("451", "550",
+    o "cortar" para cerrar la conexión sin responder).
+    """
+
+    def __init__(self):
+        self.conexiones = 0
+        self.logins = 0
+        self.datas = 0
+        self.mensajes = []
+        self.llegadas = []
+        self.respuestas = deque()
+        self.server = None
+
+    async def iniciar(self) -> int:
+        self.server = await asyncio.start_server(self._atender, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def detener(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _atender(self, reader, writer):
+        self.conexiones += 1
+        writer.write(b"220 sumidero\r\n")
+        en_data, cuerpo = False, []
+        try:
+            while True:
+                linea = await reader.readline()
+                if not linea:
+                    return
+                if en_data:
+                    if linea != b".\r\n":
+                        cuerpo.append(linea)
+                        continue
+                    en_data = False
+                    self.datas += 1
+                    respuesta = self.respuestas.popleft() if self.respuestas else "250"
+                    if respuesta == "cortar":
+                        return
+                    if respuesta == "250":
+                        self.mensajes.append(b"".join(cuerpo))
+                        self.llegadas.append(time.monotonic())
+                        writer.write(b"250 guardado\r\n")
+                    else:
+                        writer.write(respuesta.encode() + b" rechazado\r\n")
+                    cuerpo = []
+                    await writer.drain()
+                    continue
+                comando = linea[:4].upper()
+                if comando == b"EHLO":
+                    writer.write(b"250-sumidero\r\n250 AUTH PLAIN LOGIN\r\n")
+                elif comando == b"AUTH":
+                    self.logins += 1
+                    writer.write(b"235 autenticado\r\n")
+                elif comando == b"DATA":
+                    en_data = True
+                    writer.write(b"354 adelante\r\n")
+                elif comando == b"QUIT":
+                    writer.write(b"221 adios\r\n")
+                    await writer.drain()
+                    return
+                else:
+                    writer.write(b"250 ok\r\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+def _otp(i: int) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = "bot@unach.edu.ec"
+    msg["To"] = f"usuario{i}@unach.edu.ec"
+    msg["Subject"] = "Código OTP"
+    msg.set_content(f"Tu código es {100000 + i}")
+    return msg
+
+
+async def _hasta(condicion, timeout: float = 3.0) -> None:
+    limite = time.monotonic() + timeout
+    while not condicion():
+        assert time.monotonic() < limite, "tiempo de espera agotado"
+        await asyncio.sleep(0.01)
+
+
+async def _con_sumidero(prueba, **kwargs):
+    sumidero = SumideroSmtp()
+    puerto = await sumidero.iniciar()
+    opciones = {"start_tls": False, "max_retries": 2, "backoff_seconds": 0.2, "timeout": 2.0}
+    outbox = SmtpOutbox("127.0.0.1", port=puerto, user="bot", password="x", **{**opciones, **kwargs})
+    try:
+        await prueba(sumidero, outbox)
+    finally:
+        await outbox.close(timeout=1.0)
+        await sumidero.detener()
+
+
+def test_conexion_reutilizada_entre_envios():
+    async def prueba(sumidero, outbox):
+        for i in range(5):
+            outbox.send(_otp(i))
+        await _hasta(lambda: len(sumidero.mensajes) == 5)
+        outbox.send(_otp(5))
+        await _hasta(lambda: len(sumidero.mensajes) == 6)
+        # Un solo connect + login para todos los OTP
+        assert sumidero.conexiones == 1 and sumidero.logins == 1
+        assert outbox.stats()["conexiones_creadas"] == 1
+        assert outbox.stats()["conexiones_abiertas"] == 1
+
+    asyncio.run(_con_sumidero(prueba))
+
+
+def test_rechazo_permanente_no_se_reintenta():
+    async def prueba(sumidero, outbox):
+        sumidero.respuestas.append("550")
+        outbox.send(_otp(0))
+        outbox.send(_otp(1))
+        await _hasta(lambda: len(sumidero.mensajes) == 1)
+        await asyncio.sleep(0.5)
+        stats = outbox.stats()
+        assert sumidero.datas == 2
+        assert stats["fallidos"] == 1 and stats["reintentos"] == 0
+        # La sesión sigue siendo válida tras un 5xx: no se reconecta
+        assert sumidero.conexiones == 1
+
+    asyncio.run(_con_sumidero(prueba))
+
+
+def test_rechazo_temporal_se_reintenta_con_espera():
+    async def prueba(sumidero, outbox):
+        sumidero.respuestas.extend(["451", "451"])
+        t0 = time.monotonic()
+        outbox.send(_otp(0))
+        await _hasta(lambda: len(sumidero.mensajes) == 1)
+        # Espera exponencial: 0.2 s tras el primer fallo y 0.4 s tras el segundo
+        assert sumidero.llegadas[0] - t0 >= 0.6
+        stats = outbox.stats()
+        assert sumidero.datas == 3 and stats["reintentos"] == 2
+        assert stats["enviados"] == 1 and stats["fallidos"] == 0
+
+    asyncio.run(_con_sumidero(prueba))
+
+
+def test_reintentos_agotados():
+    async def prueba(sumidero, outbox):
+        sumidero.respuestas.extend(["451"] * 3)
+        outbox.send(_otp(0))
+        await _hasta(lambda: outbox.stats()["fallidos"] == 1)
+        assert sumidero.datas == 3 and sumidero.mensajes == []
+
+    asyncio.run(_con_sumidero(prueba))
+
+
+def test_conexion_perdida_se_reabre_y_se_reintenta():
+    async def prueba(sumidero, outbox):
+        outbox.send(_otp(0))
+        await _hasta(lambda: len(sumidero.mensajes) == 1)
+        sumidero.respuestas.append("cortar")
+        outbox.send(_otp(1))
+        await _hasta(lambda: len(sumidero.mensajes) == 2)
+        stats = outbox.stats()
+        assert sumidero.conexiones == 2 and stats["reintentos"] == 1
+        assert stats["conexiones_abiertas"] == 1
+
+    asyncio.run(_con_sumidero(prueba))
+
+
+def test_close_vacia_la_cola():
+    async def prueba(sumidero, outbox):
+        for i in range(10):
+            outbox.send(_otp(i))
+        await outbox.close(timeout=3.0)
+        assert len(sumidero.mensajes) == 10
+        stats = outbox.stats()
+        assert stats["en_cola"] == 0 and stats["conexiones_abiertas"] == 0
+
+    asyncio.run(_con_sumidero(prueba))
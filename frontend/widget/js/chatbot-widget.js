@@ -500,8 +500,89 @@
   });
 
   // ─────────────────────────────────────────────────────────────────────────────
-  // 📡 Helper para POST
+  // 🔌 Canal WebSocket: una sola conexión para todo el flujo. Si no se puede
+  // abrir, se usa fetch y se vuelve a intentar al minuto.
+  const WS_URL = API_BASE.replace(/^http/, 'ws') + '/ws';
+  const WS_TIMEOUT_MS = 20000;   // sin respuesta en este tiempo → fetch
+  const canal = {
+    ws: null,
+    abriendo: null,
+    siguienteId: 1,
+    pendientes: new Map(),   // id → { resolve, reject, timer }
+    reintentarEn: 0
+  };
+
+  function conectar() {
+    if (canal.abriendo) return canal.abriendo;
+    canal.abriendo = new Promise((resolve, reject) => {
+      const ws = new WebSocket(WS_URL);
+      ws.onopen = () => {
+        canal.ws = ws;
+        resolve(ws);
+      };
+      ws.onmessage = e => {
+        const msg = JSON.parse(e.data);
+        const p = canal.pendientes.get(msg.id);
+        if (!p) return;
+        canal.pendientes.delete(msg.id);
+        clearTimeout(p.timer);
+        p.resolve(msg.body);
+      };
+      ws.onclose = () => {
+        // Sin llegar a abrir → fetch por un rato; cerrada por inactividad → se reabre al próximo envío
+        if (!canal.ws) {
+          canal.reintentarEn = Date.now() + 60 * 1000;
+          reject(new Error('WebSocket no disponible'));
+        }
+        canal.ws = null;
+        canal.abriendo = null;
+        canal.pendientes.forEach(p => {
+          clearTimeout(p.timer);
+          p.reject(new Error('Conexión cerrada'));
+        });
+        canal.pendientes.clear();
+      };
+    });
+    return canal.abriendo;
+  }
+
+  async function enviarPorCanal(path, body) {
+    if (!('WebSocket' in window) || Date.now() < canal.reintentarEn) return null;
+    let ws;
+    try {
+      ws = await conectar();
+    } catch {
+      return null;
+    }
+    if (ws.readyState !== WebSocket.OPEN) return null;
+    return new Promise((resolve, reject) => {
+      const id = canal.siguienteId++;
+      // El socket puede seguir abierto sin que el servidor conteste: se
+      // abandona el canal un rato y el mensaje se reenvía por fetch
+      const timer = setTimeout(() => {
+        canal.pendientes.delete(id);
+        canal.reintentarEn = Date.now() + 60 * 1000;
+        reject(new Error('Sin respuesta por WebSocket'));
+        ws.close();
+      }, WS_TIMEOUT_MS);
+      canal.pendientes.set(id, { resolve, reject, timer });
+      ws.send(JSON.stringify({ id, tipo: path.slice(1), datos: body }));
+    });
+  }
+
+  // ─────────────────────────────────────────────────────────────────────────────
+  // 📡 Helper para POST (WebSocket si está disponible, si no fetch)
   async function post(path, body) {
+    let res = null;
+    try {
+      res = await enviarPorCanal(path, body);
+    } catch {
+      res = null;   // canal cerrado o sin respuesta a tiempo
+    }
+    return res !== null ? res : postHttp(path, body);
+  }
+
+  async function postHttp(path, body) {
     const res = await fetch(API_BASE + path, {
       method:  'POST',
       headers: { 'Content-Type': 'application/json' },